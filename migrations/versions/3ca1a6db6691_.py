@@ -0,0 +1,42 @@
+"""task indexes for filtered queries
+
+Revision ID: 3ca1a6db6691
+Revises: 42f3492ca5c5
+Create Date: 2026-10-19 09:12:41.218334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ca1a6db6691'
+down_revision = '42f3492ca5c5'
+branch_labels = None
+depends_on = None
+
+
+def _task_columns():
+    # 42f3492ca5c5 renombró date/done a due_date/completed, pero el modelo
+    # sigue usando date/done: indexamos las columnas que existan de verdad
+    cols = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('task')}
+    date_col = 'date' if 'date' in cols else 'due_date'
+    done_col = 'done' if 'done' in cols else 'completed'
+    return date_col, done_col
+
+
+def upgrade():
+    date_col, done_col = _task_columns()
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_user_id_date', ['user_id', date_col], unique=False)
+        batch_op.create_index('ix_task_user_id_done', ['user_id', done_col], unique=False)
+        batch_op.create_index('ix_task_user_open_date', ['user_id', date_col], unique=False,
+                              sqlite_where=sa.text(f'{done_col} = 0'),
+                              postgresql_where=sa.text(f'{done_col} = false'))
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_open_date')
+        batch_op.drop_index('ix_task_user_id_done')
+        batch_op.drop_index('ix_task_user_id_date')
@@ -0,0 +1,24 @@
+"""revoked_token.revoked_at index: workers poll recent revocations by time
+
+Revision ID: 3f9c2d8a6b15
+Revises: 5e8a3c1f7b94
+Create Date: 2026-10-21 10:02:51.734209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d8a6b15'
+down_revision = '5e8a3c1f7b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_revoked_token_revoked_at'), 'revoked_token', ['revoked_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_revoked_token_revoked_at'), table_name='revoked_token')
@@ -0,0 +1,102 @@
+"""task: contract date/done (drop due_date/completed and the dual-write trigger)
+
+Revision ID: 5e8a3c1f7b94
+Revises: b2d7e9f14c60
+Create Date: 2026-10-20 09:13:20.118465
+
+"""
+from contextlib import contextmanager
+from alembic import op
+import sqlalchemy as sa
+from api import backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a3c1f7b94'
+down_revision = 'b2d7e9f14c60'
+branch_labels = None
+depends_on = None
+
+# Paso 3 de 3: solo tras `flask backfill task_date_done` (README, "Backfills in migrations")
+DUAL_WRITE = {'date': 'due_date', 'done': 'completed'}
+BACKFILL = ("flask backfill task_date_done --table task --set date=due_date --set done=completed "
+            "--if-column due_date")
+INDEXES = ('ix_task_user_id_date', 'ix_task_user_id_done', 'ix_task_user_open_date')
+
+
+def _task_columns():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('task')}
+
+
+# SQLite reescribe task en cada batch: sin esto perdería el AUTOINCREMENT de d41f6a2c8e53
+SQLITE_TABLE = {'table_kwargs': {'sqlite_autoincrement': True}}
+
+
+@contextmanager
+def _without_blocking_writes():
+    # Postgres: CREATE/DROP INDEX CONCURRENTLY no bloquea las escrituras en task,
+    # pero no puede ir dentro de una transacción (confirma lo anterior)
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            yield
+    else:
+        yield
+
+
+def _drop_indexes():
+    with _without_blocking_writes():
+        for name in INDEXES:
+            op.drop_index(name, table_name='task', postgresql_concurrently=True)
+
+
+def _create_indexes(date_col, done_col):
+    # Los de 3ca1a6db6691, sobre las columnas que quedan
+    with _without_blocking_writes():
+        op.create_index('ix_task_user_id_date', 'task', ['user_id', date_col], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_task_user_id_done', 'task', ['user_id', done_col], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_task_user_open_date', 'task', ['user_id', date_col], unique=False,
+                        sqlite_where=sa.text(f'{done_col} = 0'),
+                        postgresql_where=sa.text(f'{done_col} = false'),
+                        postgresql_concurrently=True)
+
+
+def upgrade():
+    if 'due_date' not in _task_columns():
+        return
+    pending = op.get_bind().execute(sa.text("SELECT COUNT(*) FROM task WHERE done IS NULL")).scalar()
+    if pending:
+        raise RuntimeError(f"task.done is still NULL in {pending} rows: run `{BACKFILL}` first")
+    backfill.drop_dual_write(op, 'task', DUAL_WRITE)
+    _drop_indexes()
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite no altera columnas en sitio: una sola reescritura para todo
+        with op.batch_alter_table('task', schema=None, **SQLITE_TABLE) as batch_op:
+            batch_op.alter_column('done', existing_type=sa.Boolean(), nullable=False)
+            batch_op.drop_column('completed')
+            batch_op.drop_column('due_date')
+    else:
+        backfill.set_not_null(op, 'task', 'done')
+        op.drop_column('task', 'completed')
+        op.drop_column('task', 'due_date')
+    _create_indexes('date', 'done')
+
+
+def downgrade():
+    if 'due_date' in _task_columns():
+        return
+    op.add_column('task', sa.Column('due_date', sa.Date(), nullable=True))
+    op.add_column('task', sa.Column('completed', sa.Boolean(), nullable=True))
+    _drop_indexes()
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('task', schema=None, **SQLITE_TABLE) as batch_op:
+            batch_op.alter_column('done', existing_type=sa.Boolean(), nullable=True)
+    else:
+        op.alter_column('task', 'done', existing_type=sa.Boolean(), nullable=True)
+    _create_indexes('due_date', 'completed')
+    # Después de la reescritura de SQLite, que borraría el trigger con la tabla vieja
+    backfill.create_dual_write(op, 'task', DUAL_WRITE)
+    backfill.reset(op.get_bind(), 'task_due_date_completed')
+    backfill.in_migration(op, 'task_due_date_completed', 'task',
+                          {'due_date': 'date', 'completed': 'done'})
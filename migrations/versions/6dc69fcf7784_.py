@@ -0,0 +1,37 @@
+"""full-text search index
+
+Revision ID: 6dc69fcf7784
+Revises: 3ca1a6db6691
+Create Date: 2026-10-19 11:40:07.532118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from api import search
+
+
+# revision identifiers, used by Alembic.
+revision = '6dc69fcf7784'
+down_revision = '3ca1a6db6691'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(search.SQLITE_DDL)
+    elif dialect == 'postgresql':
+        op.execute(search.PG_DDL)
+        for ddl in search.PG_INDEX_DDL:
+            op.execute(ddl)
+    # El contenido se carga con: flask search-reindex
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS search_document')
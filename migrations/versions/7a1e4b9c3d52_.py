@@ -0,0 +1,34 @@
+"""revoked_token.key unique: two workers cannot rotate the same refresh token
+
+Revision ID: 7a1e4b9c3d52
+Revises: 3f9c2d8a6b15
+Create Date: 2026-10-21 10:37:08.915362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1e4b9c3d52'
+down_revision = '3f9c2d8a6b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Un sid podía revocarse dos veces (logout + reutilización): queda la fila que caduca más tarde
+    op.execute("DELETE FROM revoked_token WHERE id IN ("
+               "SELECT a.id FROM revoked_token a JOIN revoked_token b ON a.key = b.key "
+               "AND (a.expires_at < b.expires_at OR (a.expires_at = b.expires_at AND a.id < b.id)))")
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY: /api/token/refresh sigue insertando mientras se construye
+        with op.get_context().autocommit_block():
+            op.create_index(op.f('ix_revoked_token_key'), 'revoked_token', ['key'], unique=True,
+                            postgresql_concurrently=True)
+    else:
+        op.create_index(op.f('ix_revoked_token_key'), 'revoked_token', ['key'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_revoked_token_key'), table_name='revoked_token')
@@ -0,0 +1,26 @@
+"""user_directory.moving: users being copied to another shard
+
+Revision ID: 8b3f0d6e1a27
+Revises: c71e5a2f9d30
+Create Date: 2026-10-19 23:41:37.204615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f0d6e1a27'
+down_revision = 'c71e5a2f9d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_directory', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('moving', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user_directory', schema=None) as batch_op:
+        batch_op.drop_column('moving')
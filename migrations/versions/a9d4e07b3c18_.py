@@ -0,0 +1,32 @@
+"""per-day occupancy bitmaps for free-slot search
+
+Revision ID: a9d4e07b3c18
+Revises: f2a8d16c0b47
+Create Date: 2026-10-19 18:12:45.771032
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4e07b3c18'
+down_revision = 'f2a8d16c0b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_occupancy',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('am', sa.BigInteger(), nullable=False),
+    sa.Column('pm', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    # Se rellena con: flask occupancy-rebuild
+
+
+def downgrade():
+    op.drop_table('event_occupancy')
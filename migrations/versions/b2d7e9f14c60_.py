@@ -0,0 +1,55 @@
+"""task: expand due_date/completed back to date/done, with a dual-write trigger
+
+Revision ID: b2d7e9f14c60
+Revises: 8b3f0d6e1a27
+Create Date: 2026-10-20 09:12:44.537102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from api import backfill
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d7e9f14c60'
+down_revision = '8b3f0d6e1a27'
+branch_labels = None
+depends_on = None
+
+# 42f3492ca5c5 renombró task.date/done a due_date/completed, pero el modelo
+# sigue usando date/done. Paso 1 de 3 (expand → `flask backfill` → contract,
+# ver api/backfill.py y 5e8a3c1f7b94)
+DUAL_WRITE = {'date': 'due_date', 'done': 'completed'}
+# SQLite reescribe task en cada batch: sin esto perdería el AUTOINCREMENT de d41f6a2c8e53
+SQLITE_TABLE = {'table_kwargs': {'sqlite_autoincrement': True}}
+
+
+def _task_columns():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('task')}
+
+
+def upgrade():
+    if 'due_date' not in _task_columns():
+        return  # tabla creada ya con date/done: nada que migrar
+    op.add_column('task', sa.Column('date', sa.Date(), nullable=True))
+    op.add_column('task', sa.Column('done', sa.Boolean(), nullable=True))
+    # El modelo inserta sin `completed`: lo rellena el trigger
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('task', schema=None, **SQLITE_TABLE) as batch_op:
+            batch_op.alter_column('completed', existing_type=sa.Boolean(), nullable=True)
+    else:
+        op.alter_column('task', 'completed', existing_type=sa.Boolean(), nullable=True)
+    backfill.create_dual_write(op, 'task', DUAL_WRITE)
+
+
+def downgrade():
+    if 'due_date' not in _task_columns():
+        return
+    backfill.drop_dual_write(op, 'task', DUAL_WRITE)
+    backfill.reset(op.get_bind(), 'task_date_done')
+    # Lo escrito después del expand ya está en due_date/completed (trigger)
+    op.execute("UPDATE task SET completed = false WHERE completed IS NULL")
+    with op.batch_alter_table('task', schema=None, **SQLITE_TABLE) as batch_op:
+        batch_op.alter_column('completed', existing_type=sa.Boolean(), nullable=False)
+        batch_op.drop_column('done')
+        batch_op.drop_column('date')
@@ -0,0 +1,35 @@
+"""user directory for per-user sharding
+
+Revision ID: b7e21c4d9a10
+Revises: 6dc69fcf7784
+Create Date: 2026-10-19 13:05:51.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e21c4d9a10'
+down_revision = '6dc69fcf7784'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_directory',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    # Los usuarios existentes quedan en el shard 0 (la BD principal)
+    op.execute('INSERT INTO user_directory (id, email, shard) SELECT id, email, 0 FROM "user"')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval(pg_get_serial_sequence('user_directory', 'id'), "
+                   "COALESCE((SELECT MAX(id) FROM user_directory), 0) + 1, false)")
+
+
+def downgrade():
+    op.drop_table('user_directory')
@@ -0,0 +1,36 @@
+"""resumable NDJSON imports
+
+Revision ID: c71e5a2f9d30
+Revises: a9d4e07b3c18
+Create Date: 2026-10-19 21:04:12.318552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e5a2f9d30'
+down_revision = 'a9d4e07b3c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('job', sa.String(length=120), nullable=False),
+    sa.Column('line', sa.BigInteger(), nullable=False),
+    sa.Column('events', sa.BigInteger(), nullable=False),
+    sa.Column('tasks', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'job', name='uq_import_progress_user_job')
+    )
+
+
+def downgrade():
+    op.drop_table('import_progress')
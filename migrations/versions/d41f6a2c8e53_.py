@@ -0,0 +1,65 @@
+"""archive tables for old events and done tasks
+
+Revision ID: d41f6a2c8e53
+Revises: b7e21c4d9a10
+Create Date: 2026-10-19 14:22:08.613970
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f6a2c8e53'
+down_revision = 'b7e21c4d9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('start', sa.DateTime(), nullable=False),
+    sa.Column('end', sa.DateTime(), nullable=False),
+    sa.Column('all_day', sa.Boolean(), nullable=False),
+    sa.Column('color', sa.String(length=20), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_archive_user_id_start', 'event_archive', ['user_id', 'start'], unique=False)
+    op.create_table('task_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('done', sa.Boolean(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_archive_user_id_date', 'task_archive', ['user_id', 'date'], unique=False)
+    op.create_table('archive_watermark',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('before', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # SQLite reutiliza el rowid más alto si se borra: con AUTOINCREMENT un id
+    # archivado no se vuelve a asignar (Postgres ya usa secuencias)
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('event', 'task'):
+            with op.batch_alter_table(table, recreate='always',
+                                      table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+                pass
+
+
+def downgrade():
+    op.drop_table('archive_watermark')
+    op.drop_index('ix_task_archive_user_id_date', table_name='task_archive')
+    op.drop_table('task_archive')
+    op.drop_index('ix_event_archive_user_id_start', table_name='event_archive')
+    op.drop_table('event_archive')
@@ -0,0 +1,36 @@
+"""progress table for chunked backfills
+
+Revision ID: e5c93b7f2a61
+Revises: d41f6a2c8e53
+Create Date: 2026-10-19 16:05:41.208337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c93b7f2a61'
+down_revision = 'd41f6a2c8e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Puede existir ya: api/backfill.py la crea al vuelo si `flask backfill`
+    # se lanzó antes de esta revisión
+    if sa.inspect(op.get_bind()).has_table('backfill_progress'):
+        return
+    op.create_table('backfill_progress',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('last_id', sa.BigInteger(), nullable=False),
+    sa.Column('max_id', sa.BigInteger(), nullable=False),
+    sa.Column('rows_done', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('backfill_progress')
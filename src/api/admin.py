@@ -1,17 +1,145 @@
-  
+
 import os
+from flask import g, request, session, url_for, flash
 from flask_admin import Admin
-from .models import db, User
 from flask_admin.contrib.sqla import ModelView
+from flask_admin.contrib.sqla.filters import FilterEqual, IntEqualFilter, DateBetweenFilter, BooleanEqualFilter
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import joinedload, load_only
+from .models import db, User, Event, Task
+from .shard_router import shard_count
+
+
+class KeysetModelView(ModelView):
+    """
+    Listado pensado para tablas grandes:
+    - paginación por clave (?after=<id>, orden id DESC) en lugar de OFFSET
+    - total estimado (pg_class.reltuples / max(id)) en lugar de COUNT(*)
+    - solo filtros sobre columnas indexadas; los que usan la 2ª columna de un
+      índice compuesto exigen también el filtro de la 1ª (`scope_filter`)
+    - con shards, se navega un shard cada vez (?shard=N, se recuerda en la sesión)
+    """
+    list_template = "admin/keyset_list.html"
+    page_size = 50
+    can_set_page_size = False
+    column_display_pk = True
+    column_sortable_list = ()
+    column_default_sort = None
+    can_view_details = True
+    scope_filter = None          # nombre de la columna que deben acompañar...
+    scoped_filters = ()          # ...estos filtros
+
+    def _handle_view(self, name, **kwargs):
+        if shard_count():
+            if "shard" in request.args:
+                session["admin_shard"] = min(max(0, request.args.get("shard", 0, type=int)), shard_count() - 1)
+            g._shard = session.get("admin_shard", 0)
+        return super()._handle_view(name, **kwargs)
+
+    def _active_filters(self, filters):
+        columns = {self._filters[idx].column.key for idx, _, _ in filters}
+        if self.scope_filter and self.scope_filter not in columns and columns & set(self.scoped_filters):
+            flash(f"Filters on {', '.join(self.scoped_filters)} need a {self.scope_filter} filter too "
+                  "(they use a composite index); ignored.", "warning")
+            return [f for f in filters if self._filters[f[0]].column.key not in self.scoped_filters]
+        return filters
+
+    def estimated_count(self):
+        pk = self.model.__table__.c.id
+        bind = db.session.get_bind(mapper=self.model.__mapper__)
+        if bind.dialect.name == "postgresql":
+            value = db.session.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"),
+                {"t": self.model.__tablename__}, bind_arguments={"mapper": self.model.__mapper__}).scalar()
+            if value is not None and value >= 0:
+                return value
+        # Sin estadísticas: el id más alto (índice de la PK, sin recorrer la tabla)
+        return db.session.execute(select(func.max(pk))).scalar() or 0
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        page_size = page_size or self.page_size
+        pk = self.model.__table__.c.id
+        query = self.get_query()
+        filters = self._active_filters(filters or []) if self._filters else []
+        if filters:
+            query, _, _, _ = self._apply_filters(query, None, {}, {}, filters)
+        after = request.args.get("after", type=int)
+        if after:
+            query = query.filter(pk < after)
+        rows = query.order_by(pk.desc()).limit(page_size + 1).all()
+
+        g._admin_next = rows[page_size - 1].id if len(rows) > page_size else None
+        g._admin_estimate = None if filters else self.estimated_count()
+        return None, rows[:page_size]
+
+    def render(self, template, **kwargs):
+        if template == self.list_template:
+            args = request.args.to_dict()
+            args.pop("after", None)
+            next_id = g.get("_admin_next")
+            kwargs.update(
+                after=request.args.get("after", type=int),
+                first_url=url_for(".index_view", **args),
+                next_url=url_for(".index_view", **args, after=next_id) if next_id else None,
+                estimated_count=g.get("_admin_estimate"),
+                shards=list(range(shard_count())),
+                current_shard=g.get("_shard"),
+            )
+        return super().render(template, **kwargs)
+
+
+class UserAdmin(KeysetModelView):
+    # Altas por /api/signup (directorio + shard); aquí solo se activa/desactiva
+    can_create = False
+    can_delete = False
+    column_list = ("id", "email", "is_active")
+    column_details_list = ("id", "email", "is_active")
+    form_columns = ("is_active",)
+    column_filters = (FilterEqual(User.email, "Email"),)
+
+
+class EventAdmin(KeysetModelView):
+    # Solo lectura: las escrituras pasan por la API (índice de búsqueda, archivo...)
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_list = ("id", "user.email", "title", "start", "end", "all_day")
+    column_labels = {"user.email": "User"}
+    column_filters = (IntEqualFilter(Event.user_id, "User id"),)
+
+    def get_query(self):
+        return super().get_query().options(joinedload(Event.user).options(load_only(User.email)))
+
+
+class TaskAdmin(KeysetModelView):
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_list = ("id", "user.email", "title", "date", "done")
+    column_labels = {"user.email": "User"}
+    column_filters = (
+        IntEqualFilter(Task.user_id, "User id"),
+        DateBetweenFilter(Task.date, "Date"),        # ix_task_user_id_date
+        BooleanEqualFilter(Task.done, "Done"),       # ix_task_user_id_done
+    )
+    scope_filter = "user_id"
+    scoped_filters = ("date", "done")
+
+    def get_query(self):
+        return super().get_query().options(joinedload(Task.user).options(load_only(User.email)))
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    # (KeysetModelView en lugar de ModelView: nada de COUNT(*) ni OFFSET en tablas grandes)
+    admin.add_view(UserAdmin(User, db.session))
+    admin.add_view(EventAdmin(Event, db.session))
+    admin.add_view(TaskAdmin(Task, db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(KeysetModelView(YourModelName, db.session))
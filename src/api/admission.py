@@ -0,0 +1,199 @@
+"""
+Control de admisión por clase de endpoint: límite de concurrencia + token bucket.
+
+Clases (ver `classify`):
+- auth:  /api/token, /api/signup           → clave: IP del cliente
+- bulk:  /api/events/batch, /api/export,   → clave: usuario (o IP)
+         /api/import
+- write: resto de POST/PUT/DELETE          → clave: usuario (o IP)
+- read:  GET                               → clave: usuario (o IP)
+/api/batch toma la clase de lo que contiene: bulk si incluye un endpoint bulk,
+read si todo son GET, si no write. Las subpeticiones no pasan por aquí, así que
+el batch paga una ficha por subpetición y un hueco por hilo que vaya a usar.
+
+Si la clase ya tiene `concurrency` peticiones en curso se responde 503 al
+momento; si la clave se quedó sin fichas, 429. Ambos con Retry-After, así una
+tormenta de logins o un batch grande no dejan sin servicio a las lecturas.
+
+Límites por proceso (cada worker de gunicorn tiene los suyos), configurables con
+ADMISSION_<CLASE>="concurrencia:fichas_por_segundo:ráfaga", p. ej.
+ADMISSION_AUTH=4:5:10. ADMISSION_CONTROL=0 lo desactiva.
+"""
+import os
+import math
+import threading
+from time import monotonic
+from flask import request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+# clase: (concurrencia, fichas por segundo, ráfaga)
+DEFAULT_LIMITS = {
+    "auth": (4, 5.0, 10),
+    "bulk": (2, 1.0, 3),
+    "write": (16, 10.0, 20),
+    "read": (32, 20.0, 40),
+}
+MAX_BUCKETS = 50000
+GATE_ENVIRON_KEY = "api.admission_gate"
+
+MESSAGES = {429: "Too many requests", 503: "Server busy, retry shortly"}
+
+AUTH_PATHS = ("/api/token", "/api/signup")
+BULK_PATHS = ("/api/events/batch", "/api/export", "/api/import")
+BATCH_PATH = "/api/batch"
+
+
+class Gate:
+    """Semáforo no bloqueante + un token bucket por clave."""
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._buckets = {}  # clave -> [fichas, último relleno]
+
+    def _take(self, key, cost: int = 1) -> float:
+        """Consume `cost` fichas; devuelve 0 o los segundos hasta tenerlas.
+
+        Un coste mayor que la ráfaga se admite con el bucket lleno y lo deja en
+        negativo: la clave paga la diferencia esperando antes de la siguiente.
+        """
+        need = min(cost, self.burst)
+        now = monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[key] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= need:
+                bucket[0] = tokens - cost
+                return 0.0
+            bucket[0] = tokens
+            return (need - tokens) / self.rate
+
+    def _prune(self, now):
+        # Un bucket que ya se habría rellenado del todo equivale a uno nuevo
+        for k in [k for k, (tokens, last) in self._buckets.items()
+                  if tokens + (now - last) * self.rate >= self.burst]:
+            del self._buckets[k]
+
+    def enter(self, key, cost: int = 1, slots: int = 1):
+        """None si se admite (hay que llamar a leave(slots)), o (status, retry_after)."""
+        wait = self._take(key, cost)
+        if wait:
+            return 429, max(1, math.ceil(wait))
+        taken = 0
+        while taken < slots and self._slots.acquire(blocking=False):
+            taken += 1
+        if taken < slots:
+            self.leave(taken)
+            return 503, 1
+        return None
+
+    def leave(self, slots: int = 1):
+        for _ in range(slots):
+            self._slots.release()
+
+
+def _parse_limits(name, default):
+    raw = os.getenv(f"ADMISSION_{name.upper()}")
+    if not raw:
+        return default
+    concurrency, rate, burst = raw.split(":")
+    return int(concurrency), float(rate), int(burst)
+
+
+def build_gates(limits: dict) -> dict:
+    return {name: Gate(name, *conf) for name, conf in limits.items()}
+
+
+def classify(method: str, path: str) -> str:
+    path = path.rstrip("/")
+    if path in AUTH_PATHS:
+        return "auth"
+    if path in BULK_PATHS:
+        return "bulk"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+def classify_batch(payload) -> tuple[str, int, int]:
+    """(clase, fichas, huecos) de un /api/batch: una ficha por subpetición y un
+    hueco por hilo (varios solo con "parallel" y todo GET, como en api/batch.py)."""
+    from api.batch import BATCH_MAX_PARALLEL
+
+    items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return "write", 1, 1  # cuerpo inválido: el endpoint responde 400
+    classes = {classify(str(it.get("method") or "GET").upper(), str(it.get("path") or "").split("?")[0])
+               if isinstance(it, dict) else "write" for it in items}
+    if "bulk" in classes:
+        cls = "bulk"
+    else:
+        cls = "read" if classes == {"read"} else "write"
+    parallel = cls == "read" and payload.get("parallel") is True
+    return cls, len(items), min(BATCH_MAX_PARALLEL, len(items)) if parallel else 1
+
+
+def _client_ip() -> str:
+    # Detrás de un proxy, ProxyFix (PROXY_FIX_HOPS en app.py) ya la tomó de
+    # X-Forwarded-For; leer la cabecera aquí dejaría a cada cliente elegir su clave
+    return request.remote_addr or "-"
+
+
+def _request_key(cls: str) -> str:
+    if cls != "auth":
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+            if identity is not None:
+                return f"u{identity}"
+        except Exception:
+            pass  # token inválido: lo rechazará el endpoint
+    return f"ip:{_client_ip()}"
+
+
+def rejection(status: int, retry_after: int):
+    resp = jsonify({"message": MESSAGES[status]})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+def setup_admission(app):
+    if os.getenv("ADMISSION_CONTROL", "1") == "0":
+        return
+    limits = app.config.setdefault(
+        "ADMISSION_LIMITS", {name: _parse_limits(name, conf) for name, conf in DEFAULT_LIMITS.items()})
+    gates = app.extensions["admission"] = build_gates(limits)
+
+    @app.before_request
+    def _admit():
+        if request.method == "OPTIONS" or not request.path.startswith("/api/"):
+            return None
+        if request.path.rstrip("/") == BATCH_PATH:
+            cls, cost, slots = classify_batch(request.get_json(silent=True))
+        else:
+            cls, cost, slots = classify(request.method, request.path), 1, 1
+        gate = gates[cls]
+        refused = gate.enter(_request_key(cls), cost, slots)
+        if refused is not None:
+            return rejection(*refused)
+        # En el entorno de la petición y no en `g`: las subpeticiones de
+        # /api/batch comparten `g` y su teardown no debe liberar el hueco
+        request.environ[GATE_ENVIRON_KEY] = (gate, slots)
+        return None
+
+    @app.teardown_request
+    def _release(exc):
+        admitted = request.environ.pop(GATE_ENVIRON_KEY, None)
+        if admitted is not None:
+            gate, slots = admitted
+            gate.leave(slots)
@@ -0,0 +1,153 @@
+"""
+Archivo frío: eventos terminados hace tiempo y tareas hechas antiguas.
+
+`flask archive` mueve por bloques (DELETE ... RETURNING en la tabla caliente e
+INSERT de esas mismas filas en *_archive, un commit por bloque) los eventos con
+end < horizonte y las tareas hechas con date < horizonte. Como se archiva lo que
+devolvió el DELETE, una fila editada a la vez que el job no se pierde: o sale con
+su último valor o deja de cumplir el criterio y se queda. Los ids se conservan,
+así que el índice de búsqueda sigue valiendo.
+
+Cada tabla tiene una marca de agua (archive_watermark): todo lo archivado es
+anterior a ella. Las lecturas solo consultan el archivo si el rango pedido
+empieza antes de la marca (o no tiene límite inferior). La marca se cachea por
+proceso ARCHIVE_CACHE_TTL segundos; por eso el job la publica primero y espera
+ese tiempo antes de mover filas (--no-wait para desarrollo).
+
+Editar o marcar una tarea archivada la devuelve a la tabla caliente (restore);
+borrarla la elimina del archivo.
+"""
+import threading
+from time import monotonic, sleep
+from datetime import datetime, time
+from flask import g, has_app_context
+from sqlalchemy import select, insert, delete, func
+from api.models import db, Event, Task, ArchivedEvent, ArchivedTask, ArchiveWatermark
+from api.utils import utc_now
+
+ARCHIVE_CACHE_TTL = 30.0
+
+_lock = threading.Lock()
+_cache = {}  # shard -> (marcas, expira)
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time())
+
+
+# -------------------- Marcas de agua --------------------
+
+def _cache_key():
+    return g.get("_shard") if has_app_context() else None
+
+
+def cached_watermarks(key):
+    hit = _cache.get(key)
+    if hit is not None and hit[1] > monotonic():
+        return hit[0]
+    return None
+
+
+def remember_watermarks(key, rows) -> dict:
+    marks = {"event": None, "task": None}
+    marks.update({name: before for name, before in rows})
+    with _lock:
+        _cache[key] = (marks, monotonic() + ARCHIVE_CACHE_TTL)
+    return marks
+
+
+def watermarks_query():
+    return select(ArchiveWatermark.name, ArchiveWatermark.before)
+
+
+def watermarks() -> dict:
+    """{"event": datetime | None, "task": datetime | None} del shard activo."""
+    key = _cache_key()
+    marks = cached_watermarks(key)
+    if marks is None:
+        marks = remember_watermarks(key, db.session.execute(watermarks_query()).all())
+    return marks
+
+
+def reaches(watermark, since) -> bool:
+    """¿Un rango que empieza en `since` (None = sin límite) entra en el archivo?"""
+    return watermark is not None and (since is None or _as_datetime(since) < watermark)
+
+
+def merge(hot: list, cold: list, key, reverse: bool = False) -> list:
+    """Une filas calientes y archivadas; si una fila se movió entre ambas consultas sale una vez."""
+    seen = {obj.id for obj in hot}
+    return sorted(hot + [obj for obj in cold if obj.id not in seen], key=key, reverse=reverse)
+
+
+# -------------------- Escritura sobre filas archivadas --------------------
+
+def restore(hot_model, cold_model, uid: int, item_id: int):
+    """Devuelve una fila archivada a la tabla caliente (mismo id). None si no existe."""
+    row = db.session.execute(
+        select(cold_model.__table__)
+        .where(cold_model.id == item_id, cold_model.user_id == uid)).mappings().first()
+    if row is None:
+        return None
+    values = {k: v for k, v in row.items() if k != "archived_at"}
+    db.session.execute(delete(cold_model).where(cold_model.id == item_id))
+    obj = hot_model(**values)
+    db.session.add(obj)
+    return obj
+
+
+def delete_archived(cold_model, uid: int, item_id: int):
+    """Borra una fila archivada; devuelve la fila borrada (o None)."""
+    return db.session.execute(
+        delete(cold_model).where(cold_model.id == item_id, cold_model.user_id == uid)
+        .returning(*cold_model.__table__.c)).first()
+
+
+# -------------------- Job --------------------
+
+def candidates(name: str, before: datetime):
+    """(modelo caliente, modelo de archivo, criterios) de lo que toca archivar."""
+    if name == "event":
+        return Event, ArchivedEvent, [Event.end < before]
+    return Task, ArchivedTask, [Task.done == True, Task.date < before.date()]  # noqa: E712
+
+
+def pending(name: str, before: datetime) -> int:
+    hot, _, crit = candidates(name, before)
+    return db.session.execute(select(func.count()).select_from(hot).where(*crit)).scalar()
+
+
+def publish_watermark(name: str, before: datetime) -> datetime:
+    """Sube la marca de agua (nunca la baja) y devuelve la vigente."""
+    mark = db.session.get(ArchiveWatermark, name)
+    if mark is None:
+        mark = ArchiveWatermark(name=name, before=before)
+        db.session.add(mark)
+    elif before > mark.before:
+        mark.before = before
+    current = mark.before
+    db.session.commit()
+    return current
+
+
+def move(name: str, before: datetime, chunk_size: int = 1000, pause: float = 0.0) -> int:
+    """Archiva por bloques de clave primaria; un commit por bloque."""
+    hot, cold, crit = candidates(name, before)
+    table = hot.__table__
+    total = 0
+    while True:
+        # El criterio va también fuera de la subconsulta: Postgres lo vuelve a
+        # comprobar sobre la versión actual de una fila modificada mientras tanto
+        ids = select(table.c.id).where(*crit).order_by(table.c.id).limit(chunk_size)
+        rows = db.session.execute(
+            delete(table).where(*crit, table.c.id.in_(ids)).returning(*table.c)).mappings().all()
+        if not rows:
+            return total
+        now = utc_now()
+        db.session.execute(insert(cold.__table__), [dict(r, archived_at=now) for r in rows])
+        db.session.commit()
+        total += len(rows)
+        if pause:
+            sleep(pause)
@@ -0,0 +1,244 @@
+"""
+Backfills por lotes para migraciones expand → backfill → contract.
+
+En vez de reescribir una tabla entera en una sola sentencia (o un
+batch_alter_table que en SQLite copia la tabla y en Postgres bloquea mientras
+añade un NOT NULL), el cambio se hace en tres pasos:
+
+1. expand:   añadir las columnas nuevas como NULL (sin reescribir la tabla) y
+             un trigger (`create_dual_write`) que copia cada escritura entre
+             la columna vieja y la nueva mientras conviven
+2. backfill: UPDATE ... WHERE id > :lo AND id <= :hi, lote a lote, con pausa
+             entre lotes y el avance guardado en backfill_progress
+3. contract: en otra revisión, quitar el trigger, NOT NULL (`set_not_null`) y
+             borrar las columnas antiguas
+
+El backfill va entre las dos revisiones, desde la CLI (ver b2d7e9f14c60 y
+5e8a3c1f7b94, task.due_date/completed → date/done):
+
+    $ flask backfill task_date_done --table task --set date=due_date --set done=completed --dry-run
+    $ flask backfill task_date_done --table task --set date=due_date --set done=completed --pause 0.1
+
+o desde una revisión de Alembic (p. ej. en un downgrade):
+
+    from api import backfill
+    backfill.in_migration(op, "task_due_date", "task", {"due_date": "date"})
+
+Si se interrumpe, volver a ejecutarlo continúa desde el último lote confirmado.
+"""
+import math
+from time import monotonic, sleep
+from sqlalchemy import text, select, insert, update
+from api.models import BackfillProgress
+from api.utils import utc_now
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SECONDS = 1.0  # si un lote tarda más, el siguiente es la mitad
+
+
+def ensure_progress_table(conn):
+    BackfillProgress.__table__.create(conn, checkfirst=True)
+
+
+def _quote(conn, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _bounds(conn, table: str, pk: str):
+    t, k = _quote(conn, table), _quote(conn, pk)
+    return conn.execute(text(f"SELECT MIN({k}), MAX({k}) FROM {t}")).first()
+
+
+def _progress(conn, name: str):
+    return conn.execute(select(BackfillProgress.__table__).where(BackfillProgress.name == name)).first()
+
+
+def _save(conn, name: str, last_id: int, max_id: int, rows_done: int, finished: bool = False):
+    values = {"last_id": last_id, "max_id": max_id, "rows_done": rows_done, "updated_at": utc_now(),
+              "finished_at": utc_now() if finished else None}
+    table = BackfillProgress.__table__
+    res = conn.execute(update(table).where(table.c.name == name).values(**values))
+    if res.rowcount == 0:
+        conn.execute(insert(table).values(name=name, **values))
+
+
+def _update_sql(conn, table: str, values: dict, where: str | None, pk: str):
+    assignments = ", ".join(f"{_quote(conn, col)} = {expr}" for col, expr in values.items())
+    k = _quote(conn, pk)
+    sql = f"UPDATE {_quote(conn, table)} SET {assignments} WHERE {k} > :lo AND {k} <= :hi"
+    if where:
+        sql += f" AND ({where})"
+    return text(sql)
+
+
+def estimate(conn, name: str, table: str, where: str | None = None, pk: str = "id",
+             batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.0, resume: bool = True) -> dict:
+    """Dry run: lotes pendientes y filas/tiempo estimados a partir de un lote de muestra."""
+    lo, hi = _bounds(conn, table, pk)
+    done = None
+    if resume and conn.dialect.has_table(conn, BackfillProgress.__tablename__):
+        done = _progress(conn, name)
+    if hi is None or (done is not None and done.finished_at is not None):
+        return {"name": name, "batches": 0, "rows": 0, "seconds": 0.0,
+                "finished": done is not None and done.finished_at is not None}
+    start = done.last_id if done is not None else lo - 1
+    batches = math.ceil((hi - start) / batch_size) if hi > start else 0
+
+    k = _quote(conn, pk)
+    sample_sql = f"SELECT COUNT(*) FROM {_quote(conn, table)} WHERE {k} > :lo AND {k} <= :hi"
+    if where:
+        sample_sql += f" AND ({where})"
+    t0 = monotonic()
+    sample = conn.execute(text(sample_sql), {"lo": start, "hi": start + batch_size}).scalar() or 0
+    read_seconds = monotonic() - t0
+    rows = sample if hi - start <= batch_size else round(sample / batch_size * (hi - start))
+    # Un UPDATE cuesta bastante más que contarlo: x5 como cota aproximada
+    return {"name": name, "batches": batches, "rows": rows,
+            "seconds": round(batches * (read_seconds * 5 + pause), 1), "finished": False,
+            "from_id": start, "to_id": hi}
+
+
+def run(conn, name: str, table: str, values: dict, where: str | None = None, pk: str = "id",
+        batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.0, commit: bool = True, log=print) -> int:
+    """
+    Ejecuta (o reanuda) el backfill `name`: values = {"columna": "expresión SQL"}.
+    commit=True confirma cada lote en `conn`; desde Alembic se usa in_migration().
+    Devuelve las filas actualizadas en esta ejecución.
+    """
+    ensure_progress_table(conn)
+    state = _progress(conn, name)
+    if state is not None and state.finished_at is not None:
+        log(f"{name}: already finished ({state.rows_done} rows)")
+        return 0
+
+    lo, hi = _bounds(conn, table, pk)
+    if hi is None:
+        _save(conn, name, 0, 0, 0, finished=True)
+        if commit:
+            conn.commit()
+        return 0
+
+    stmt = _update_sql(conn, table, values, where, pk)
+    last = state.last_id if state is not None else lo - 1
+    total = state.rows_done if state is not None else 0
+    updated = 0
+    size = batch_size
+    while True:
+        while last < hi:
+            upper = min(last + size, hi)
+            t0 = monotonic()
+            rows = conn.execute(stmt, {"lo": last, "hi": upper}).rowcount or 0
+            _save(conn, name, upper, hi, total + rows)
+            if commit:
+                conn.commit()
+            elapsed = monotonic() - t0
+            last, total, updated = upper, total + rows, updated + rows
+
+            # Lotes lentos (bloqueos, carga): reducir; rápidos: volver al tamaño pedido
+            if elapsed > MAX_BATCH_SECONDS:
+                size = max(1, size // 2)
+            elif size < batch_size:
+                size = min(batch_size, size * 2)
+            log(f"{name}: id <= {upper} of {hi}, {total} rows")
+            if pause:
+                sleep(pause)
+
+        # Filas insertadas mientras tanto: otra pasada hasta el nuevo máximo
+        new_hi = _bounds(conn, table, pk)[1]
+        if new_hi is None or new_hi <= hi:
+            break
+        hi = new_hi
+
+    _save(conn, name, last, hi, total, finished=True)
+    if commit:
+        conn.commit()
+    return updated
+
+
+def reset(conn, name: str):
+    """Olvida el avance de `name` (la próxima ejecución empieza de cero)."""
+    if conn.dialect.has_table(conn, BackfillProgress.__tablename__):
+        conn.execute(BackfillProgress.__table__.delete().where(BackfillProgress.name == name))
+
+
+def status(conn) -> list:
+    if not conn.dialect.has_table(conn, BackfillProgress.__tablename__):
+        return []
+    return conn.execute(select(BackfillProgress.__table__).order_by(BackfillProgress.name)).all()
+
+
+# -------------------- Alembic --------------------
+
+def in_migration(op, name: str, table: str, values: dict, **kwargs) -> int:
+    """
+    Backfill desde una revisión: fuera de la transacción de la migración
+    (AUTOCOMMIT), así cada lote se confirma y no se bloquea la tabla entera.
+    """
+    with op.get_context().autocommit_block():
+        return run(op.get_bind(), name, table, values, commit=False, **kwargs)
+
+
+def set_not_null(op, table: str, column: str):
+    """
+    NOT NULL sin recorrer la tabla con el bloqueo exclusivo tomado (Postgres):
+    CHECK ... NOT VALID + VALIDATE (bloqueo ligero) y después SET NOT NULL, que
+    reutiliza el CHECK validado. En SQLite se reescribe la tabla (solo desarrollo).
+    """
+    if op.get_bind().dialect.name != "postgresql":
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, nullable=False)
+        return
+    check = f"{table}_{column}_not_null"
+    t, c = f'"{table}"', f'"{column}"'
+    op.execute(f"ALTER TABLE {t} ADD CONSTRAINT {check} CHECK ({c} IS NOT NULL) NOT VALID")
+    op.execute(f"ALTER TABLE {t} VALIDATE CONSTRAINT {check}")
+    op.execute(f"ALTER TABLE {t} ALTER COLUMN {c} SET NOT NULL")
+    op.execute(f"ALTER TABLE {t} DROP CONSTRAINT {check}")
+
+
+def _dual_write_pg(table: str, pairs: dict) -> str:
+    insert_sql = "".join(f"    NEW.{new} := COALESCE(NEW.{new}, NEW.{old}); NEW.{old} := COALESCE(NEW.{old}, NEW.{new});\n"
+                         for new, old in pairs.items())
+    update_sql = "".join(f"    IF NEW.{new} IS DISTINCT FROM OLD.{new} THEN NEW.{old} := NEW.{new};\n"
+                         f"    ELSIF NEW.{old} IS DISTINCT FROM OLD.{old} THEN NEW.{new} := NEW.{old}; END IF;\n"
+                         for new, old in pairs.items())
+    return (f"CREATE FUNCTION {table}_dual_write() RETURNS trigger AS $$\nBEGIN\n"
+            f"  IF TG_OP = 'INSERT' THEN\n{insert_sql}  ELSE\n{update_sql}  END IF;\n"
+            "  RETURN NEW;\nEND $$ LANGUAGE plpgsql")
+
+
+def create_dual_write(op, table: str, pairs: dict):
+    """
+    Trigger que mantiene iguales cada par {columna_nueva: columna_vieja}: un
+    INSERT rellena la que falte y un UPDATE copia la que cambió a la otra. Así
+    el código viejo y el nuevo pueden escribir a la vez y no se pierde lo que
+    se escriba en una fila ya rellenada por el backfill.
+    """
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(_dual_write_pg(table, pairs))
+        op.execute(f"CREATE TRIGGER {table}_dual_write BEFORE INSERT OR UPDATE ON {table} "
+                   f"FOR EACH ROW EXECUTE FUNCTION {table}_dual_write()")
+        return
+    # SQLite no deja modificar NEW: triggers AFTER que actualizan la propia fila
+    # (sin recursive_triggers, un trigger no se vuelve a disparar a sí mismo)
+    fill = ", ".join(f"{new} = COALESCE(NEW.{new}, NEW.{old}), {old} = COALESCE(NEW.{old}, NEW.{new})"
+                     for new, old in pairs.items())
+    op.execute(f"CREATE TRIGGER {table}_dual_write_insert AFTER INSERT ON {table} "
+               f"BEGIN UPDATE {table} SET {fill} WHERE rowid = NEW.rowid; END")
+    for new, old in pairs.items():
+        op.execute(f"CREATE TRIGGER {table}_dual_write_{new} AFTER UPDATE OF {new} ON {table} "
+                   f"WHEN NEW.{new} IS NOT OLD.{new} "
+                   f"BEGIN UPDATE {table} SET {old} = NEW.{new} WHERE rowid = NEW.rowid; END")
+        op.execute(f"CREATE TRIGGER {table}_dual_write_{old} AFTER UPDATE OF {old} ON {table} "
+                   f"WHEN NEW.{old} IS NOT OLD.{old} AND NEW.{new} IS OLD.{new} "
+                   f"BEGIN UPDATE {table} SET {new} = NEW.{old} WHERE rowid = NEW.rowid; END")
+
+
+def drop_dual_write(op, table: str, pairs: dict):
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_dual_write ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_dual_write()")
+        return
+    names = ["insert"] + [col for pair in pairs.items() for col in pair]
+    for name in names:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_dual_write_{name}")
@@ -0,0 +1,120 @@
+"""
+/api/batch: varias peticiones a la API en una sola ida y vuelta.
+
+    POST /api/batch
+    {"parallel": true,
+     "requests": [{"method": "GET", "path": "/api/calendar"},
+                  {"method": "GET", "path": "/api/tasks?undated=1"}]}
+    → {"responses": [{"status": 200, "body": [...]}, {"status": 200, "body": [...]}]}
+
+Los hooks de cada petición (CORS, admisión, shard del usuario, réplica) se
+ejecutan una vez, para el batch; cada subpetición solo llama a su vista del
+blueprint `api`, en el mismo contexto de aplicación (mismo `g`, misma sesión de
+BD) y con la misma cabecera Authorization. Una subpetición que falla (status >=
+400) hace rollback de lo que dejara pendiente y no corta las demás.
+
+Con "parallel": true y solo GET, las subpeticiones se reparten entre
+BATCH_MAX_PARALLEL hilos, cada uno con su propia sesión (una sesión no se
+comparte entre hilos). Con escrituras siempre van en orden.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, request
+from werkzeug.test import EnvironBuilder
+from api.models import db
+from api.replica import choose_route
+from api.utils import APIException
+
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_PARALLEL = 4
+METHODS = ("GET", "POST", "PUT", "DELETE")
+SHARED_G = ("_shard", "_db_route")  # lo que decidieron los hooks del batch
+# Autenticación fuera: cada una tiene su propio límite por IP (api/admission.py).
+# Export / import tampoco: leen y escriben flujos NDJSON, no JSON
+EXCLUDED_ENDPOINTS = ("api.batch_requests", "api.signup", "api.login", "api.refresh_token", "api.logout",
+                      "api.export_user", "api.import_user")
+
+
+def parse(payload) -> list:
+    """Valida el cuerpo del batch y devuelve [(método, path, cuerpo)]."""
+    items = (payload or {}).get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise APIException("'requests' must be a non-empty list", 400)
+    if len(items) > BATCH_MAX_REQUESTS:
+        raise APIException(f"At most {BATCH_MAX_REQUESTS} requests per batch", 400)
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise APIException("Each request must be an object", 400)
+        method = str(item.get("method") or "GET").upper()
+        path = item.get("path")
+        if method not in METHODS:
+            raise APIException(f"Unsupported method: {method}", 400)
+        if not isinstance(path, str) or not path.startswith("/api/"):
+            raise APIException("Each path must start with /api/", 400)
+        parsed.append((method, path, item.get("body")))
+    return parsed
+
+
+def only_reads(items) -> bool:
+    return all(method == "GET" for method, _, _ in items)
+
+
+def _environ(method, path, body):
+    path, _, query = path.partition("?")
+    builder = EnvironBuilder(
+        path=path, query_string=query, method=method, base_url=request.host_url,
+        json=body if body is not None and method != "GET" else None,
+        headers={k: v for k, v in request.headers.items() if k == "Authorization"},
+        environ_base={"REMOTE_ADDR": request.remote_addr})
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _dispatch(app, environ) -> tuple[int, bytes]:
+    with app.request_context(environ):
+        if request.routing_exception is None and (
+                request.blueprint != "api" or request.endpoint in EXCLUDED_ENDPOINTS):
+            return 404, b'{"message": "Not found"}'
+        try:
+            rv = app.dispatch_request()
+        except Exception as e:  # APIException, 404/405 de enrutado...
+            rv = app.handle_user_exception(e)
+        resp = app.make_response(rv)
+        if resp.is_json and not resp.is_streamed:
+            body = resp.get_data()
+        else:
+            body = json.dumps({"message": resp.status}).encode()
+        return resp.status_code, body
+
+
+def _dispatch_in_thread(app, shared, environ):
+    with app.app_context():
+        for name, value in shared.items():
+            setattr(g, name, value)
+        return _dispatch(app, environ)
+
+
+def run(items, parallel: bool = False) -> bytes:
+    """Ejecuta las subpeticiones y devuelve el JSON de la respuesta ya serializado."""
+    app = current_app._get_current_object()
+    environs = [_environ(*item) for item in items]
+    if "_db_route" in g and only_reads(items):
+        g._db_route = choose_route(app, "GET")  # el batch es un POST, pero solo lee
+    if parallel and len(items) > 1 and only_reads(items):
+        shared = {name: g.get(name) for name in SHARED_G if name in g}
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_PARALLEL, len(items))) as pool:
+            results = list(pool.map(lambda env: _dispatch_in_thread(app, shared, env), environs))
+    else:
+        results = []
+        for environ in environs:
+            status, body = _dispatch(app, environ)
+            if status >= 400:
+                db.session.rollback()
+            results.append((status, body))
+
+    # Los cuerpos ya vienen en JSON: se encajan tal cual, sin volver a parsearlos
+    parts = [b'{"status": %d, "body": %s}' % (status, body.strip() or b"null") for status, body in results]
+    return b'{"responses": [' + b", ".join(parts) + b"]}"
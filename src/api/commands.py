@@ -1,12 +1,26 @@
 
+import os
+import time
 import click
-from api.models import db, User
+from datetime import date, datetime, timedelta
+from api.models import db
+from api import sharding
+from api.shard_router import shard_count, use_shard, bind_name
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
 Flask commands are usefull to run cronjobs or tasks outside of the API but sill in integration 
 with youy database, for example: Import the price of bitcoin every night as 12am
 """
+def _all_shards():
+    """Shards a recorrer por los comandos de mantenimiento ([None] sin sharding)."""
+    return list(range(shard_count())) if shard_count() else [None]
+
+
+def _label(shard):
+    return "" if shard is None else f"shard{shard}: "
+
+
 def setup_commands(app):
     
     """ 
@@ -19,16 +33,273 @@ def setup_commands(app):
     def insert_test_users(count):
         print("Creating test users")
         for x in range(1, int(count) + 1):
-            user = User()
-            user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
-            db.session.add(user)
-            db.session.commit()
-            print("User: ", user.email, " created.")
+            email = "test_user" + str(x) + "@test.com"
+            sharding.create_user(email, "123456")
+            print("User: ", email, " created.")
 
         print("All test users created")
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    @app.cli.command("explain-tasks")
+    @click.option("--user-id", default=1, type=int, help="user whose task queries are explained")
+    def explain_tasks(user_id):
+        """Shows the query plan of every /api/tasks filter on the current database."""
+        from sqlalchemy import text
+        from api.models import Task
+        from api.routes import build_task_query
+
+        today = date.today().isoformat()
+        views = {
+            "all": {},
+            "date": {"date": today},
+            "range": {"from": today, "to": today},
+            "done": {"done": "true"},
+            "open": {"done": "false"},
+            "undated": {"undated": "1"},
+            "overdue": {"overdue": "1"},
+        }
+        shard = sharding.shard_for_user(user_id) if shard_count() else None
+        with use_shard(shard):
+            dialect = db.session.get_bind(mapper=Task.__mapper__).dialect
+            prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+            for name, args in views.items():
+                stmt = build_task_query(user_id, args).statement
+                sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+                print(f"== {name} {args}")
+                for row in db.session.execute(text(prefix + sql)):
+                    print("   ", " | ".join(str(col) for col in row))
+
+    @app.cli.command("search-reindex")
+    @click.option("--user-id", default=None, type=int, help="only reindex this user")
+    @click.option("--chunk-size", default=1000, type=int)
+    def search_reindex(user_id, chunk_size):
+        """Rebuilds the full-text search index from the event and task tables."""
+        from api import search
+        if user_id is not None:
+            shards = [sharding.shard_for_user(user_id) if shard_count() else None]
+        else:
+            shards = _all_shards()
+        total = 0
+        for shard in shards:
+            with use_shard(shard):
+                total += search.reindex(user_id=user_id, chunk_size=chunk_size)
+                db.session.commit()
+        print(f"Indexed {total} documents")
+
+    @app.cli.command("occupancy-rebuild")
+    @click.option("--user-id", default=None, type=int, help="only rebuild this user")
+    def occupancy_rebuild(user_id):
+        """Rebuilds the free-slot bitmaps (event_occupancy) from the events."""
+        from sqlalchemy import select
+        from api import occupancy
+        from api.models import User
+        if user_id is not None:
+            shards = [sharding.shard_for_user(user_id) if shard_count() else None]
+        else:
+            shards = _all_shards()
+        for shard in shards:
+            with use_shard(shard):
+                ids = [user_id] if user_id is not None else db.session.scalars(select(User.id)).all()
+                days = 0
+                for uid in ids:
+                    days += occupancy.rebuild_user(uid)
+                    db.session.commit()
+            print(f"{_label(shard)}{len(ids)} users, {days} days")
+
+    def _resolve_user(user_id, email):
+        """(user_id, shard) a partir de --user-id o --email."""
+        if user_id is None and not email:
+            raise click.UsageError("pass --user-id or --email")
+        if user_id is None:
+            user = sharding.find_user_by_email(email)
+            if user is None:
+                raise click.ClickException(f"No user with email {email}")
+            user_id = user.id
+        shard = sharding.shard_for_user(user_id) if shard_count() else None
+        return user_id, shard
+
+    @app.cli.command("export-user")
+    @click.option("--user-id", default=None, type=int)
+    @click.option("--email", default=None)
+    @click.option("-o", "--output", type=click.File("wb"), default="-", help="file to write (default: stdout)")
+    def export_user(user_id, email, output):
+        """Writes all the events and tasks of a user as NDJSON (same format as /api/export)."""
+        from api import portability
+        user_id, shard = _resolve_user(user_id, email)
+        started = time.perf_counter()
+        size = 0
+        with use_shard(shard):
+            for chunk in portability.export(user_id):
+                output.write(chunk)
+                size += len(chunk)
+        click.echo(f"{_label(shard)}user {user_id}: {size / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s",
+                   err=True)
+
+    @app.cli.command("import-user")
+    @click.argument("file", type=click.File("rb"))
+    @click.option("--user-id", default=None, type=int)
+    @click.option("--email", default=None, help="target account (default: the email in the file)")
+    @click.option("--job", default=None, help="import name used to resume (default: the file name)")
+    @click.option("--replace", is_flag=True, help="delete the user's events and tasks before importing")
+    def import_user(file, user_id, email, job, replace):
+        """Imports an NDJSON export into an existing account; re-running it resumes where it stopped."""
+        import json
+        from api import portability
+        from api.utils import APIException
+        if user_id is None and not email:
+            if not file.seekable():
+                raise click.UsageError("pass --user-id or --email when reading from stdin")
+            header = json.loads(file.readline() or b"{}")
+            email = header.get("email") if header.get("type") == "user" else None
+            file.seek(0)
+        user_id, shard = _resolve_user(user_id, email)
+        job = job or os.path.basename(file.name)
+        started = time.perf_counter()
+        with use_shard(shard):
+            try:
+                state = portability.load(user_id, portability.read_lines(file), job, replace=replace,
+                                         log=lambda msg: print(f"{_label(shard)}{msg}"))
+            except APIException as e:
+                raise click.ClickException(e.message)
+        print(f"{_label(shard)}{job}: {state.events} events, {state.tasks} tasks, {state.line} lines "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    @app.cli.command("shards-init")
+    def shards_init():
+        """Creates the user tables (and search index) on every shard in SHARD_DATABASE_URLS."""
+        if not shard_count():
+            print("Sharding is disabled (SHARD_DATABASE_URLS is empty)")
+            return
+        for shard in sharding.init_shards():
+            print(f"shard{shard}: ok")
+
+    @app.cli.command("shards-rebalance")
+    @click.option("--dry-run", is_flag=True, help="only print the users that would move")
+    @click.option("--limit", default=None, type=int, help="move at most this many users")
+    @click.option("--no-wait", is_flag=True,
+                  help="skip the waits for workers to see each move (only with the API stopped)")
+    def shards_rebalance(dry_run, limit, no_wait):
+        """Moves users whose hash-ring shard differs from the one in the directory."""
+        plan = sharding.rebalance_plan(limit=limit)
+        print(f"{len(plan)} users to move")
+        wait = 0 if no_wait else sharding.SHARD_CACHE_TTL
+        for uid, source, target in plan:
+            if dry_run:
+                print(f"  user {uid}: shard{source} -> shard{target}")
+                continue
+            try:
+                rows = sharding.move_user(uid, source, target, wait=wait)
+            except RuntimeError as e:
+                print(f"  user {uid}: {e}")
+                continue
+            print(f"  user {uid}: shard{source} -> shard{target} ({rows} rows)")
+
+    @app.cli.command("archive")
+    @click.option("--events-days", default=int(os.getenv("ARCHIVE_EVENTS_AFTER_DAYS", 365)), type=int,
+                  help="archive events that ended more than N days ago")
+    @click.option("--tasks-days", default=int(os.getenv("ARCHIVE_TASKS_AFTER_DAYS", 180)), type=int,
+                  help="archive done tasks dated more than N days ago")
+    @click.option("--chunk-size", default=1000, type=int)
+    @click.option("--pause", default=0.0, type=float, help="seconds to sleep between chunks")
+    @click.option("--dry-run", is_flag=True, help="only count the rows that would move")
+    @click.option("--no-wait", is_flag=True, help="skip the wait for workers to see the new watermark")
+    def archive_old(events_days, tasks_days, chunk_size, pause, dry_run, no_wait):
+        """Moves old events and long-done tasks to the archive tables."""
+        from api import archive
+        today = datetime.combine(date.today(), datetime.min.time())
+        horizons = {"event": today - timedelta(days=events_days),
+                    "task": today - timedelta(days=tasks_days)}
+        shards = _all_shards()
+        if dry_run:
+            for shard in shards:
+                with use_shard(shard):
+                    counts = {name: archive.pending(name, before) for name, before in horizons.items()}
+                print(f"{_label(shard)}events {counts['event']}, tasks {counts['task']} (dry run)")
+            return
+
+        # 1) marcas de agua en todos los shards, 2) esperar a que caduquen las cachés, 3) mover
+        for shard in shards:
+            with use_shard(shard):
+                for name, before in horizons.items():
+                    archive.publish_watermark(name, before)
+        if not no_wait:
+            print(f"Waiting {archive.ARCHIVE_CACHE_TTL:.0f}s for workers to pick up the new watermarks")
+            time.sleep(archive.ARCHIVE_CACHE_TTL)
+        for shard in shards:
+            with use_shard(shard):
+                counts = {name: archive.move(name, before, chunk_size, pause) for name, before in horizons.items()}
+            print(f"{_label(shard)}events {counts['event']}, tasks {counts['task']} archived")
+
+    @app.cli.command("tokens-prune")
+    def tokens_prune():
+        """Deletes expired rows from revoked_token (run it daily)."""
+        from api import tokens
+        print(f"Deleted {tokens.prune()} expired revocations")
+
+    @app.cli.command("backfill")
+    @click.argument("name")
+    @click.option("--table", required=True, help="table to update, in primary key ranges")
+    @click.option("--set", "assignments", multiple=True, required=True, metavar="COLUMN=SQL",
+                  help="column to fill and the SQL expression for it, e.g. due_date=date (repeatable)")
+    @click.option("--where", default=None, help="extra SQL condition, e.g. \"due_date IS NULL\"")
+    @click.option("--pk", default="id", help="integer primary key column")
+    @click.option("--batch-size", default=1000, type=int)
+    @click.option("--pause", default=0.0, type=float, help="seconds to sleep between batches")
+    @click.option("--dry-run", is_flag=True, help="only estimate batches, rows and time")
+    @click.option("--reset", is_flag=True, help="forget saved progress and start from the first id")
+    @click.option("--if-column", "if_columns", multiple=True, metavar="COLUMN",
+                  help="skip databases whose table lacks this column, e.g. shards created after a rename")
+    def backfill_cmd(name, table, assignments, where, pk, batch_size, pause, dry_run, reset, if_columns):
+        """Fills columns in small id-ranged batches; re-running resumes where it stopped."""
+        from sqlalchemy import inspect
+        from api import backfill
+        values = dict(a.split("=", 1) for a in assignments)
+        for shard in _all_shards():
+            engine = db.engine if shard is None else db.engines[bind_name(shard)]
+            with engine.connect() as conn:
+                if if_columns:
+                    missing = set(if_columns) - {c["name"] for c in inspect(conn).get_columns(table)}
+                    if missing:
+                        print(f"{_label(shard)}{name}: skipped, {table} has no {', '.join(sorted(missing))}")
+                        continue
+                if dry_run:
+                    est = backfill.estimate(conn, name, table, where, pk, batch_size, pause, resume=not reset)
+                    if est["finished"]:
+                        print(f"{_label(shard)}{name} already finished")
+                    else:
+                        print(f"{_label(shard)}{name}: {est['batches']} batches, ~{est['rows']} rows, "
+                              f"~{est['seconds']}s (dry run)")
+                    continue
+                if reset:
+                    backfill.reset(conn, name)
+                    conn.commit()
+                rows = backfill.run(conn, name, table, values, where, pk, batch_size, pause,
+                                    log=lambda msg: print(f"{_label(shard)}{msg}"))
+            print(f"{_label(shard)}{name}: {rows} rows updated")
+
+    @app.cli.command("backfill-status")
+    def backfill_status():
+        """Shows the saved progress of every backfill."""
+        from api import backfill
+        for shard in _all_shards():
+            engine = db.engine if shard is None else db.engines[bind_name(shard)]
+            with engine.connect() as conn:
+                for row in backfill.status(conn):
+                    state = f"finished {row.finished_at:%Y-%m-%d %H:%M}" if row.finished_at else \
+                        f"at id {row.last_id} of {row.max_id}"
+                    print(f"{_label(shard)}{row.name}: {row.rows_done} rows, {state}")
+
+    @app.cli.command("query-budgets")
+    def query_budgets():
+        """Lists the SQL statement budget of every API endpoint, and the exempt ones."""
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            view = app.view_functions[rule.endpoint]
+            budget = getattr(view, "query_budget", None)
+            if budget is not None:
+                per_method = "".join(f", {m}={n}" for m, n in budget.per_method.items())
+                print(f"{rule.rule}: {budget.max_statements}{per_method}")
+            elif hasattr(view, "query_budget_exempt"):
+                print(f"{rule.rule}: exempt ({view.query_budget_exempt})")
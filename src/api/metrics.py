@@ -0,0 +1,213 @@
+"""
+Instrumentación por petición: tiempos por fase, estadísticas SQL, cabecera
+Server-Timing y un endpoint /metrics en formato de texto de Prometheus.
+
+Se activa con METRICS_ENABLED=1. Desactivado no se registra ningún hook, así
+que el coste es cero. Cada worker de gunicorn mantiene sus propios contadores.
+
+Fases medidas:
+- jwt:       decodificación y verificación del token (flask_jwt_extended)
+- db:        tiempo dentro del driver de la base de datos (eventos del Engine)
+- serialize: volcado de la respuesta a JSON (app.json)
+- app:       el resto (lógica de la vista, hooks, etc.)
+"""
+import os
+import threading
+from time import perf_counter
+from flask import g, request, has_request_context, Response
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended.config import config as jwt_config
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+PHASES = ("jwt", "db", "serialize", "app")
+
+
+class RequestStats:
+    __slots__ = ("started", "jwt", "jwt_started", "db", "statements", "serialize")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.jwt = 0.0
+        self.jwt_started = None
+        self.db = 0.0
+        self.statements = 0
+        self.serialize = 0.0
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for le, c in zip(self.buckets, self.counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = {}      # (endpoint, method) -> Histogram
+        self.db_time = {}       # (endpoint, method) -> Histogram
+        self.statements = {}    # (endpoint, method) -> Histogram
+        self.phases = {}        # (endpoint, method, phase) -> segundos acumulados
+        self.responses = {}     # (endpoint, method, status) -> total
+
+    def record(self, endpoint, method, status, stats: RequestStats, total: float):
+        key = (endpoint, method)
+        app_time = max(0.0, total - stats.jwt - stats.db - stats.serialize)
+        with self.lock:
+            if key not in self.duration:
+                self.duration[key] = Histogram(LATENCY_BUCKETS)
+                self.db_time[key] = Histogram(LATENCY_BUCKETS)
+                self.statements[key] = Histogram(STATEMENT_BUCKETS)
+            self.duration[key].observe(total)
+            self.db_time[key].observe(stats.db)
+            self.statements[key].observe(stats.statements)
+            for phase, value in zip(PHASES, (stats.jwt, stats.db, stats.serialize, app_time)):
+                self.phases[key + (phase,)] = self.phases.get(key + (phase,), 0.0) + value
+            rkey = key + (status,)
+            self.responses[rkey] = self.responses.get(rkey, 0) + 1
+
+    def render(self) -> str:
+        out = []
+        with self.lock:
+            out.append("# HELP http_requests_total Requests by endpoint, method and status.")
+            out.append("# TYPE http_requests_total counter")
+            for (ep, m, status), n in sorted(self.responses.items()):
+                out.append(f'http_requests_total{{endpoint="{ep}",method="{m}",status="{status}"}} {n}')
+
+            for name, help_text, data in (
+                ("http_request_duration_seconds", "Request latency.", self.duration),
+                ("http_request_db_seconds", "Time spent in the database per request.", self.db_time),
+                ("http_request_sql_statements", "SQL statements per request.", self.statements),
+            ):
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} histogram")
+                for (ep, m), hist in sorted(data.items()):
+                    out.extend(hist.render(name, f'endpoint="{ep}",method="{m}"'))
+
+            out.append("# HELP http_request_phase_seconds_total Accumulated time per request phase.")
+            out.append("# TYPE http_request_phase_seconds_total counter")
+            for (ep, m, phase), v in sorted(self.phases.items()):
+                out.append(f'http_request_phase_seconds_total{{endpoint="{ep}",method="{m}",phase="{phase}"}} {v:.6f}')
+        return "\n".join(out) + "\n"
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get("_request_stats")
+    return None
+
+
+# -------------------- SQL (eventos del Engine) --------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_query_start")
+    if not starts:
+        return
+    elapsed = perf_counter() - starts.pop()
+    stats = _current_stats()
+    if stats is not None:
+        stats.db += elapsed
+        stats.statements += 1
+
+
+# -------------------- Serialización --------------------
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        stats = _current_stats()
+        if stats is None:
+            return super().dumps(obj, **kwargs)
+        t0 = perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats.serialize += perf_counter() - t0
+
+
+def setup_metrics(app, jwt):
+    app.config.setdefault("METRICS_ENABLED", os.getenv("METRICS_ENABLED") == "1")
+    if not app.config["METRICS_ENABLED"]:
+        return None
+
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+    app.json = TimedJSONProvider(app)
+
+    # Engine como clase: cubre también los binds adicionales
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    # JWT: la clave se pide justo antes de verificar la firma y el callback
+    # de verificación se ejecuta al final de la validación del token
+    @jwt.decode_key_loader
+    def _decode_key(jwt_header, jwt_payload):
+        stats = _current_stats()
+        if stats is not None:
+            stats.jwt_started = perf_counter()
+        return jwt_config.decode_key
+
+    @jwt.token_verification_loader
+    def _token_verified(jwt_header, jwt_payload):
+        stats = _current_stats()
+        if stats is not None and stats.jwt_started is not None:
+            stats.jwt += perf_counter() - stats.jwt_started
+            stats.jwt_started = None
+        return True
+
+    @app.before_request
+    def _start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def _finish_request_stats(resp):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return resp
+        total = perf_counter() - stats.started
+        app_time = max(0.0, total - stats.jwt - stats.db - stats.serialize)
+        resp.headers["Server-Timing"] = ", ".join([
+            f"jwt;dur={stats.jwt * 1000:.2f}",
+            f'db;dur={stats.db * 1000:.2f};desc="{stats.statements} queries"',
+            f"serialize;dur={stats.serialize * 1000:.2f}",
+            f"app;dur={app_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+        resp.headers.setdefault("Timing-Allow-Origin", "*")
+        registry.record(request.endpoint or "unmatched", request.method, resp.status_code, stats, total)
+        return resp
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return registry
@@ -1,11 +1,14 @@
 # src/api/models.py
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, ForeignKey, DateTime, Date, Text
+from sqlalchemy import String, Boolean, BigInteger, ForeignKey, DateTime, Date, Text, Index, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date as PyDate  # ← tipos Python para anotaciones
+from api.replica import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession: lecturas GET a la réplica si está configurada (api/replica.py).
+# El commit expira los objetos: los endpoints serializan la respuesta antes de él
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class User(db.Model):
@@ -34,8 +37,21 @@ class User(db.Model):
         }
 
 
+class UserDirectory(db.Model):
+    """email → (id, shard). Vive siempre en la BD principal (ver api/shard_router.py)."""
+    __tablename__ = "user_directory"
+
+    id: Mapped[int] = mapped_column(primary_key=True)   # mismo id que User en su shard
+    email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
+    shard: Mapped[int] = mapped_column(nullable=False, default=0)
+    # True mientras `flask shards-rebalance` lo copia a otro shard: se rechazan sus escrituras
+    moving: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False, server_default=text("false"))
+
+
 class Event(db.Model):
     __tablename__ = "event"
+    # AUTOINCREMENT en SQLite: los ids no se reutilizan al archivar (api/archive.py)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False, index=True)
@@ -66,9 +82,18 @@ class Event(db.Model):
 
 class Task(db.Model):
     __tablename__ = "task"
+    __table_args__ = (
+        # user_id va primero: también sirve para "todas las tareas del usuario"
+        Index("ix_task_user_id_date", "user_id", "date"),
+        Index("ix_task_user_id_done", "user_id", "done"),
+        # parcial: solo pendientes (vista "overdue")
+        Index("ix_task_user_open_date", "user_id", "date",
+              sqlite_where=text("done = 0"), postgresql_where=text("done = false")),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     done: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
 
@@ -85,3 +110,106 @@ class Task(db.Model):
             "date": self.date.isoformat() if self.date else None,
             "user_id": self.user_id
         }
+
+
+class Occupancy(db.Model):
+    """Huecos de 15 min ocupados por día (api/occupancy.py): am = 00:00-12:00, pm = 12:00-24:00."""
+    __tablename__ = "event_occupancy"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
+    day: Mapped[PyDate] = mapped_column(Date, primary_key=True)
+    am: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    pm: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# -------------------- Archivo (api/archive.py) --------------------
+# Mismas columnas e ids que Event/Task; `flask archive` mueve aquí lo antiguo.
+
+class ArchivedEvent(db.Model):
+    __tablename__ = "event_archive"
+    __table_args__ = (Index("ix_event_archive_user_id_start", "user_id", "start"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    # title/notes con los tipos de la tabla event tras 42f3492ca5c5 (String(200)/Text):
+    # en Postgres un valor más largo haría fallar archive.move
+    title: Mapped[str] = mapped_column(String(200), nullable=False)
+    start: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+    end: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+    all_day: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
+    color: Mapped[str] = mapped_column(String(20), nullable=True)
+    notes: Mapped[str] = mapped_column(Text, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+
+    serialize = Event.serialize
+
+
+class ArchivedTask(db.Model):
+    __tablename__ = "task_archive"
+    __table_args__ = (Index("ix_task_archive_user_id_date", "user_id", "date"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    title: Mapped[str] = mapped_column(String(200), nullable=False)
+    done: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=True)
+    date: Mapped[PyDate] = mapped_column(Date, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+
+    serialize = Task.serialize
+
+
+class ArchiveWatermark(db.Model):
+    """Todo lo archivado de `name` ("event" / "task") es anterior a `before`."""
+    __tablename__ = "archive_watermark"
+
+    name: Mapped[str] = mapped_column(String(20), primary_key=True)
+    before: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+
+
+class BackfillProgress(db.Model):
+    """Avance de cada backfill por lotes (api/backfill.py): se reanuda desde last_id."""
+    __tablename__ = "backfill_progress"
+
+    name: Mapped[str] = mapped_column(String(120), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    max_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    rows_done: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=True)
+
+
+class ImportProgress(db.Model):
+    """Avance de cada importación NDJSON (api/portability.py): se reanuda desde `line`.
+
+    Vive en el shard del usuario y se actualiza en la misma transacción que cada lote.
+    """
+    __tablename__ = "import_progress"
+    __table_args__ = (UniqueConstraint("user_id", "job", name="uq_import_progress_user_job"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    job: Mapped[str] = mapped_column(String(120), nullable=False)
+    line: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    events: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    tasks: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=True)
+
+    def serialize(self):
+        return {
+            "job": self.job,
+            "line": self.line,
+            "events": self.events,
+            "tasks": self.tasks,
+            "finished": self.finished_at is not None,
+        }
+
+
+class RevokedToken(db.Model):
+    """jti o sid revocados (api/tokens.py). Vive siempre en la BD principal."""
+    __tablename__ = "revoked_token"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False, index=True)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), nullable=False, index=True)
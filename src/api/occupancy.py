@@ -0,0 +1,218 @@
+"""
+Mapa de ocupación por usuario y día para buscar huecos libres (/api/slots).
+
+Cada día son 96 huecos de 15 minutos; el bit i es [i*15min, (i+1)*15min). Se
+guarda en event_occupancy partido en dos enteros de 48 bits (am: huecos 0-47,
+pm: 48-95) para que quepan en un BIGINT y la BD pueda hacer el OR ella misma.
+Sin fila para un día = día libre.
+
+Lo mantienen las escrituras de eventos (routes.py):
+- crear: `add` hace un upsert con OR de los huecos del evento (sin leer nada)
+- editar / borrar: `rebuild` recalcula los días afectados a partir de los
+  eventos (y de los archivados si el día llega a la marca de agua del archivo)
+
+Los eventos de día completo no ocupan huecos (cumpleaños, festivos...).
+
+`free_slots` encadena los días del rango en un solo entero y encuentra con
+desplazamientos y AND los inicios donde caben `duration` huecos libres seguidos:
+unos microsegundos para una semana (672 bits).
+"""
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import select, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from api.models import db, Event, ArchivedEvent, Occupancy
+from api import archive
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+HALF = SLOTS_PER_DAY // 2
+HALF_MASK = (1 << HALF) - 1
+DAY = timedelta(days=1)
+SLOT = timedelta(minutes=SLOT_MINUTES)
+REBUILD_CHUNK = 5000
+
+_stmts = {}  # (dialecto, merge) -> INSERT ... ON CONFLICT
+
+
+def split(bits: int) -> tuple[int, int]:
+    return bits & HALF_MASK, bits >> HALF
+
+
+def join(am: int, pm: int) -> int:
+    return (pm << HALF) | am
+
+
+def spans(start: datetime, end: datetime) -> dict:
+    """{día: bits} de los huecos que toca [start, end) (basta con rozarlos)."""
+    out = {}
+    day = start.date()
+    while True:
+        day_start = datetime.combine(day, time())
+        if day_start >= end:
+            break
+        lo = max(start, day_start) - day_start
+        hi = min(end, day_start + DAY) - day_start
+        first = lo // SLOT
+        last = -(-hi // SLOT)  # redondeo hacia arriba
+        if last > first:
+            out[day] = ((1 << last) - 1) ^ ((1 << first) - 1)
+        day += DAY
+    return out
+
+
+def event_spans(events) -> dict:
+    out = {}
+    for ev in events:
+        if ev.all_day:
+            continue
+        for day, bits in spans(ev.start, ev.end).items():
+            out[day] = out.get(day, 0) | bits
+    return out
+
+
+def _upsert(uid: int, days: dict, merge: bool):
+    """Una sola sentencia (executemany) para todos los días."""
+    if not days:
+        return
+    rows = [{"user_id": uid, "day": day, "am": am, "pm": pm}
+            for day, (am, pm) in ((d, split(bits)) for d, bits in days.items())]
+    dialect = db.session.get_bind(mapper=Occupancy.__mapper__).dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        for row in rows:
+            current = db.session.get(Occupancy, (uid, row["day"])) if merge else None
+            if current is not None:
+                row["am"] |= current.am
+                row["pm"] |= current.pm
+            db.session.merge(Occupancy(**row))
+        return
+    stmt = _stmts.get((dialect, merge))
+    if stmt is None:
+        # Construir el INSERT ... ON CONFLICT cuesta más que ejecutarlo: se hace una vez
+        stmt = _stmts[(dialect, merge)] = _upsert_stmt(dialect, merge)
+    db.session.execute(stmt, rows)
+
+
+def _upsert_stmt(dialect: str, merge: bool):
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(Occupancy)
+    table = Occupancy.__table__
+    if merge:
+        values = {"am": table.c.am.op("|")(stmt.excluded.am), "pm": table.c.pm.op("|")(stmt.excluded.pm)}
+    else:
+        values = {"am": stmt.excluded.am, "pm": stmt.excluded.pm}
+    return stmt.on_conflict_do_update(index_elements=["user_id", "day"], set_=values)
+
+
+def add(uid: int, events):
+    """Eventos nuevos: OR de sus huecos sobre lo que ya hubiera."""
+    _upsert(uid, event_spans(events), merge=True)
+
+
+def _ranges(days) -> list:
+    """Días sueltos → [(desde, hasta)] de rangos contiguos (hasta exclusivo)."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + DAY
+        else:
+            ranges.append([day, day + DAY])
+    return [(datetime.combine(a, time()), datetime.combine(b, time())) for a, b in ranges]
+
+
+def rebuild(uid: int, days):
+    """Recalcula `days` desde los eventos (tras editar o borrar)."""
+    days = set(days)
+    if not days:
+        return
+    ranges = _ranges(days)
+    models = [Event]
+    if archive.reaches(archive.watermarks()["event"], ranges[0][0]):
+        models.append(ArchivedEvent)
+    bits = dict.fromkeys(days, 0)
+    for model in models:
+        overlap = or_(*[(model.start < hi) & (model.end > lo) for lo, hi in ranges])
+        rows = db.session.execute(
+            select(model.start, model.end, model.all_day).where(model.user_id == uid, overlap)).all()
+        for day, b in event_spans(rows).items():
+            if day in bits:
+                bits[day] |= b
+    _upsert(uid, bits, merge=False)
+
+
+def rebuild_user(uid: int) -> int:
+    """Rehace el mapa entero de un usuario (CLI, mover de shard). Devuelve los días."""
+    db.session.execute(Occupancy.__table__.delete().where(Occupancy.user_id == uid))
+    bits = {}
+    for model in (Event, ArchivedEvent):
+        after = 0
+        while True:
+            rows = db.session.execute(
+                select(model.id, model.start, model.end, model.all_day)
+                .where(model.user_id == uid, model.id > after)
+                .order_by(model.id).limit(REBUILD_CHUNK)).all()
+            if not rows:
+                break
+            after = rows[-1].id
+            for day, b in event_spans(rows).items():
+                bits[day] = bits.get(day, 0) | b
+    _upsert(uid, bits, merge=True)
+    return len(bits)
+
+
+def clear_user(uid: int):
+    db.session.execute(Occupancy.__table__.delete().where(Occupancy.user_id == uid))
+
+
+# -------------------- Búsqueda de huecos --------------------
+
+def busy(uid: int, first: date, last: date) -> int:
+    """Huecos ocupados de first..last (inclusive) en un solo entero; bit 0 = first 00:00."""
+    rows = db.session.execute(
+        select(Occupancy.day, Occupancy.am, Occupancy.pm)
+        .where(Occupancy.user_id == uid, Occupancy.day >= first, Occupancy.day <= last)).all()
+    bits = 0
+    for day, am, pm in rows:
+        bits |= join(am, pm) << ((day - first).days * SLOTS_PER_DAY)
+    return bits
+
+
+def window_mask(n_days: int, day_from: int, day_to: int) -> int:
+    """Huecos [day_from, day_to) de cada uno de los n_days días."""
+    one = ((1 << day_to) - 1) ^ ((1 << day_from) - 1)
+    mask = 0
+    for i in range(n_days):
+        mask |= one << (i * SLOTS_PER_DAY)
+    return mask
+
+
+def free_slots(uid: int, start: datetime, end: datetime, duration: int, limit: int = 1,
+               hours: tuple[int, int] | None = None) -> list:
+    """
+    Hasta `limit` inicios (alineados a 15 min) en [start, end) con `duration`
+    minutos libres seguidos. `hours` = (hueco inicial, hueco final) de cada día.
+    """
+    first = start.date()
+    n_days = (end - datetime.combine(first, time()) - timedelta(microseconds=1)) // DAY + 1
+    origin = datetime.combine(first, time())
+    lo = -(-(start - origin) // SLOT)
+    hi = (end - origin) // SLOT
+    need = -(-duration // SLOT_MINUTES)
+    if hi - lo < need:
+        return []
+
+    free = ~busy(uid, first, first + timedelta(days=n_days - 1)) & (((1 << hi) - 1) ^ ((1 << lo) - 1))
+    if hours is not None:
+        free &= window_mask(n_days, *hours)
+
+    # runs[i] = 1 si los huecos i..i+need-1 están libres (AND por potencias de 2)
+    runs, width = free, 1
+    while width < need:
+        step = min(width, need - width)
+        runs &= runs >> step
+        width += step
+
+    out = []
+    while runs and len(out) < limit:
+        i = (runs & -runs).bit_length() - 1
+        out.append(origin + i * SLOT)
+        runs &= ~((1 << (i + need)) - 1)  # siguiente hueco que no se solape
+    return out
@@ -0,0 +1,222 @@
+"""
+Exportar / importar todos los datos de un usuario en NDJSON (un objeto JSON por línea).
+
+    {"type": "user", "format": 1, "id": 7, "email": "ana@example.com", "exported_at": "..."}
+    {"type": "event", "id": 12, "title": "Dentista", "start": "...", "end": "...", "allDay": false, ...}
+    {"type": "task", "id": 3, "title": "Llamar", "done": false, "date": null, ...}
+
+Cada evento / tarea es el mismo objeto que devuelve la API (`serialize()`), así
+que también se puede importar algo construido a partir de /api/events.
+
+Export (`export`): una consulta por tabla con cursor en el servidor
+(yield_per): la memoria no crece con el número de filas y cada trozo que se
+envía son EXPORT_CHUNK líneas. Incluye lo archivado, con el mismo formato. No
+incluye el hash de la contraseña.
+
+Import (`load`): lee línea a línea y cada IMPORT_CHUNK líneas hace un INSERT
+multi-fila de eventos y otro de tareas, los indexa (api/search.py), marca su
+ocupación (api/occupancy.py) y guarda en import_progress la línea alcanzada,
+todo en la misma transacción. Si se corta, repetir la importación con el mismo
+`job` salta las líneas ya confirmadas: cada lote entra una sola vez. Eventos y
+tareas reciben ids nuevos (como al mover de shard); lo archivado vuelve a las
+tablas calientes y el próximo `flask archive` lo archiva otra vez.
+"""
+import io
+import json
+from sqlalchemy import select, insert, update, delete
+from api.models import db, User, Event, Task, ArchivedEvent, ArchivedTask, ImportProgress
+from api.query_budget import query_budget
+from api.utils import APIException, utc_now
+from api import occupancy, search
+
+FORMAT_VERSION = 1
+MIMETYPE = "application/x-ndjson"
+EXPORT_CHUNK = 1000
+# Una página de insertmanyvalues de SQLAlchemy: un INSERT por tabla y lote
+IMPORT_CHUNK = 1000
+IMPORT_CHUNK_STATEMENTS = 6  # eventos + índice + ocupación, tareas + índice, progreso
+MAX_LINE_BYTES = 64 * 1024
+READ_BUFFER = 256 * 1024
+LOG_EVERY = 100  # lotes
+
+# En el orden en que se exportan
+EXPORT_MODELS = (("event", Event), ("event", ArchivedEvent), ("task", Task), ("task", ArchivedTask))
+SERIALIZERS = {"event": Event.serialize, "task": Task.serialize}
+COLUMNS = {
+    "event": ("id", "title", "start", "end", "all_day", "color", "notes", "user_id"),
+    "task": ("id", "title", "done", "date", "user_id"),
+}
+
+
+# Un solo encoder: json.dumps con opciones crea uno nuevo en cada llamada
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+# -------------------- Export --------------------
+
+def export(uid: int):
+    """Generador con el NDJSON del usuario, en trozos de bytes.
+
+    El usuario se busca antes de empezar (un 404 todavía puede ser una respuesta
+    normal); el resto se lee a medida que se consume el generador.
+    """
+    user = db.session.execute(select(User.id, User.email).where(User.id == uid)).first()
+    if user is None:
+        raise APIException("User not found", 404)
+    header = {"type": "user", "format": FORMAT_VERSION, "id": user.id, "email": user.email,
+              "exported_at": utc_now().isoformat()}
+
+    def generate():
+        yield (_dumps(header) + "\n").encode()
+        with query_budget(len(EXPORT_MODELS), "portability.export"):
+            for kind, model in EXPORT_MODELS:
+                table = model.__table__
+                to_dict = SERIALIZERS[kind]
+                result = db.session.execute(
+                    select(*[table.c[name] for name in COLUMNS[kind]])
+                    .where(table.c.user_id == uid).order_by(table.c.id)
+                    .execution_options(yield_per=EXPORT_CHUNK))
+                for rows in result.partitions():
+                    yield "".join(_dumps({"type": kind, **to_dict(row)}) + "\n" for row in rows).encode()
+    return generate()
+
+
+# -------------------- Import --------------------
+
+def read_lines(stream):
+    """Líneas (bytes) de un flujo binario sin cargarlo entero; `load` rechaza las enormes."""
+    if not isinstance(stream, io.BufferedIOBase):
+        # request.stream (LimitedStream de werkzeug) es RawIOBase: su readline lee byte a byte
+        stream = io.BufferedReader(stream, READ_BUFFER)
+    return iter(lambda: stream.readline(MAX_LINE_BYTES), b"")
+
+
+def progress(uid: int, job: str):
+    return db.session.execute(
+        select(ImportProgress).where(ImportProgress.user_id == uid, ImportProgress.job == job)).scalar()
+
+
+def purge(uid: int):
+    """Borra eventos y tareas del usuario (también archivados, índice y ocupación)."""
+    search.unindex_user(uid)
+    occupancy.clear_user(uid)
+    for model in (Event, Task, ArchivedEvent, ArchivedTask):
+        db.session.execute(delete(model).where(model.user_id == uid))
+
+
+def _text(obj: dict, key: str, column, required: bool = False):
+    value = obj.get(key)
+    if isinstance(value, str) and required:
+        value = value.strip()
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{key} is required")
+        return None
+    limit = column.type.length
+    if not isinstance(value, str) or len(value) > limit:
+        raise ValueError(f"{key} must be a string of at most {limit} characters")
+    return value
+
+
+def _event_row(uid: int, obj: dict, parse_iso) -> dict:
+    c = Event.__table__.c
+    start, end = parse_iso(obj.get("start")), parse_iso(obj.get("end"))
+    if end <= start:
+        raise ValueError("end must be greater than start")
+    return {"user_id": uid, "title": _text(obj, "title", c.title, required=True), "start": start, "end": end,
+            "all_day": bool(obj.get("allDay", False)), "color": _text(obj, "color", c.color),
+            "notes": _text(obj, "notes", c.notes)}
+
+
+def _task_row(uid: int, obj: dict, parse_date) -> dict:
+    return {"user_id": uid, "title": _text(obj, "title", Task.__table__.c.title, required=True),
+            "done": bool(obj.get("done", False)), "date": parse_date(obj.get("date"))}
+
+
+def _flush(uid: int, job_id: int, done: dict, events: list, tasks: list, line: int, finished: bool = False):
+    """Un lote: filas nuevas + índice + ocupación + línea alcanzada, en una transacción.
+
+    El avance va en `done` y se escribe con un UPDATE: el commit expira la fila
+    de ImportProgress y leerla de nuevo en cada lote costaría otra consulta.
+    """
+    with query_budget(IMPORT_CHUNK_STATEMENTS, "portability.import_chunk"):
+        if events:
+            t = Event.__table__
+            created = db.session.execute(
+                insert(t).returning(t.c.id, t.c.user_id, t.c.title, t.c.notes, t.c.start, t.c.end, t.c.all_day),
+                events).all()
+            search.index_events(created)
+            occupancy.add(uid, created)
+        if tasks:
+            t = Task.__table__
+            created = db.session.execute(insert(t).returning(t.c.id, t.c.user_id, t.c.title), tasks).all()
+            search.index_tasks(created)
+        now = utc_now()
+        done["line"] = line
+        done["events"] += len(events)
+        done["tasks"] += len(tasks)
+        values = dict(done, updated_at=now)
+        if finished:
+            values["finished_at"] = now
+        t = ImportProgress.__table__
+        db.session.execute(update(t).where(t.c.id == job_id).values(**values))
+        db.session.commit()
+
+
+def load(uid: int, lines, job: str, from_line: int = 0, replace: bool = False, log=None) -> ImportProgress:
+    """Importa las líneas NDJSON en la cuenta `uid` (en su shard activo).
+
+    `from_line`: cuántas líneas del fichero se han omitido al principio de
+    `lines` (para reanudar sin volver a enviar lo ya importado). `replace`:
+    borra antes los eventos y tareas del usuario (solo al empezar un job nuevo).
+    """
+    from api.routes import parse_iso, _parse_date_yyyy_mm_dd
+
+    state = progress(uid, job)
+    if state is not None and state.finished_at is not None:
+        return state
+    if state is None:
+        state = ImportProgress(user_id=uid, job=job, line=0, events=0, tasks=0, updated_at=utc_now())
+        db.session.add(state)
+        db.session.flush()  # así cada lote solo hace un UPDATE del avance
+        if replace:
+            purge(uid)  # se confirma con el primer lote
+    if from_line > state.line:
+        db.session.rollback()
+        raise APIException(f"Import {job!r} stopped at line {state.line}; resend from there", 409,
+                           payload=state.serialize())
+
+    job_id, done = state.id, {"line": state.line, "events": state.events, "tasks": state.tasks}
+    events, tasks = [], []
+    n, committed = from_line, max(from_line, done["line"])
+    for raw in lines:
+        n += 1
+        if n <= committed:
+            continue  # ya importada en una ejecución anterior
+        try:
+            if len(raw) >= MAX_LINE_BYTES and not raw.endswith(b"\n"):
+                raise ValueError(f"longer than {MAX_LINE_BYTES} bytes")
+            if not raw.strip():
+                continue
+            obj = json.loads(raw)
+            kind = obj.get("type") if isinstance(obj, dict) else None
+            if kind == "event":
+                events.append(_event_row(uid, obj, parse_iso))
+            elif kind == "task":
+                tasks.append(_task_row(uid, obj, _parse_date_yyyy_mm_dd))
+            elif kind == "user":
+                if not isinstance(obj.get("format", 1), int) or obj.get("format", 1) > FORMAT_VERSION:
+                    raise ValueError(f"unsupported format {obj.get('format')!r}")
+            else:
+                raise ValueError("type must be user, event or task")
+        except (ValueError, APIException) as e:
+            db.session.rollback()
+            msg = e.message if isinstance(e, APIException) else str(e)
+            raise APIException(f"Line {n}: {msg}", 400, payload={"job": job, "line": committed})
+        if n - committed >= IMPORT_CHUNK:
+            _flush(uid, job_id, done, events, tasks, n)
+            events, tasks, committed = [], [], n
+            if log and (n // IMPORT_CHUNK) % LOG_EVERY == 0:
+                log(f"{job}: line {n}, {done['events']} events, {done['tasks']} tasks")
+    _flush(uid, job_id, done, events, tasks, max(n, committed), finished=True)
+    return state
@@ -0,0 +1,183 @@
+"""
+Presupuesto de consultas SQL por endpoint (detección de N+1).
+
+    @api.route('/events', methods=['GET', 'POST'])
+    @jwt_required()
+    @query_budget(2, GET=1)
+    def events_collection(): ...
+
+    with query_budget(3):
+        ...
+
+Solo se aplica en modo test o debug (app.testing / FLASK_DEBUG=1), o cuando
+QUERY_BUDGET vale "raise" o "warn". En producción (o QUERY_BUDGET=off) no se
+registra ningún listener. Al superar el presupuesto se lanza
+QueryBudgetExceeded (500) con un informe de las sentencias repetidas.
+
+En modo "raise" el presupuesto se comprueba también antes de cada commit de la
+sesión: si ya se ha superado, el commit no llega a hacerse y el 500 nunca
+corresponde a datos guardados.
+
+Los endpoints que no pueden llevar un presupuesto propio (sus partes aplican
+los suyos) se marcan con @budget_exempt("motivo"); quedan en EXEMPT y los
+lista `flask query-budgets`.
+"""
+import re
+import threading
+from collections import Counter
+from functools import wraps
+from flask import current_app, g, has_app_context, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from api.utils import APIException
+
+_listener_lock = threading.Lock()
+_listening = False
+
+EXEMPT: dict[str, str] = {}  # "módulo.función" → motivo
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"(\?|%\(\w+\)s|:\w+|\$\d+|%s)")
+_IN_LIST = re.compile(r"IN \((?:\?, )*\?\)", re.IGNORECASE)
+_VALUES = re.compile(r"VALUES (\(.*?\))(?:, \(.*?\))+", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(APIException):
+    status_code = 500
+
+
+def statement_shape(statement: str) -> str:
+    """Normaliza una sentencia: literales y parámetros → ?, listas IN/VALUES colapsadas."""
+    s = _WS.sub(" ", statement).strip()
+    s = _STRING.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _PLACEHOLDER.sub("?", s)
+    s = _IN_LIST.sub("IN (?)", s)
+    return _VALUES.sub(r"VALUES \1", s)
+
+
+def _mode() -> str:
+    app = current_app
+    mode = app.config.get("QUERY_BUDGET")
+    if mode:
+        return mode
+    return "raise" if (app.testing or app.debug) else "off"
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    for tracker in g.get("_query_budgets", ()):
+        tracker._statements.append(statement)
+
+
+def _check_before_commit(session):
+    if not has_app_context() or not g.get("_query_budgets") or _mode() != "raise":
+        return
+    session.flush()  # lo pendiente también cuenta: se escribiría en este commit
+    for tracker in g._query_budgets:
+        tracker.check()
+
+
+def _ensure_listener():
+    global _listening
+    if _listening:
+        return
+    with _listener_lock:
+        if not _listening:
+            event.listen(Engine, "before_cursor_execute", _record_statement)
+            event.listen(Session, "before_commit", _check_before_commit)
+            _listening = True
+
+
+def budget_report(label, statements, limit) -> dict:
+    shapes = Counter(statement_shape(s) for s in statements)
+    duplicates = [{"count": n, "statement": shape} for shape, n in shapes.most_common() if n > 1]
+    return {
+        "endpoint": label,
+        "budget": limit,
+        "statements": len(statements),
+        "duplicates": duplicates,
+    }
+
+
+class query_budget:
+    """Decorador / context manager con el máximo de sentencias SQL permitidas.
+
+    Acepta un máximo general y, opcionalmente, máximos por método HTTP
+    (p. ej. ``query_budget(3, GET=1)``).
+    """
+
+    def __init__(self, max_statements: int, label: str | None = None, **per_method: int):
+        self.max_statements = max_statements
+        self.per_method = per_method
+        self.label = label
+        self._statements = None
+
+    def __call__(self, fn):
+        label = self.label or f"{fn.__module__}.{fn.__name__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Un tracker nuevo por llamada: el decorador se comparte entre hilos
+            with query_budget(self.max_statements, label, **self.per_method):
+                return fn(*args, **kwargs)
+        wrapper.query_budget = self  # functools.wraps lo propaga a los decoradores exteriores
+        return wrapper
+
+    def limit(self) -> int:
+        if self.per_method and has_request_context():
+            return self.per_method.get(request.method, self.max_statements)
+        return self.max_statements
+
+    def __enter__(self):
+        if not has_app_context() or _mode() == "off":
+            return self
+        _ensure_listener()
+        self._statements = []
+        g._query_budgets = g.get("_query_budgets", ()) + (self,)
+        return self
+
+    def _exceeded(self):
+        """(mensaje, informe) si ya hay más sentencias que el máximo; si no, None."""
+        limit = self.limit()
+        if self._statements is None or len(self._statements) <= limit:
+            return None
+        report = budget_report(self.label or "query_budget", self._statements, limit)
+        message = f"Query budget exceeded: {report['statements']} statements > {limit} ({report['endpoint']})"
+        return message, report
+
+    def check(self):
+        """Lanza QueryBudgetExceeded si el presupuesto ya se ha superado."""
+        exceeded = self._exceeded()
+        if exceeded:
+            message, report = exceeded
+            raise QueryBudgetExceeded(message, 500, payload={"query_budget": report})
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._statements is None:
+            return False
+        g._query_budgets = tuple(t for t in g.get("_query_budgets", ()) if t is not self)
+        exceeded = None if exc_type is not None else self._exceeded()
+        self._statements = None
+        if not exceeded:
+            return False
+
+        message, report = exceeded
+        if _mode() == "warn":
+            lines = [message] + [f"  {d['count']}x {d['statement']}" for d in report["duplicates"]]
+            current_app.logger.warning("\n".join(lines))
+            return False
+        raise QueryBudgetExceeded(message, 500, payload={"query_budget": report})
+
+
+def budget_exempt(reason: str):
+    """Declara que un endpoint no lleva presupuesto propio y por qué."""
+    def decorator(fn):
+        EXEMPT[f"{fn.__module__}.{fn.__name__}"] = reason
+        fn.query_budget_exempt = reason
+        return fn
+    return decorator
@@ -0,0 +1,165 @@
+"""
+Enrutado primaria/réplica para las lecturas.
+
+Con REPLICA_DATABASE_URL definida se registra el bind "replica" y:
+- Las peticiones GET/HEAD leen de la réplica.
+- Escrituras (flush, INSERT/UPDATE/DELETE) y cualquier otro método van a la primaria.
+- Read-your-writes: durante REPLICA_LAG_TOLERANCE segundos tras un commit con
+  cambios, las lecturas de ese cliente van a la primaria. La hora del commit
+  viaja con el cliente (cabecera X-Last-Write y cookie `last_write`, que este
+  devuelve en las siguientes peticiones), así vale en cualquier worker o
+  servidor (hora de pared: los relojes deben estar sincronizados).
+- Si el retraso medido de la réplica supera REPLICA_LAG_TOLERANCE, todas las
+  lecturas vuelven a la primaria hasta la siguiente comprobación.
+
+Para probarlo en local con SQLite basta con dos ficheros:
+    $ cp /tmp/test.db /tmp/replica.db
+    $ REPLICA_DATABASE_URL=sqlite:////tmp/replica.db pipenv run start
+"""
+import os
+import math
+from time import monotonic, time
+from flask import current_app, g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text, UpdateBase, TextClause
+from api.shard_router import shard_engine
+
+REPLICA_BIND = "replica"
+LAG_CHECK_INTERVAL = 5.0  # segundos entre mediciones del retraso
+
+PG_LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+LAST_WRITE_HEADER = "X-Last-Write"
+LAST_WRITE_COOKIE = "last_write"
+
+_lag = {"value": 0.0, "checked": None}      # último retraso medido de la réplica
+
+
+def _request_user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:  # JWT aún no verificado en esta petición
+        return None
+    try:
+        return int(identity) if identity is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_read(clause) -> bool:
+    if clause is None:
+        return True
+    if isinstance(clause, UpdateBase):
+        return False
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() in ("SELECT", "WITH")
+    return True
+
+
+def parse_last_write(raw):
+    """Segundos epoch enviados por el cliente, o None si no hay o no valen."""
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value):
+        return None
+    return min(value, time())  # una hora futura no alarga la ventana
+
+
+def client_last_write():
+    """Último commit con cambios de este cliente (esta petición, cabecera o cookie)."""
+    if g.get("_last_write") is not None:
+        return g._last_write
+    return parse_last_write(request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE))
+
+
+def in_write_window(last_write) -> bool:
+    return last_write is not None and time() - last_write < current_app.config["REPLICA_LAG_TOLERANCE"]
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            # Con shards cada usuario tiene su propia BD (las réplicas no aplican)
+            engine = shard_engine(self, mapper, clause)
+            if engine is not None:
+                return engine
+            if self._flushing or not _is_read(clause):
+                self.info["_wrote"] = True
+            elif has_request_context() and g.get("_db_route") == REPLICA_BIND:
+                # Se decide en el primer acceso: para entonces el JWT ya está verificado
+                if not in_write_window(client_last_write()):
+                    return self._db.engines[REPLICA_BIND]
+                g._db_route = "primary"
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_lag(app) -> float:
+    """Retraso de la réplica en segundos (cacheado LAG_CHECK_INTERVAL)."""
+    now = monotonic()
+    checked = _lag["checked"]
+    if checked is not None and now - checked < LAG_CHECK_INTERVAL:
+        return _lag["value"]
+    engine = app.extensions["sqlalchemy"].engines[REPLICA_BIND]
+    value = 0.0
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.connect() as conn:
+                value = float(conn.execute(text(PG_LAG_SQL)).scalar() or 0.0)
+        except Exception:
+            app.logger.exception("Replica lag check failed, reading from primary")
+            value = float("inf")
+    _lag.update(value=value, checked=now)
+    return value
+
+
+def configure_replica(app):
+    """Añade el bind de la réplica; llamar antes de db.init_app()."""
+    url = os.getenv("REPLICA_DATABASE_URL")
+    app.config.setdefault("REPLICA_LAG_TOLERANCE", float(os.getenv("REPLICA_LAG_TOLERANCE", "5")))
+    if url:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND] = url.replace("postgres://", "postgresql://")
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def choose_route(app, method: str) -> str:
+    if method in ("GET", "HEAD") and replica_lag(app) <= app.config["REPLICA_LAG_TOLERANCE"]:
+        return REPLICA_BIND
+    return "primary"
+
+
+def setup_replica(app):
+    if REPLICA_BIND not in (app.config.get("SQLALCHEMY_BINDS") or {}):
+        return
+
+    @app.before_request
+    def _choose_db_route():
+        g._db_route = choose_route(app, request.method)
+
+    @event.listens_for(RoutingSession, "after_commit")
+    def _remember_write(session):
+        if session.info.pop("_wrote", False) and has_request_context():
+            g._last_write = time()
+
+    @app.after_request
+    def _send_last_write(resp):
+        last_write = g.get("_last_write")
+        if last_write is not None:
+            value = f"{last_write:.3f}"
+            resp.headers[LAST_WRITE_HEADER] = value
+            resp.headers["Access-Control-Expose-Headers"] = LAST_WRITE_HEADER
+            resp.set_cookie(LAST_WRITE_COOKIE, value, path="/api",
+                            max_age=math.ceil(app.config["REPLICA_LAG_TOLERANCE"]),
+                            httponly=True, samesite="Lax")
+        return resp
+
+    @event.listens_for(RoutingSession, "after_rollback")
+    def _forget_write(session):
+        session.info.pop("_wrote", None)
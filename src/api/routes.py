@@ -1,19 +1,30 @@
 """
-API routes: auth (signup/login), private, events CRUD, tasks CRUD.
+API routes: auth (signup/login/refresh/logout), private, events CRUD, tasks CRUD.
 Incluye:
 - /api/events/batch   → creación de múltiples eventos (uno por día)
 - /api/tasks/<id>/toggle → toggle de tarea (hecha/pendiente)
 - /api/calendar       → feed unificado (eventos + tareas como all-day)
+- /api/calendar/summary → conteos por día (vista mensual / heatmap)
+- /api/search         → búsqueda de texto en eventos y tareas (FTS5 / tsvector)
+- /api/slots          → próximos huecos libres de N minutos (api/occupancy.py)
+- /api/batch          → varias peticiones a la API en una (api/batch.py)
+- /api/export, /api/import → todos los datos del usuario en NDJSON (api/portability.py)
+Las lecturas incluyen el archivo (api/archive.py) solo si el rango pedido llega a él.
 """
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, current_app, stream_with_context
 from flask_cors import cross_origin
-from api.models import db, User, Event, Task
+from api.models import db, User, Event, Task, ArchivedEvent, ArchivedTask
 from api.utils import APIException
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from api.query_budget import budget_exempt, query_budget
+from api import archive, batch, occupancy, portability, search, sharding, tokens
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from datetime import datetime, timedelta, date
 
 api = Blueprint('api', __name__)
 
+# /events/batch: un año como máximo (cabe en un INSERT multi-fila y su presupuesto)
+MAX_BATCH_DAYS = 366
+
 # -------------------- Helpers --------------------
 
 def _uid() -> int:
@@ -44,8 +55,95 @@ def _parse_date_yyyy_mm_dd(s: str) -> date:
     except Exception:
         raise APIException("Invalid date (expected YYYY-MM-DD)", 400)
 
+def _parse_flag(s: str) -> bool | None:
+    if s in (None, ""):
+        return None
+    v = s.strip().lower()
+    if v in ("1", "true", "yes"):
+        return True
+    if v in ("0", "false", "no"):
+        return False
+    raise APIException("Invalid boolean (expected true/false)", 400)
+
+def task_filters(uid: int, args, model=Task) -> list:
+    """
+    Filtros de /api/tasks (todos combinables):
+    ?date=YYYY-MM-DD | ?from=&to= (inclusivos) | ?done=true/false | ?undated=1 | ?overdue=1
+    Índices: ix_task_user_id_date (user_id, date), ix_task_user_id_done (user_id, done)
+    e ix_task_user_open_date (user_id, date) WHERE NOT done para "overdue".
+    `model` = ArchivedTask para aplicar los mismos filtros al archivo.
+    """
+    crit = [model.user_id == uid]
+    d = args.get("date")
+    if d:
+        crit.append(model.date == _parse_date_yyyy_mm_dd(d))
+    dfrom = _parse_date_yyyy_mm_dd(args.get("from"))
+    if dfrom:
+        crit.append(model.date >= dfrom)
+    dto = _parse_date_yyyy_mm_dd(args.get("to"))
+    if dto:
+        crit.append(model.date <= dto)
+    if _parse_flag(args.get("undated")):
+        crit.append(model.date.is_(None))
+    done = _parse_flag(args.get("done"))
+    if _parse_flag(args.get("overdue")):
+        # "== False" (no "is_"/"~") para que coincida con el WHERE del índice parcial
+        crit += [model.done == False, model.date < date.today()]  # noqa: E712
+    elif done is not None:
+        crit.append(model.done == done)
+    return crit
+
+def tasks_reach_archive(args, watermark) -> bool:
+    """Solo hay tareas hechas y con fecha en el archivo."""
+    if _parse_flag(args.get("undated")) or _parse_flag(args.get("overdue")):
+        return False
+    if _parse_flag(args.get("done")) is False:
+        return False
+    since = _parse_date_yyyy_mm_dd(args.get("date")) or _parse_date_yyyy_mm_dd(args.get("from"))
+    return archive.reaches(watermark, since)
+
+def build_task_query(uid: int, args):
+    return Task.query.filter(*task_filters(uid, args)).order_by(Task.id.desc())
+
+def calendar_filters(uid: int, args, event_model=Event, task_model=Task):
+    """Criterios (eventos, tareas) del feed: rango opcional ?from=YYYY-MM-DD&to=YYYY-MM-DD."""
+    ev_crit = [event_model.user_id == uid]
+    task_crit = [task_model.user_id == uid, task_model.date.isnot(None)]
+    dfrom = _parse_date_yyyy_mm_dd(args.get("from"))
+    dto = _parse_date_yyyy_mm_dd(args.get("to"))
+    if dfrom:
+        ev_crit.append(event_model.start >= datetime(dfrom.year, dfrom.month, dfrom.day))
+        task_crit.append(task_model.date >= dfrom)
+    if dto:
+        e = datetime(dto.year, dto.month, dto.day) + timedelta(days=1)  # exclusivo
+        ev_crit.append(event_model.start < e)
+        task_crit.append(task_model.date < e.date())
+    return ev_crit, task_crit
+
+def calendar_items(events, tasks) -> list:
+    """Eventos + tareas con fecha como all-day (formato de react-big-calendar)."""
+    items = [e.serialize() | {"isTask": False, "taskDone": False} for e in events]
+    for t in tasks:
+        if t.date is None:
+            continue
+        sdt = datetime(t.date.year, t.date.month, t.date.day, 0, 0, 0)
+        edt = sdt + timedelta(days=1)
+        items.append({
+            "id": t.id,
+            "title": t.title,
+            "start": sdt.isoformat(),
+            "end": edt.isoformat(),
+            "allDay": True,
+            "color": "#6c9c7b" if t.done else "#9aa0a6",
+            "notes": None,
+            "user_id": t.user_id,
+            "isTask": True,
+            "taskDone": bool(t.done)
+        })
+    return items
+
 # Check de solapes (opcional pero útil)
-from sqlalchemy import and_
+from sqlalchemy import and_, insert, select, func, case, literal, union_all, type_coerce, Date
 def _overlaps(uid: int, start: datetime, end: datetime, exclude_id: int | None = None) -> bool:
     q = Event.query.filter_by(user_id=uid).filter(and_(Event.start < end, Event.end > start))
     if exclude_id:
@@ -55,6 +153,7 @@ def _overlaps(uid: int, start: datetime, end: datetime, exclude_id: int | None =
 # -------------------- Demo --------------------
 
 @api.route('/hello', methods=['GET'])
+@query_budget(0)
 def handle_hello():
     return jsonify({
         "message": "Hello! I'm a message that came from the backend, check the network tab on the google inspector and you will see the GET request"
@@ -65,6 +164,7 @@ def handle_hello():
 @api.route('/signup', methods=['POST', 'OPTIONS'])
 @cross_origin(origins="*", methods=["POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
+@query_budget(3)
 def signup():
     if request.method == "OPTIONS":
         return ("", 204)
@@ -76,13 +176,8 @@ def signup():
     if not email or not password:
         raise APIException("Email and password are required", 400)
 
-    if User.query.filter_by(email=email).first():
-        raise APIException("User already exists", 409)
-
-    user = User(email=email, is_active=True)
-    user.set_password(password)
-    db.session.add(user)
-    db.session.commit()
+    # Directorio (email único global) + usuario en su shard
+    sharding.create_user(email, password)
 
     return jsonify({"msg": "User created successfully"}), 201
 
@@ -90,6 +185,7 @@ def signup():
 @api.route('/token', methods=['POST', 'OPTIONS'])
 @cross_origin(origins="*", methods=["POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
+@query_budget(2)
 def login():
     if request.method == "OPTIONS":
         return ("", 204)
@@ -101,17 +197,44 @@ def login():
     if not email or not password:
         raise APIException("Email and password are required", 400)
 
-    user = User.query.filter_by(email=email).first()
+    user = sharding.find_user_by_email(email)
     if not user or not user.check_password(password):
         raise APIException("Invalid credentials", 401)
 
-    access_token = create_access_token(identity=str(user.id), expires_delta=timedelta(hours=1))
-    return jsonify({"access_token": access_token, "user": user.serialize()}), 200
+    return jsonify({**tokens.issue(user.id), "user": user.serialize()}), 200
+
+
+@api.route('/token/refresh', methods=['POST', 'OPTIONS'])
+@cross_origin(origins="*", methods=["POST", "OPTIONS"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required(refresh=True)
+@query_budget(1)
+def refresh_token():
+    if request.method == "OPTIONS":
+        return ("", 204)
+    # Rotación: el refresh token usado queda revocado; sin consultar usuario ni contraseña
+    pair = tokens.rotate(get_jwt())
+    db.session.commit()
+    return jsonify(pair), 200
+
+
+@api.route('/logout', methods=['POST', 'OPTIONS'])
+@cross_origin(origins="*", methods=["POST", "OPTIONS"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required(verify_type=False)  # vale el access token o el refresh token
+@query_budget(1)
+def logout():
+    if request.method == "OPTIONS":
+        return ("", 204)
+    tokens.revoke_session(get_jwt())
+    db.session.commit()
+    return jsonify({"msg": "Logged out"}), 200
 
 
 @api.route('/private', methods=['GET'])
 @jwt_required()
 @cross_origin(origins="*", methods=["GET"], allow_headers=["Content-Type", "Authorization"])
+@query_budget(1)
 def private():
     user_id = _uid()
     user = User.query.get(user_id)
@@ -125,6 +248,7 @@ def private():
 @cross_origin(origins="*", methods=["GET", "POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required(optional=True)  # si quieres exigir token para GET, quita 'optional'
+@query_budget(3, GET=3)
 def events_collection():
     if request.method == "OPTIONS":
         return ("", 204)
@@ -132,6 +256,9 @@ def events_collection():
     if request.method == "GET":
         uid = _uid()
         items = Event.query.filter_by(user_id=uid).order_by(Event.start.asc()).all()
+        if archive.reaches(archive.watermarks()["event"], None):
+            cold = ArchivedEvent.query.filter_by(user_id=uid).all()
+            items = archive.merge(items, cold, key=lambda e: e.start)
         return jsonify([e.serialize() for e in items]), 200
 
     # POST
@@ -164,25 +291,42 @@ def events_collection():
         notes=data.get('notes')
     )
     db.session.add(ev)
+    db.session.flush()  # id para el índice de búsqueda
+    search.index_events([ev])
+    occupancy.add(uid, [ev])
+    body = ev.serialize()  # antes del commit, que expira los objetos
     db.session.commit()
-    return jsonify(ev.serialize()), 201
+    return jsonify(body), 201
 
 
 @api.route('/events/<int:event_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin(origins="*", methods=["PUT", "DELETE", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required()
+@query_budget(9)
 def event_item(event_id):
     if request.method == "OPTIONS":
         return ("", 204)
 
     uid = _uid()
     ev = Event.query.filter_by(id=event_id, user_id=uid).first()
+    cold = archive.delete_archived(ArchivedEvent, uid, event_id) if not ev and request.method == "DELETE" else None
+    if cold is not None:
+        search.unindex_event(event_id)
+        occupancy.rebuild(uid, occupancy.event_spans([cold]))
+        db.session.commit()
+        return jsonify({"msg": "deleted"}), 200
+    if not ev:
+        # Editar un evento archivado lo devuelve a la tabla caliente
+        ev = archive.restore(Event, ArchivedEvent, uid, event_id)
     if not ev:
         raise APIException("Event not found", 404)
+    busy_before = occupancy.event_spans([ev])
 
     if request.method == "DELETE":
         db.session.delete(ev)
+        search.unindex_event(ev.id)
+        occupancy.rebuild(uid, busy_before)
         db.session.commit()
         return jsonify({"msg": "deleted"}), 200
 
@@ -211,9 +355,14 @@ def event_item(event_id):
         ev.color = data['color']
     if 'notes' in data:
         ev.notes = data['notes']
+    if 'title' in data or 'notes' in data:
+        search.index_events([ev])
+    if 'start' in data or 'end' in data or 'allDay' in data:
+        occupancy.rebuild(uid, busy_before.keys() | occupancy.event_spans([ev]).keys())
 
+    body = ev.serialize()
     db.session.commit()
-    return jsonify(ev.serialize()), 200
+    return jsonify(body), 200
 
 # --------- NUEVO: batch de eventos (uno por día) ---------
 
@@ -221,6 +370,7 @@ def event_item(event_id):
 @cross_origin(origins="*", methods=["POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required()
+@query_budget(3)
 def events_batch():
     if request.method == "OPTIONS":
         return ("", 204)
@@ -260,8 +410,10 @@ def events_batch():
 
     if e_day < s_day:
         raise APIException("endDay must be >= startDay", 400)
+    if (e_day - s_day).days >= MAX_BATCH_DAYS:
+        raise APIException(f"A batch can span at most {MAX_BATCH_DAYS} days", 400)
 
-    created = []
+    rows = []
     cur = s_day
     while cur <= e_day:
         start_dt = datetime(cur.year, cur.month, cur.day, sh, sm, 0)
@@ -270,7 +422,7 @@ def events_batch():
         # if _overlaps(uid, start_dt, end_dt):
         #     cur += TD(days=1); continue  # o lanza 409 si prefieres estricta
 
-        ev = Event(
+        rows.append(dict(
             user_id=uid,
             title=title,
             start=start_dt,
@@ -278,13 +430,17 @@ def events_batch():
             all_day=False,
             color=data.get('color'),
             notes=data.get('notes')
-        )
-        db.session.add(ev)
-        created.append(ev)
+        ))
         cur += TD(days=1)
 
+    # Un único INSERT multi-fila con RETURNING (no un INSERT por día)
+    created = db.session.execute(insert(Event).returning(Event), rows).scalars().all()
+    created.sort(key=lambda e: e.start)
+    search.index_events(created)
+    occupancy.add(uid, created)
+    body = [e.serialize() for e in created]
     db.session.commit()
-    return jsonify([e.serialize() for e in created]), 201
+    return jsonify(body), 201
 
 # -------------------- Tasks CRUD --------------------
 
@@ -292,18 +448,17 @@ def events_batch():
 @cross_origin(origins="*", methods=["GET", "POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required(optional=True)
+@query_budget(2, GET=3)
 def tasks_collection():
     if request.method == "OPTIONS":
         return ("", 204)
 
     if request.method == "GET":
         uid = _uid()
-        q = Task.query.filter_by(user_id=uid).order_by(Task.id.desc())
-        d = request.args.get("date")
-        if d:
-            the_day = _parse_date_yyyy_mm_dd(d)
-            q = q.filter(Task.date == the_day)
-        items = q.all()
+        items = build_task_query(uid, request.args).all()
+        if tasks_reach_archive(request.args, archive.watermarks()["task"]):
+            cold = ArchivedTask.query.filter(*task_filters(uid, request.args, ArchivedTask)).all()
+            items = archive.merge(items, cold, key=lambda t: t.id, reverse=True)
         return jsonify([t.serialize() for t in items]), 200
 
     # POST
@@ -316,25 +471,36 @@ def tasks_collection():
 
     t = Task(user_id=uid, title=title, done=bool(data.get("done", False)), date=task_date)
     db.session.add(t)
+    db.session.flush()
+    search.index_tasks([t])
+    body = t.serialize()
     db.session.commit()
-    return jsonify(t.serialize()), 201
+    return jsonify(body), 201
 
 
 @api.route('/tasks/<int:task_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin(origins="*", methods=["PUT", "DELETE", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required()
+@query_budget(5)
 def task_item(task_id):
     if request.method == "OPTIONS":
         return ("", 204)
 
     uid = _uid()
     t = Task.query.filter_by(id=task_id, user_id=uid).first()
+    if not t and request.method == "DELETE" and archive.delete_archived(ArchivedTask, uid, task_id):
+        search.unindex_task(task_id)
+        db.session.commit()
+        return jsonify({"msg": "deleted"}), 200
+    if not t:
+        t = archive.restore(Task, ArchivedTask, uid, task_id)
     if not t:
         raise APIException("Task not found", 404)
 
     if request.method == "DELETE":
         db.session.delete(t)
+        search.unindex_task(t.id)
         db.session.commit()
         return jsonify({"msg": "deleted"}), 200
 
@@ -346,6 +512,7 @@ def task_item(task_id):
         if not title:
             raise APIException("Title cannot be empty", 400)
         t.title = title
+        search.index_tasks([t])
 
     if "done" in data:
         t.done = bool(data.get("done"))
@@ -353,8 +520,9 @@ def task_item(task_id):
     if "date" in data:
         t.date = _parse_date_yyyy_mm_dd(data["date"]) if data["date"] else None
 
+    body = t.serialize()
     db.session.commit()
-    return jsonify(t.serialize()), 200
+    return jsonify(body), 200
 
 # --------- NUEVO: toggle de tarea ---------
 
@@ -362,17 +530,19 @@ def task_item(task_id):
 @cross_origin(origins="*", methods=["POST", "OPTIONS"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required()
+@query_budget(4)
 def task_toggle(task_id):
     if request.method == "OPTIONS":
         return ("", 204)
 
     uid = _uid()
-    t = Task.query.filter_by(id=task_id, user_id=uid).first()
+    t = Task.query.filter_by(id=task_id, user_id=uid).first() or archive.restore(Task, ArchivedTask, uid, task_id)
     if not t:
         raise APIException("Task not found", 404)
     t.done = not bool(t.done)
+    body = t.serialize()
     db.session.commit()
-    return jsonify(t.serialize()), 200
+    return jsonify(body), 200
 
 # --------------- NUEVO: feed unificado ---------------
 
@@ -380,45 +550,226 @@ def task_toggle(task_id):
 @cross_origin(origins="*", methods=["GET"],
               allow_headers=["Content-Type", "Authorization"])
 @jwt_required()
+@query_budget(5)
 def calendar_feed():
     uid = _uid()
+    ev_crit, task_crit = calendar_filters(uid, request.args)
+    events = Event.query.filter(*ev_crit).order_by(Event.start.asc()).all()
+    tasks = Task.query.filter(*task_crit).order_by(Task.id.desc()).all()
+
+    marks = archive.watermarks()
+    since = _parse_date_yyyy_mm_dd(request.args.get("from"))
+    a_ev_crit, a_task_crit = calendar_filters(uid, request.args, ArchivedEvent, ArchivedTask)
+    if archive.reaches(marks["event"], since):
+        events = archive.merge(events, ArchivedEvent.query.filter(*a_ev_crit).all(), key=lambda e: e.start)
+    if archive.reaches(marks["task"], since):
+        tasks = archive.merge(tasks, ArchivedTask.query.filter(*a_task_crit).all(),
+                              key=lambda t: t.id, reverse=True)
+    return jsonify(calendar_items(events, tasks)), 200
+
+
+@api.route('/calendar/summary', methods=['GET'])
+@cross_origin(origins="*", methods=["GET"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@query_budget(2)
+def calendar_summary():
+    # Conteos por día en [from, to]: {"YYYY-MM-DD": {"events", "open", "done"}}
+    uid = _uid()
+    dfrom = _parse_date_yyyy_mm_dd(request.args.get("from"))
+    dto = _parse_date_yyyy_mm_dd(request.args.get("to"))
+    if not dfrom or not dto:
+        raise APIException("from and to are required (YYYY-MM-DD)", 400)
+    if dto < dfrom:
+        raise APIException("to must be >= from", 400)
+
+    s = datetime(dfrom.year, dfrom.month, dfrom.day)
+    e = datetime(dto.year, dto.month, dto.day) + timedelta(days=1)  # exclusivo
+
+    def q_events(model):
+        ev_day = type_coerce(func.date(model.start), Date)
+        return (
+            select(ev_day.label("day"), func.count().label("events"),
+                   literal(0).label("open"), literal(0).label("done"))
+            .where(model.user_id == uid, model.start >= s, model.start < e)
+            .group_by(func.date(model.start))
+        )
 
-    # Rango opcional por query ?from=YYYY-MM-DD&to=YYYY-MM-DD
-    from datetime import timedelta as TD
-    dfrom = request.args.get("from")
-    dto   = request.args.get("to")
+    def q_tasks(model):
+        return (
+            select(model.date.label("day"), literal(0).label("events"),
+                   func.sum(case((model.done, 0), else_=1)).label("open"),
+                   func.sum(case((model.done, 1), else_=0)).label("done"))
+            .where(model.user_id == uid, model.date >= dfrom, model.date <= dto)
+            .group_by(model.date)
+        )
 
-    q_events = Event.query.filter_by(user_id=uid)
-    q_tasks  = Task.query.filter_by(user_id=uid)
+    # Una sola consulta: agregados de eventos y tareas (y del archivo si el rango llega) en la BD
+    parts = [q_events(Event), q_tasks(Task)]
+    marks = archive.watermarks()
+    if archive.reaches(marks["event"], dfrom):
+        parts.append(q_events(ArchivedEvent))
+    if archive.reaches(marks["task"], dfrom):
+        parts.append(q_tasks(ArchivedTask))
 
-    if dfrom:
-        s = datetime.strptime(dfrom, "%Y-%m-%d")
-        q_events = q_events.filter(Event.start >= s)
-        q_tasks  = q_tasks.filter(Task.date >= s.date())
-    if dto:
-        e = datetime.strptime(dto, "%Y-%m-%d") + TD(days=1)  # exclusivo
-        q_events = q_events.filter(Event.start < e)
-        q_tasks  = q_tasks.filter(Task.date < e.date())
+    days = {}
+    for day, n_events, n_open, n_done in db.session.execute(union_all(*parts)):
+        key = day if isinstance(day, str) else day.isoformat()
+        counts = days.setdefault(key, {"events": 0, "open": 0, "done": 0})
+        counts["events"] += int(n_events or 0)
+        counts["open"] += int(n_open or 0)
+        counts["done"] += int(n_done or 0)
 
-    evs = [e.serialize() | {"isTask": False, "taskDone": False} for e in q_events.order_by(Event.start.asc()).all()]
+    return jsonify({"from": dfrom.isoformat(), "to": dto.isoformat(), "days": days}), 200
 
-    tasks = []
-    for t in q_tasks.order_by(Task.id.desc()).all():
-        if t.date is None:
-            continue
-        sdt = datetime(t.date.year, t.date.month, t.date.day, 0, 0, 0)
-        edt = sdt + TD(days=1)
-        tasks.append({
-            "id": t.id,
-            "title": t.title,
-            "start": sdt.isoformat(),
-            "end": edt.isoformat(),
-            "allDay": True,
-            "color": "#6c9c7b" if t.done else "#9aa0a6",
-            "notes": None,
-            "user_id": t.user_id,
-            "isTask": True,
-            "taskDone": bool(t.done)
-        })
+# --------------- Huecos libres ---------------
+
+def _parse_hours(s: str):
+    # "HH:MM-HH:MM" → (hueco inicial, hueco final) del día
+    try:
+        a, b = s.split("-")
+        lo, hi = [int(x.split(":")[0]) * 60 + int(x.split(":")[1]) for x in (a, b)]
+    except Exception:
+        raise APIException("Invalid hours (use HH:MM-HH:MM)", 400)
+    if not 0 <= lo < hi <= 24 * 60:
+        raise APIException("hours must be an increasing range within the day", 400)
+    return -(-lo // occupancy.SLOT_MINUTES), hi // occupancy.SLOT_MINUTES
+
+@api.route('/slots', methods=['GET'])
+@cross_origin(origins="*", methods=["GET"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@query_budget(1)
+def free_slots():
+    # ?duration=45&from=2025-01-06T08:00&to=2025-01-10T18:00[&hours=09:00-18:00][&limit=5]
+    uid = _uid()
+    try:
+        duration = int(request.args.get("duration", ""))
+        limit = int(request.args.get("limit", 1))
+    except ValueError:
+        raise APIException("duration and limit must be integers (minutes / count)", 400)
+    if not 0 < duration <= 24 * 60:
+        raise APIException("duration must be between 1 and 1440 minutes", 400)
+    limit = max(1, min(limit, 50))
+
+    start = parse_iso(request.args["from"]) if request.args.get("from") else datetime.now().replace(microsecond=0)
+    end = parse_iso(request.args["to"]) if request.args.get("to") else start + timedelta(days=7)
+    if end <= start:
+        raise APIException("to must be greater than from", 400)
+    if end - start > timedelta(days=366):
+        raise APIException("The range cannot exceed 366 days", 400)
+    hours = _parse_hours(request.args["hours"]) if request.args.get("hours") else None
+
+    found = occupancy.free_slots(uid, start, end, duration, limit=limit, hours=hours)
+    span = timedelta(minutes=duration)
+    return jsonify([{"start": s.isoformat(), "end": (s + span).isoformat()} for s in found]), 200
+
+# --------------- Búsqueda ---------------
 
-    return jsonify(evs + tasks), 200
+@api.route('/search', methods=['GET'])
+@cross_origin(origins="*", methods=["GET"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@query_budget(6)
+def search_items():
+    uid = _uid()
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        raise APIException("q is required", 400)
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+    except ValueError:
+        raise APIException("page and per_page must be integers", 400)
+
+    # Se pide uno de más para saber si hay otra página
+    hits = search.search(uid, q, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+
+    ev_ids = [ref for kind, ref, _ in hits if kind == "event"]
+    task_ids = [ref for kind, ref, _ in hits if kind == "task"]
+    events = {e.id: e for e in Event.query.filter(Event.user_id == uid, Event.id.in_(ev_ids))} if ev_ids else {}
+    tasks = {t.id: t for t in Task.query.filter(Task.user_id == uid, Task.id.in_(task_ids))} if task_ids else {}
+
+    # Lo que no está en las tablas calientes puede estar archivado (conserva el id)
+    marks = archive.watermarks()
+    missing = [i for i in ev_ids if i not in events]
+    if missing and marks["event"] is not None:
+        events.update((e.id, e) for e in ArchivedEvent.query.filter(
+            ArchivedEvent.user_id == uid, ArchivedEvent.id.in_(missing)))
+    missing = [i for i in task_ids if i not in tasks]
+    if missing and marks["task"] is not None:
+        tasks.update((t.id, t) for t in ArchivedTask.query.filter(
+            ArchivedTask.user_id == uid, ArchivedTask.id.in_(missing)))
+
+    results = []
+    for kind, ref, rank in hits:
+        obj = events.get(ref) if kind == "event" else tasks.get(ref)
+        if obj is None:
+            continue  # índice desfasado: se ignora hasta el próximo reindex
+        results.append({"kind": kind, "rank": round(rank, 4), "item": obj.serialize()})
+
+    return jsonify({"q": q, "page": page, "per_page": per_page,
+                    "has_more": has_more, "results": results}), 200
+
+# -------------------- Exportar / importar (NDJSON) --------------------
+
+@api.route('/export', methods=['GET'])
+@cross_origin(origins="*", methods=["GET"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@query_budget(1)
+def export_user():
+    # El presupuesto cubre la búsqueda del usuario; el generador lleva el suyo
+    uid = _uid()
+    body = portability.export(uid)
+    resp = current_app.response_class(stream_with_context(body), mimetype=portability.MIMETYPE)
+    resp.headers["Content-Disposition"] = f'attachment; filename="calendar-{uid}.ndjson"'
+    return resp
+
+
+@api.route('/import', methods=['GET', 'POST', 'OPTIONS'])
+@cross_origin(origins="*", methods=["GET", "POST", "OPTIONS"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@budget_exempt("each import chunk applies its own budget (api/portability.py)")
+def import_user():
+    # ?job=nombre[&replace=1][&from_line=N]; GET devuelve el avance del job.
+    if request.method == "OPTIONS":
+        return ("", 204)
+    uid = _uid()
+    job = (request.args.get("job") or "").strip()
+    if not job or len(job) > 120:
+        raise APIException("job is required (up to 120 characters; reuse it to resume)", 400)
+
+    if request.method == "GET":
+        state = portability.progress(uid, job)
+        if state is None:
+            raise APIException("Import not found", 404)
+        return jsonify(state.serialize()), 200
+
+    try:
+        from_line = int(request.args.get("from_line", 0))
+    except ValueError:
+        raise APIException("from_line must be an integer", 400)
+    if from_line < 0:
+        raise APIException("from_line must be >= 0", 400)
+    state = portability.load(uid, portability.read_lines(request.stream), job, from_line=from_line,
+                             replace=bool(_parse_flag(request.args.get("replace"))))
+    return jsonify(state.serialize()), 200
+
+# -------------------- Batch --------------------
+
+@api.route('/batch', methods=['POST', 'OPTIONS'])
+@cross_origin(origins="*", methods=["POST", "OPTIONS"],
+              allow_headers=["Content-Type", "Authorization"])
+@jwt_required()
+@budget_exempt("each sub-request applies the budget of its endpoint")
+def batch_requests():
+    if request.method == "OPTIONS":
+        return ("", 204)
+    data = request.get_json(silent=True) or {}
+    items = batch.parse(data)
+    return current_app.response_class(batch.run(items, parallel=bool(data.get("parallel"))),
+                                      mimetype="application/json")
@@ -0,0 +1,223 @@
+"""
+Búsqueda de texto completo sobre Event.title/Event.notes y Task.title.
+
+- SQLite:     tabla virtual FTS5 `search_fts` (ranking bm25)
+- PostgreSQL: tabla `search_document` con columna tsvector generada + índice GIN
+- Otros:      sin índice, ILIKE sobre las tablas originales
+
+Cada documento se identifica por doc_id = ref_id * 2 + kind (0 evento, 1 tarea),
+así que alta/modificación es un único upsert y la baja un DELETE por clave.
+Las rutas de escritura llaman a index_*/unindex_* dentro de la misma
+transacción; `flask search-reindex` reconstruye el índice completo.
+"""
+import re
+from sqlalchemy import DDL, event, text, or_, bindparam
+from api.models import db, Event, Task
+
+KIND_EVENT = 0
+KIND_TASK = 1
+KIND_NAMES = {KIND_EVENT: "event", KIND_TASK: "task"}
+
+PG_TS_CONFIG = "simple"  # contenido mixto es/en: sin stemming
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, owner, tokenize = 'unicode61 remove_diacritics 2')"
+)
+PG_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_document ("
+    "doc_id BIGINT PRIMARY KEY, "
+    "user_id INTEGER NOT NULL, "
+    "title TEXT NOT NULL, "
+    "body TEXT, "
+    "tsv tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(body, '')), 'B')) STORED)"
+)
+PG_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING gin (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_user_id ON search_document (user_id)",
+)
+
+# create_all() también crea el índice (además de la migración)
+event.listen(db.metadata, "after_create", DDL(SQLITE_DDL).execute_if(dialect="sqlite"))
+event.listen(db.metadata, "after_create", DDL(PG_DDL).execute_if(dialect="postgresql"))
+for _ddl in PG_INDEX_DDL:
+    event.listen(db.metadata, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Filtro para autogenerate: las tablas de búsqueda no están en los modelos."""
+    if type_ == "table" and reflected and compare_to is None:
+        return not name.startswith("search_")
+    return True
+
+
+def _dialect(session=None) -> str:
+    session = session or db.session
+    return session.get_bind(mapper=Event.__mapper__).dialect.name
+
+
+def ensure_schema(session=None):
+    session = session or db.session
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        session.execute(text(SQLITE_DDL))
+    elif dialect == "postgresql":
+        session.execute(text(PG_DDL))
+        for ddl in PG_INDEX_DDL:
+            session.execute(text(ddl))
+
+
+# -------------------- Escritura --------------------
+
+def _doc_id(kind: int, ref_id: int) -> int:
+    return ref_id * 2 + kind
+
+
+def _event_doc(ev: Event) -> dict:
+    return {"doc_id": _doc_id(KIND_EVENT, ev.id), "user_id": ev.user_id,
+            "title": ev.title, "body": ev.notes or ""}
+
+
+def _task_doc(t: Task) -> dict:
+    return {"doc_id": _doc_id(KIND_TASK, t.id), "user_id": t.user_id,
+            "title": t.title, "body": ""}
+
+
+def _upsert(docs: list, session=None):
+    if not docs:
+        return
+    session = session or db.session
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        session.execute(text(
+            "INSERT OR REPLACE INTO search_fts (rowid, title, body, owner) "
+            "VALUES (:doc_id, :title, :body, 'u' || :user_id)"
+        ), docs, bind_arguments={"mapper": Event.__mapper__})
+    elif dialect == "postgresql":
+        session.execute(text(
+            "INSERT INTO search_document (doc_id, user_id, title, body) "
+            "VALUES (:doc_id, :user_id, :title, :body) "
+            "ON CONFLICT (doc_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"
+        ), docs, bind_arguments={"mapper": Event.__mapper__})
+
+
+def _delete(doc_ids: list, session=None):
+    if not doc_ids:
+        return
+    session = session or db.session
+    dialect = _dialect(session)
+    table = {"sqlite": "search_fts", "postgresql": "search_document"}.get(dialect)
+    if table is None:
+        return
+    key = "rowid" if dialect == "sqlite" else "doc_id"
+    session.execute(
+        text(f"DELETE FROM {table} WHERE {key} IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": doc_ids}, bind_arguments={"mapper": Event.__mapper__})
+
+
+def index_events(events, session=None):
+    _upsert([_event_doc(ev) for ev in events], session)
+
+
+def index_tasks(tasks, session=None):
+    _upsert([_task_doc(t) for t in tasks], session)
+
+
+def unindex_event(event_id: int, session=None):
+    _delete([_doc_id(KIND_EVENT, event_id)], session)
+
+
+def unindex_task(task_id: int, session=None):
+    _delete([_doc_id(KIND_TASK, task_id)], session)
+
+
+def unindex_user(user_id: int | None, session=None):
+    """Borra los documentos de un usuario (o todos con user_id=None)."""
+    session = session or db.session
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        if user_id is None:
+            session.execute(text("DELETE FROM search_fts"), bind_arguments={"mapper": Event.__mapper__})
+        else:
+            session.execute(text("DELETE FROM search_fts WHERE search_fts MATCH :owner"),
+                            {"owner": f'owner:"u{user_id}"'}, bind_arguments={"mapper": Event.__mapper__})
+    elif dialect == "postgresql":
+        where = "" if user_id is None else " WHERE user_id = :uid"
+        session.execute(text("DELETE FROM search_document" + where), {"uid": user_id},
+                        bind_arguments={"mapper": Event.__mapper__})
+
+
+def reindex(user_id: int | None = None, chunk_size: int = 1000, session=None) -> int:
+    """Reconstruye el índice (de todos o de un usuario). Devuelve los documentos indexados."""
+    session = session or db.session
+    ensure_schema(session)
+    if _dialect(session) not in ("sqlite", "postgresql"):
+        return 0
+    unindex_user(user_id, session)
+
+    total = 0
+    for model, to_doc in ((Event, _event_doc), (Task, _task_doc)):
+        q = model.query
+        if user_id is not None:
+            q = q.filter(model.user_id == user_id)
+        batch = []
+        for obj in q.order_by(model.id).yield_per(chunk_size):
+            batch.append(to_doc(obj))
+            if len(batch) >= chunk_size:
+                _upsert(batch, session)
+                total += len(batch)
+                batch = []
+        _upsert(batch, session)
+        total += len(batch)
+    return total
+
+
+# -------------------- Lectura --------------------
+
+def _terms(q: str) -> list:
+    return _WORD.findall(q or "")[:16]
+
+
+def search(user_id: int, q: str, limit: int = 20, offset: int = 0, session=None):
+    """Devuelve [(kind, ref_id, rank)] ordenado por relevancia."""
+    session = session or db.session
+    terms = _terms(q)
+    if not terms:
+        return []
+    dialect = _dialect(session)
+
+    if dialect == "sqlite":
+        # Cada término entre comillas (sin sintaxis FTS del usuario) y con prefijo,
+        # solo en title/body: en `owner` "u" o "u1" coincidirían con todo
+        match = f'owner:"u{user_id}" AND {{title body}}:(' + " AND ".join(f'"{t}"*' for t in terms) + ")"
+        rows = session.execute(text(
+            "SELECT rowid, bm25(search_fts, 10.0, 2.0, 0.0) AS rank FROM search_fts "
+            "WHERE search_fts MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset},
+            bind_arguments={"mapper": Event.__mapper__}).all()
+        return [(KIND_NAMES[doc % 2], doc // 2, -rank) for doc, rank in rows]
+
+    if dialect == "postgresql":
+        tsquery = " & ".join(f"{t}:*" for t in terms)
+        rows = session.execute(text(
+            f"SELECT doc_id, ts_rank(tsv, query) AS rank "
+            f"FROM search_document, to_tsquery('{PG_TS_CONFIG}', :tsquery) AS query "
+            "WHERE user_id = :uid AND tsv @@ query "
+            "ORDER BY rank DESC, doc_id DESC LIMIT :limit OFFSET :offset"
+        ), {"tsquery": tsquery, "uid": user_id, "limit": limit, "offset": offset},
+            bind_arguments={"mapper": Event.__mapper__}).all()
+        return [(KIND_NAMES[doc % 2], doc // 2, float(rank)) for doc, rank in rows]
+
+    # Sin índice de texto: ILIKE (solo para desarrollo)
+    like = [f"%{t}%" for t in terms]
+    ev_ids = Event.query.with_entities(Event.id).filter(
+        Event.user_id == user_id, *[or_(Event.title.ilike(p), Event.notes.ilike(p)) for p in like])
+    task_ids = Task.query.with_entities(Task.id).filter(
+        Task.user_id == user_id, *[Task.title.ilike(p) for p in like])
+    hits = [("event", i, 0.0) for (i,) in ev_ids.order_by(Event.id.desc())]
+    hits += [("task", i, 0.0) for (i,) in task_ids.order_by(Task.id.desc())]
+    return hits[offset:offset + limit]
@@ -0,0 +1,102 @@
+"""
+Enrutado de sesiones por shard (sin dependencias de los modelos).
+
+SHARD_DATABASE_URLS="url0,url1,..." registra los binds shard0..shardN-1. Cada
+usuario vive entero (User, Event, Task, índice de búsqueda...) en un shard; la
+tabla user_directory (email → id, shard) y los tokens revocados (revoked_token)
+se quedan en la base de datos principal.
+
+El shard activo se guarda en `g._shard`: lo fija un before_request a partir del
+JWT (api/sharding.py) o explícitamente con `use_shard(n)` en signup/login y en
+los comandos de la CLI. Sin SHARD_DATABASE_URLS nada de esto se activa.
+"""
+import os
+import bisect
+import hashlib
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context
+import sqlalchemy as sa
+
+DIRECTORY_TABLE = "user_directory"
+PRIMARY_TABLES = (DIRECTORY_TABLE, "revoked_token")  # nunca van a un shard
+VIRTUAL_NODES = 64
+
+
+class ShardNotSelected(RuntimeError):
+    pass
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Hash consistente: al añadir un shard solo se mueve ~1/N de los usuarios."""
+
+    def __init__(self, shard_count: int, vnodes: int = VIRTUAL_NODES):
+        points = sorted((_hash(f"shard{s}:{v}"), s) for s in range(shard_count) for v in range(vnodes))
+        self._keys = [p for p, _ in points]
+        self._shards = [s for _, s in points]
+
+    def shard_for(self, key) -> int:
+        i = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._shards[i]
+
+
+def bind_name(shard: int) -> str:
+    return f"shard{shard}"
+
+
+def shard_count(app=None) -> int:
+    app = app or (current_app if has_app_context() else None)
+    return app.config.get("SHARD_COUNT", 0) if app is not None else 0
+
+
+def configure_shards(app):
+    """Registra los binds de los shards; llamar antes de db.init_app()."""
+    urls = [u.strip() for u in os.getenv("SHARD_DATABASE_URLS", "").split(",") if u.strip()]
+    app.config.setdefault("SHARD_COUNT", len(urls))
+    if urls:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for i, url in enumerate(urls):
+            binds[bind_name(i)] = url.replace("postgres://", "postgresql://")
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.extensions["shard_ring"] = HashRing(len(urls))
+
+
+def ring(app=None) -> HashRing:
+    return (app or current_app).extensions["shard_ring"]
+
+
+@contextmanager
+def use_shard(shard):
+    previous = g.get("_shard")
+    g._shard = shard
+    try:
+        yield shard
+    finally:
+        g._shard = previous
+
+
+def _targets_primary(mapper, clause) -> bool:
+    table = None
+    if mapper is not None:
+        table = sa.inspect(mapper).local_table
+    elif isinstance(clause, sa.Table):
+        table = clause
+    elif isinstance(clause, sa.UpdateBase):
+        table = clause.table
+    elif isinstance(clause, sa.Select):
+        froms = clause.get_final_froms()
+        return bool(froms) and all(getattr(f, "name", None) in PRIMARY_TABLES for f in froms)
+    return getattr(table, "name", None) in PRIMARY_TABLES
+
+
+def shard_engine(session, mapper=None, clause=None):
+    """Engine del shard activo, o None si la sentencia va a la BD principal."""
+    if not shard_count() or _targets_primary(mapper, clause):
+        return None
+    shard = g.get("_shard")
+    if shard is None:
+        raise ShardNotSelected("No shard selected for this query (use_shard() or a JWT-authenticated request)")
+    return session._db.engines[bind_name(shard)]
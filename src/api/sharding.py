@@ -0,0 +1,298 @@
+"""
+Sharding por usuario: directorio, alta/login y rebalanceo (ver api/shard_router.py).
+
+- `create_user` reserva primero el email en user_directory (BD principal, unicidad
+  global) y después crea el User con el mismo id en el shard que diga el anillo.
+- `find_user_by_email` resuelve email → shard en el directorio y carga el User.
+- El shard de cada petición autenticada se resuelve una vez en before_request y
+  se cachea por proceso (SHARD_CACHE_TTL segundos), junto con la marca `moving`:
+  mientras está puesta, las escrituras del usuario reciben un 503.
+- `rebalance_plan` + `move_user` llevan a su shard a los usuarios cuyo shard en el
+  anillo ya no coincide con el del directorio (p. ej. tras añadir una URL a
+  SHARD_DATABASE_URLS); lo usa `flask shards-rebalance`.
+
+Sin shards configurados todo vive en la BD principal y el directorio usa shard 0.
+Para empezar a shardear una instalación existente, la BD principal puede ser el
+shard 0 (SHARD_DATABASE_URLS="$DATABASE_URL,postgres://...") y `flask shards-rebalance`
+reparte los usuarios.
+"""
+import threading
+from time import monotonic, sleep
+from flask import g, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from api.models import db, User, UserDirectory, Event, Task, ArchivedEvent, ArchivedTask, ImportProgress
+from api.shard_router import shard_count, ring, use_shard, bind_name, DIRECTORY_TABLE, PRIMARY_TABLES
+from api.replica import _request_user_id
+from api.utils import APIException
+
+SHARD_CACHE_TTL = 60.0
+MOVE_CHUNK = 1000
+MOVING_RETRY_AFTER = 30  # segundos, en el 503 de las escrituras durante un movimiento
+
+# Escrituras que solo tocan la BD principal (revocaciones): siguen permitidas
+PRIMARY_ONLY_ENDPOINTS = ("api.refresh_token", "api.logout")
+
+_lock = threading.Lock()
+_shard_cache = {}  # user_id -> (shard, moving, expira)
+
+# Filas de usuario que viven en cada shard. Al rebalancear, lo archivado vuelve
+# a la tabla caliente del destino (el próximo `flask archive` lo archiva allí).
+# import_progress viaja con el usuario: una importación a medias se puede reanudar
+SHARDED_MODELS = (User, Event, Task, ArchivedEvent, ArchivedTask, ImportProgress)
+MOVE_INTO = {ArchivedEvent: Event, ArchivedTask: Task}
+
+
+def assign_shard(user_id: int) -> int:
+    return ring().shard_for(user_id) if shard_count() else 0
+
+
+def directory_entry(user_id: int):
+    """(shard, moving) del usuario según el directorio (cacheado), o None si no existe."""
+    now = monotonic()
+    hit = _shard_cache.get(user_id)
+    if hit is not None and hit[2] > now:
+        return hit[:2]
+    row = db.session.execute(
+        select(UserDirectory.shard, UserDirectory.moving).where(UserDirectory.id == user_id)).first()
+    if row is None:
+        return None
+    _remember(user_id, row.shard, row.moving)
+    return row.shard, row.moving
+
+
+def shard_for_user(user_id: int):
+    """Shard del usuario según el directorio (cacheado), o None si no existe."""
+    entry = directory_entry(user_id)
+    return None if entry is None else entry[0]
+
+
+def _remember(user_id: int, shard: int, moving: bool = False):
+    with _lock:
+        _shard_cache[user_id] = (shard, moving, monotonic() + SHARD_CACHE_TTL)
+        if len(_shard_cache) > 100000:
+            now = monotonic()
+            for k in [k for k, (_, _, exp) in _shard_cache.items() if exp <= now]:
+                del _shard_cache[k]
+
+
+def forget_user(user_id: int):
+    _shard_cache.pop(user_id, None)
+
+
+# -------------------- Alta / login --------------------
+
+def create_user(email: str, password: str, is_active: bool = True) -> int:
+    """Reserva el email en el directorio y crea el usuario en su shard; devuelve su id."""
+    entry = UserDirectory(email=email, shard=0)
+    db.session.add(entry)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise APIException("User already exists", 409)
+    # Copias locales: el commit expira `entry` y releerlo costaría otra consulta
+    uid, shard = entry.id, assign_shard(entry.id)
+    entry.shard = shard
+    db.session.commit()
+
+    try:
+        with use_shard(shard):
+            user = User(id=uid, email=email, is_active=is_active)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+    except Exception:
+        # Sin transacción distribuida: se libera el email reservado
+        db.session.rollback()
+        db.session.execute(delete(UserDirectory).where(UserDirectory.id == uid))
+        db.session.commit()
+        raise
+    _remember(uid, shard)
+    return uid
+
+
+def find_user_by_email(email: str):
+    entry = db.session.execute(
+        select(UserDirectory.id, UserDirectory.shard, UserDirectory.moving)
+        .where(UserDirectory.email == email)).first()
+    if entry is None:
+        return None
+    _remember(entry.id, entry.shard, entry.moving)
+    with use_shard(entry.shard):
+        return db.session.get(User, entry.id)
+
+
+# -------------------- Mantenimiento --------------------
+
+def init_shards():
+    """Crea las tablas de usuario en cada shard (la BD principal usa las migraciones)."""
+    tables = [t for name, t in db.metadata.tables.items() if name not in PRIMARY_TABLES]
+    created = []
+    for shard in range(shard_count()):
+        engine = db.engines[bind_name(shard)]
+        db.metadata.create_all(engine, tables=tables)
+        created.append(shard)
+    return created
+
+
+def _chunk(model, user_id: int, after: int) -> list:
+    table = model.__table__
+    owner = table.c.id if model is User else table.c.user_id
+    rows = db.session.execute(
+        select(table).where(owner == user_id, table.c.id > after)
+        .order_by(table.c.id).limit(MOVE_CHUNK)).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def _purge_user(user_id: int):
+    """Borra al usuario (y su índice de búsqueda y mapa de ocupación) del shard activo."""
+    from api import search, occupancy
+
+    search.unindex_user(user_id)
+    occupancy.clear_user(user_id)
+    for model in reversed(SHARDED_MODELS):
+        owner = model.id if model is User else model.user_id
+        db.session.execute(delete(model).where(owner == user_id))
+
+
+def _fingerprint(user_id: int) -> dict:
+    """{modelo: (filas, id máximo)} del usuario en el shard activo."""
+    result = {}
+    for model in SHARDED_MODELS:
+        table = model.__table__
+        owner = table.c.id if model is User else table.c.user_id
+        result[model] = tuple(db.session.execute(
+            select(func.count(), func.coalesce(func.max(table.c.id), 0)).where(owner == user_id)).one())
+    return result
+
+
+def set_moving(user_id: int, moving: bool, **values):
+    """Marca (o desmarca) al usuario como en movimiento en el directorio y lo confirma."""
+    db.session.execute(update(UserDirectory).where(UserDirectory.id == user_id)
+                       .values(moving=moving, **values))
+    db.session.commit()
+    forget_user(user_id)
+
+
+def move_user(user_id: int, source: int, target: int, wait: float = SHARD_CACHE_TTL) -> int:
+    """Copia un usuario al shard destino, actualiza el directorio y lo borra del origen.
+
+    1. Marca al usuario `moving` y espera `wait` segundos (el TTL de la caché):
+       desde entonces todos los workers rechazan sus escrituras, y las que ya
+       estaban en curso han terminado.
+    2. Copia sus filas; si el origen cambió durante la copia (comparando filas e
+       id máximo por tabla), la descarta y deja al usuario donde estaba.
+    3. Apunta el directorio al destino y quita la marca. Los workers que aún
+       tienen el shard viejo en caché también tienen la marca: solo leen de él.
+    4. Espera otra vez `wait` segundos y, tras comprobar que el origen sigue sin
+       cambios, lo borra de allí.
+
+    El User conserva su id (lo asigna el directorio); eventos y tareas (también
+    los archivados) reciben ids nuevos en el destino, porque cada shard tiene su
+    propia secuencia. Si una ejecución anterior se cortó a medias, la copia
+    parcial del destino se descarta.
+    """
+    from api import search, occupancy
+
+    set_moving(user_id, True)
+    try:
+        sleep(wait)
+        with use_shard(source):
+            before = _fingerprint(user_id)
+        with use_shard(target):
+            _purge_user(user_id)
+        moved = 0
+        for model in SHARDED_MODELS:
+            after = 0
+            while True:
+                with use_shard(source):
+                    chunk = _chunk(model, user_id, after)
+                if not chunk:
+                    break
+                after = chunk[-1]["id"]
+                if model is not User:
+                    for row in chunk:
+                        del row["id"]
+                        row.pop("archived_at", None)
+                with use_shard(target):
+                    db.session.execute(insert(MOVE_INTO.get(model, model).__table__), chunk)
+                moved += len(chunk)
+        with use_shard(source):
+            changed = _fingerprint(user_id) != before
+        if changed:
+            raise RuntimeError(f"user {user_id} changed on shard{source} during the copy; not moved")
+        with use_shard(target):
+            search.reindex(user_id=user_id)
+            occupancy.rebuild_user(user_id)
+            db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        set_moving(user_id, False)
+        raise
+    set_moving(user_id, False, shard=target)
+
+    sleep(wait)
+    with use_shard(source):
+        if _fingerprint(user_id) != before:
+            db.session.rollback()
+            raise RuntimeError(f"user {user_id} changed on shard{source} after the move; "
+                               "old copy kept for inspection")
+        _purge_user(user_id)
+        db.session.commit()
+    return moved
+
+
+def rebalance_plan(limit=None):
+    """[(user_id, shard_actual, shard_destino)] de los usuarios mal colocados."""
+    if not shard_count():
+        return []
+    r = ring()
+    plan = []
+    rows = db.session.execute(select(UserDirectory.id, UserDirectory.shard).order_by(UserDirectory.id))
+    for uid, shard in rows:
+        target = r.shard_for(uid)
+        if target != shard:
+            plan.append((uid, shard, target))
+            if limit and len(plan) >= limit:
+                break
+    return plan
+
+
+def setup_sharding(app):
+    if not shard_count(app):
+        return
+
+    @app.before_request
+    def _choose_shard():
+        g._shard = None
+        try:
+            verify_jwt_in_request(optional=True)
+        except Exception:
+            return  # el propio endpoint devolverá el 401
+        uid = _request_user_id()
+        if uid is None:
+            return
+        entry = directory_entry(uid)
+        if entry is None:
+            return
+        g._shard, moving = entry
+        if moving and _writes_to_shard():
+            resp = jsonify({"message": "Your account is being moved to another server; retry shortly"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = str(MOVING_RETRY_AFTER)
+            return resp
+
+
+def _writes_to_shard() -> bool:
+    """¿Puede esta petición escribir en el shard del usuario? (un batch solo de GETs, no)."""
+    if request.method in ("GET", "HEAD", "OPTIONS") or request.endpoint in PRIMARY_ONLY_ENDPOINTS:
+        return False
+    if request.endpoint == "api.batch_requests":
+        from api import batch
+        try:
+            return not batch.only_reads(batch.parse(request.get_json(silent=True)))
+        except APIException:
+            return False  # el propio endpoint devolverá el 400
+    return True
@@ -0,0 +1,179 @@
+"""
+Tokens de sesión: acceso corto + refresh rotatorio + revocación en memoria.
+
+- /api/token devuelve un access token (JWT_ACCESS_MINUTES, 15 por defecto) y un
+  refresh token (JWT_REFRESH_DAYS, 30). Ambos llevan el mismo `sid` (sesión).
+- /api/token/refresh acepta el refresh token, lo revoca y devuelve un par nuevo
+  con el mismo sid. Si un refresh token ya rotado se vuelve a presentar
+  (robado o reenviado), se revoca la sesión entera. revoked_token.key es
+  único: si dos workers rotan el mismo token a la vez, uno de ellos lo ve como
+  reutilización.
+- /api/logout revoca el sid: el access token y el refresh token dejan de valer.
+
+Las revocaciones se guardan en revoked_token (BD principal) y cada proceso
+mantiene un set con las claves aún no caducadas (jti / sid como 16 bytes). El
+set se pone al día cada REVOCATION_POLL segundos leyendo las filas con
+revoked_at reciente (desde el sondeo anterior menos REVOCATION_OVERLAP, para no
+perder las que se confirman tarde) y se recarga entero (sin las caducadas) cada
+REVOCATION_RELOAD. Así `jwt_required()` es una consulta en memoria; otro worker
+puede tardar hasta REVOCATION_POLL segundos en ver una revocación.
+"""
+import os
+import uuid
+import threading
+from time import monotonic
+from datetime import datetime, timedelta, timezone
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from api.models import db, RevokedToken
+from api.utils import APIException, utc_now
+
+ACCESS_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_MINUTES", 15)))
+REFRESH_EXPIRES = timedelta(days=int(os.getenv("JWT_REFRESH_DAYS", 30)))
+
+REVOCATION_POLL = 5.0
+REVOCATION_RELOAD = 300.0
+# Un id menor puede confirmarse después de uno mayor, y revoked_at lo pone el
+# worker al insertar: cada sondeo relee este margen (commits lentos, relojes)
+REVOCATION_OVERLAP = timedelta(seconds=60)
+
+
+def _pack(key: str) -> bytes:
+    """jti/sid (uuid) → 16 bytes; cualquier otra cadena tal cual."""
+    try:
+        return uuid.UUID(key).bytes
+    except (TypeError, ValueError):
+        return str(key).encode()
+
+
+def _utc(ts) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+class RevocationSet:
+    """Claves revocadas vigentes, sincronizadas con revoked_token por sondeo."""
+
+    def __init__(self):
+        self._keys = set()
+        self._since = None  # revoked_at desde el que relee el próximo sondeo
+        self._next_poll = 0.0
+        self._next_reload = 0.0
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        now = monotonic()
+        if now < self._next_poll:
+            return
+        # Si otro hilo ya está leyendo se usa el set actual (salvo la primera carga)
+        if not self._lock.acquire(blocking=not self._next_reload):
+            return
+        try:
+            started = utc_now()
+            stmt = select(RevokedToken.key)
+            reload = now >= self._next_reload
+            if reload:
+                stmt = stmt.where(RevokedToken.expires_at > started)
+            else:
+                stmt = stmt.where(RevokedToken.revoked_at >= self._since)
+            # Motor principal directamente: ni réplica, ni shard, ni la sesión de la petición
+            with db.engine.connect() as conn:
+                keys = {_pack(key) for key in conn.execute(stmt).scalars()}
+            if reload:
+                self._keys = keys
+                self._next_reload = now + REVOCATION_RELOAD
+            else:
+                self._keys |= keys
+            self._since = started - REVOCATION_OVERLAP
+            self._next_poll = now + REVOCATION_POLL
+        finally:
+            self._lock.release()
+
+    def add(self, key: str):
+        self._keys.add(_pack(key))
+
+    def __contains__(self, key) -> bool:
+        self._sync()
+        return _pack(key) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+
+revoked = RevocationSet()
+
+
+def issue(user_id: int, sid: str | None = None) -> dict:
+    claims = {"sid": sid or uuid.uuid4().hex}
+    identity = str(user_id)
+    return {
+        "access_token": create_access_token(identity=identity, additional_claims=claims),
+        "refresh_token": create_refresh_token(identity=identity, additional_claims=claims),
+    }
+
+
+def revoke(key: str, expires_at: datetime) -> bool:
+    """Revoca un jti o un sid (sin commit: lo hace el endpoint).
+
+    El INSERT se envía ya: si la clave ya estaba revocada (índice único, quizá
+    desde otro worker) deshace la sesión y devuelve False.
+    """
+    db.session.add(RevokedToken(key=key, expires_at=expires_at, revoked_at=utc_now()))
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        stored = False
+    else:
+        stored = True
+    revoked.add(key)
+    return stored
+
+
+def revoke_session(claims: dict):
+    # El sid vale mientras viva el último refresh token que se pudo emitir con él
+    revoke(claims["sid"], utc_now() + REFRESH_EXPIRES)
+
+
+def _revoke_session_now(claims: dict):
+    """Como revoke_session, pero confirmado ya en su propia conexión.
+
+    Lo usa el loader de JWT: un commit de la sesión de la petición confirmaría
+    también lo que la vista o los hooks anteriores tuvieran pendiente.
+    """
+    sid = claims["sid"]
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(RevokedToken.__table__).values(
+                key=sid, expires_at=utc_now() + REFRESH_EXPIRES, revoked_at=utc_now()))
+    except IntegrityError:
+        pass  # otro worker ya la revocó
+    revoked.add(sid)
+
+
+def rotate(claims: dict) -> dict:
+    """Refresh: revoca el token presentado y emite un par nuevo de la misma sesión."""
+    if not revoke(claims["jti"], _utc(claims["exp"])):
+        # Otro worker lo rotó antes de que este set lo viera: es una reutilización
+        _revoke_session_now(claims)
+        raise APIException("Token has been revoked", 401)
+    return issue(int(claims["sub"]), sid=claims["sid"])
+
+
+def is_revoked(claims: dict) -> bool:
+    sid = claims.get("sid")
+    if sid is not None and sid in revoked:
+        return True
+    if claims["jti"] not in revoked:
+        return False
+    if claims.get("type") == "refresh" and sid is not None:
+        # Reutilización de un refresh ya rotado: fuera toda la sesión
+        _revoke_session_now(claims)
+    return True
+
+
+def prune() -> int:
+    """Borra de revoked_token las filas ya caducadas (`flask tokens-prune`)."""
+    res = db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= utc_now()))
+    db.session.commit()
+    return res.rowcount
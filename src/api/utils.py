@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from flask import jsonify, url_for
 
 class APIException(Exception):
@@ -15,6 +16,10 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def utc_now() -> datetime:
+    """Ahora en UTC, sin tzinfo (las columnas DateTime guardan UTC naive)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -2,16 +2,23 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from datetime import timedelta
 from flask import Flask, request, jsonify, url_for, send_from_directory, make_response
 from flask_migrate import Migrate
 from api.utils import APIException, generate_sitemap
 from api.models import db
+from api.replica import configure_replica, setup_replica
+from api.shard_router import configure_shards
+from api.sharding import setup_sharding
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.metrics import setup_metrics
+from api.admission import setup_admission
+from api import tokens
+from api.search import include_object as search_include_object
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(
@@ -20,9 +27,18 @@ static_file_dir = os.path.join(os.path.dirname(
 app = Flask(__name__)
 app.url_map.strict_slashes = False
 
+# ===== Proxy inverso =====
+# PROXY_FIX_HOPS = nº de proxies de confianza delante (0: ninguno). Solo entonces
+# remote_addr / scheme salen de X-Forwarded-For / -Proto (p. ej. la IP del control de admisión)
+app.config["PROXY_FIX_HOPS"] = int(os.getenv("PROXY_FIX_HOPS", 0))
+if app.config["PROXY_FIX_HOPS"]:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_HOPS"], x_proto=1)
+
 # ===== JWT =====
 app.config["JWT_SECRET_KEY"] = os.getenv("FLASK_APP_KEY", "change-this-key")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+# Acceso corto + refresh rotatorio; revocación (logout) en memoria: api/tokens.py
+app.config["JWT_ACCESS_TOKEN_EXPIRES"] = tokens.ACCESS_EXPIRES
+app.config["JWT_REFRESH_TOKEN_EXPIRES"] = tokens.REFRESH_EXPIRES
 jwt = JWTManager(app)
 
 @jwt.unauthorized_loader
@@ -37,12 +53,23 @@ def _invalid_token_loader(msg):
 def _expired_token_loader(jwt_header, jwt_payload):
     return jsonify({"message": "Token expired"}), 401
 
+@jwt.token_in_blocklist_loader
+def _token_in_blocklist_loader(jwt_header, jwt_payload):
+    return tokens.is_revoked(jwt_payload)
+
+@jwt.revoked_token_loader
+def _revoked_token_loader(jwt_header, jwt_payload):
+    return jsonify({"message": "Token revoked"}), 401
+
+# ===== Métricas (METRICS_ENABLED=1): Server-Timing + /metrics =====
+setup_metrics(app, jwt)
+
 # ===== CORS ultra-permisivo (DEV: Codespaces/local) =====
 # En producción, sustituye origins="*" por tu dominio.
 CORS(app, resources={r"/api/*": {
     "origins": "*",
     "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    "allow_headers": ["Content-Type", "Authorization"],
+    "allow_headers": ["Content-Type", "Authorization", "X-Last-Write"],
     "supports_credentials": False
 }})
 
@@ -56,7 +83,7 @@ def _cors_preflight():
             "Access-Control-Request-Method", "GET, POST, PUT, DELETE, OPTIONS"
         )
         resp.headers["Access-Control-Allow-Headers"] = request.headers.get(
-            "Access-Control-Request-Headers", "Authorization, Content-Type"
+            "Access-Control-Request-Headers", "Authorization, Content-Type, X-Last-Write"
         )
         resp.headers["Access-Control-Max-Age"] = "86400"
         return resp
@@ -66,9 +93,13 @@ def _cors_preflight():
 def _add_cors_headers(resp):
     resp.headers.setdefault("Access-Control-Allow-Origin", "*")
     resp.headers.setdefault("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
-    resp.headers.setdefault("Access-Control-Allow-Headers", "Content-Type, Authorization")
+    resp.headers.setdefault("Access-Control-Allow-Headers", "Content-Type, Authorization, X-Last-Write")
     return resp
 
+# ===== Control de admisión: 503/429 + Retry-After por clase (auth, bulk, write, read) =====
+# Va antes de los hooks de BD (réplica, shards) para rechazar sin tocar la base de datos
+setup_admission(app)
+
 # ===== DB =====
 db_url = os.getenv("DATABASE_URL")
 if db_url is not None:
@@ -77,8 +108,17 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
+# Presupuesto de consultas por endpoint (api/query_budget.py): raise | warn | off
+# Sin definir: "raise" en test/debug, "off" en producción
+app.config['QUERY_BUDGET'] = os.getenv("QUERY_BUDGET")
+# Réplica de lectura opcional (REPLICA_DATABASE_URL, REPLICA_LAG_TOLERANCE)
+configure_replica(app)
+# Shards por usuario opcionales (SHARD_DATABASE_URLS=url0,url1,...)
+configure_shards(app)
+MIGRATE = Migrate(app, db, compare_type=True, include_object=search_include_object)
 db.init_app(app)
+setup_replica(app)
+setup_sharding(app)
 
 # Admin / CLI
 setup_admin(app)
@@ -0,0 +1,205 @@
+"""
+ASGI entry point.
+
+Las lecturas calientes (GET /api/calendar, /api/events y /api/tasks) se sirven
+con sesiones asíncronas de SQLAlchemy (aiosqlite / asyncpg), así una consulta
+lenta no bloquea un worker entero. El resto de rutas pasa a la app Flask de
+siempre a través de asgiref (en un hilo).
+
+    $ GUNICORN_MODE=async gunicorn --chdir ./src/ -c src/gunicorn_conf.py
+    $ uvicorn asgi:application --app-dir src --port 3001
+
+Nota: los hooks de Flask (métricas, presupuesto de consultas) no se aplican a
+las rutas asíncronas; el control de admisión sí (clase "read", api/admission.py).
+"""
+import os
+import json
+from urllib.parse import parse_qsl
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from jwt import ExpiredSignatureError
+from werkzeug.http import parse_cookie
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app import app as flask_app
+from api import archive, tokens
+from api.admission import MESSAGES
+from api.models import Event, Task, ArchivedEvent, ArchivedTask
+from api.routes import (task_filters, tasks_reach_archive, calendar_filters, calendar_items,
+                        _parse_date_yyyy_mm_dd)
+from api.replica import REPLICA_BIND, LAST_WRITE_COOKIE, in_write_window, parse_last_write
+from api.shard_router import shard_count, bind_name
+from api.sharding import shard_for_user
+from api.utils import APIException
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, PUT, DELETE, OPTIONS"),
+    (b"access-control-allow-headers", b"Content-Type, Authorization, X-Last-Write"),
+]
+
+
+def async_url(url: str) -> str:
+    """sqlite:// → sqlite+aiosqlite://, postgresql:// → postgresql+asyncpg://"""
+    url = url.replace("postgres://", "postgresql://", 1)
+    scheme, rest = url.split("://", 1)
+    driver = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}.get(scheme.split("+")[0])
+    return f"{driver or scheme}://{rest}"
+
+
+# -------------------- Handlers --------------------
+
+async def watermarks(session, key):
+    marks = archive.cached_watermarks(key)
+    if marks is None:
+        marks = archive.remember_watermarks(key, (await session.execute(archive.watermarks_query())).all())
+    return marks
+
+
+async def events_list(session, uid, args, marks):
+    rows = (await session.scalars(select(Event).where(Event.user_id == uid).order_by(Event.start.asc()))).all()
+    if archive.reaches(marks["event"], None):
+        cold = (await session.scalars(select(ArchivedEvent).where(ArchivedEvent.user_id == uid))).all()
+        rows = archive.merge(list(rows), list(cold), key=lambda e: e.start)
+    return [e.serialize() for e in rows]
+
+
+async def tasks_list(session, uid, args, marks):
+    rows = (await session.scalars(select(Task).where(*task_filters(uid, args)).order_by(Task.id.desc()))).all()
+    if tasks_reach_archive(args, marks["task"]):
+        cold = (await session.scalars(select(ArchivedTask).where(*task_filters(uid, args, ArchivedTask)))).all()
+        rows = archive.merge(list(rows), list(cold), key=lambda t: t.id, reverse=True)
+    return [t.serialize() for t in rows]
+
+
+async def calendar_feed(session, uid, args, marks):
+    ev_crit, task_crit = calendar_filters(uid, args)
+    events = (await session.scalars(select(Event).where(*ev_crit).order_by(Event.start.asc()))).all()
+    tasks = (await session.scalars(select(Task).where(*task_crit).order_by(Task.id.desc()))).all()
+    since = _parse_date_yyyy_mm_dd(args.get("from"))
+    a_ev_crit, a_task_crit = calendar_filters(uid, args, ArchivedEvent, ArchivedTask)
+    if archive.reaches(marks["event"], since):
+        cold = (await session.scalars(select(ArchivedEvent).where(*a_ev_crit))).all()
+        events = archive.merge(list(events), list(cold), key=lambda e: e.start)
+    if archive.reaches(marks["task"], since):
+        cold = (await session.scalars(select(ArchivedTask).where(*a_task_crit))).all()
+        tasks = archive.merge(list(tasks), list(cold), key=lambda t: t.id, reverse=True)
+    return calendar_items(events, tasks)
+
+
+READ_ROUTES = {
+    "/api/events": events_list,
+    "/api/tasks": tasks_list,
+    "/api/calendar": calendar_feed,
+}
+
+
+class AsyncReadApp:
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        self.sessions = {}  # bind -> async_sessionmaker (se crean en el primer uso)
+
+    def _sessionmaker(self, bind):
+        if bind not in self.sessions:
+            if bind is not None:  # réplica o shard
+                url = self.app.config["SQLALCHEMY_BINDS"][bind]
+            else:
+                url = self.app.config["SQLALCHEMY_DATABASE_URI"]
+            engine = create_async_engine(async_url(url), pool_pre_ping=True)
+            self.sessions[bind] = async_sessionmaker(engine, expire_on_commit=False)
+        return self.sessions[bind]
+
+    def _authenticate(self, scope):
+        """Devuelve (uid, bind) o lanza APIException 401 como la app Flask.
+
+        Síncrono (revocaciones y directorio de shards pueden consultar la BD):
+        se llama en un hilo, nunca en el bucle de eventos.
+        """
+        headers = dict(scope["headers"])
+        auth = headers.get(b"authorization", b"").decode()
+        if not auth.startswith("Bearer "):
+            raise APIException("Missing or invalid Authorization header", 401)
+        with self.app.app_context():
+            try:
+                claims = decode_token(auth[7:])
+            except ExpiredSignatureError:
+                raise APIException("Token expired", 401)
+            except Exception:
+                raise APIException("Invalid token", 401)
+            if claims.get("type") != "access":
+                raise APIException("Invalid token", 401)
+            if tokens.is_revoked(claims):
+                raise APIException("Token revoked", 401)
+            try:
+                uid = int(claims["sub"])
+            except (KeyError, TypeError, ValueError):
+                raise APIException("Invalid token subject", 401)
+            if shard_count(self.app):
+                # Directorio cacheado por proceso: casi nunca toca la BD
+                shard = shard_for_user(uid)
+                if shard is None:
+                    raise APIException("User not found", 404)
+                return uid, bind_name(shard)
+            replica = REPLICA_BIND in (self.app.config.get("SQLALCHEMY_BINDS") or {})
+            last_write = parse_last_write(headers.get(b"x-last-write", b"").decode() or
+                                          parse_cookie(headers.get(b"cookie", b"").decode()).get(LAST_WRITE_COOKIE))
+            bind = REPLICA_BIND if replica and not in_write_window(last_write) else None
+        return uid, bind
+
+    async def _respond(self, send, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode()
+        headers = [(b"content-type", b"application/json"),
+                   (b"content-length", str(len(body)).encode())] + CORS_HEADERS + list(extra_headers)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for maker in self.sessions.values():
+                    await maker.kw["bind"].dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        handler = None
+        if scope["type"] == "http" and scope["method"] == "GET":
+            handler = READ_ROUTES.get(scope["path"].rstrip("/"))
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        gate = self.app.extensions.get("admission", {}).get("read")
+        try:
+            # thread_sensitive=False: fuera del hilo compartido de asgiref, así
+            # una consulta lenta no frena al resto de conexiones del worker
+            uid, bind = await sync_to_async(self._authenticate, thread_sensitive=False)(scope)
+            refused = gate.enter(f"u{uid}") if gate is not None else None
+            if refused is not None:
+                status, retry_after = refused
+                return await self._respond(send, status, {"message": MESSAGES[status]},
+                                           [(b"retry-after", str(retry_after).encode())])
+            try:
+                args = dict(parse_qsl(scope.get("query_string", b"").decode()))
+                async with self._sessionmaker(bind)() as session:
+                    payload = await handler(session, uid, args, await watermarks(session, bind))
+            finally:
+                if gate is not None:
+                    gate.leave()
+        except APIException as e:
+            return await self._respond(send, e.status_code, e.to_dict())
+        await self._respond(send, 200, payload)
+
+
+application = AsyncReadApp(flask_app)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(application, host="0.0.0.0", port=int(os.environ.get("PORT", 3001)))
@@ -0,0 +1,427 @@
+"""
+Benchmark suite for the API endpoints.
+
+Seeds users with datasets of several sizes, drives every endpoint through the
+Flask test client (or a real server with --url) and reports p50/p95/p99
+latency, throughput, SQL statements per request and peak memory. Results are
+compared against bench_baseline.json and the script exits with status 1 when
+something regresses beyond the allowed tolerance.
+
+    $ pipenv run bench                               # test client, temp SQLite
+    $ pipenv run bench --sizes 100,1000 --requests 100
+    $ pipenv run bench --update-baseline             # store current numbers
+    $ pipenv run bench --url http://127.0.0.1:3001   # gunicorn on localhost
+    $ pipenv run bench --compare-servers sync,gthread,async --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import socket
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urlrequest
+from urllib.error import HTTPError
+
+SRC_DIR = os.path.dirname(os.path.realpath(__file__))
+BASELINE_FILE = os.path.join(SRC_DIR, "bench_baseline.json")
+DEFAULT_SIZES = [100, 1000, 10000]
+PASSWORD = "bench-password"
+FIRST_DAY = date(2024, 1, 1)
+
+# Tolerancias para considerar una regresión
+LATENCY_TOLERANCE = 0.5     # +50% sobre el p95 guardado...
+LATENCY_SLACK_MS = 2.0      # ...y al menos 2ms más (ruido en endpoints muy rápidos)
+MEMORY_TOLERANCE = 0.5      # +50% sobre el pico de memoria guardado...
+MEMORY_SLACK_KB = 64.0      # ...y al menos 64KB más (cachés de SQLAlchemy, re, etc. entre ejecuciones)
+
+
+# -------------------- Scenarios --------------------
+# Cada escenario: (nombre, método, path(ctx), body(ctx), iteraciones relativas)
+
+def _day(n: int) -> str:
+    return (FIRST_DAY + timedelta(days=n)).isoformat()
+
+SCENARIOS = [
+    ("token", "POST", lambda c: "/api/token",
+     lambda c: {"email": c["email"], "password": PASSWORD}, 0.2),
+    ("events_list", "GET", lambda c: "/api/events", None, 1),
+    ("events_create", "POST", lambda c: "/api/events",
+     lambda c: {"title": "bench", "start": f"{_day(c['i'] % 365)}T09:00:00",
+                "end": f"{_day(c['i'] % 365)}T10:00:00"}, 1),
+    ("events_batch", "POST", lambda c: "/api/events/batch",
+     lambda c: {"title": "bench batch", "startDay": _day(c["i"] % 365),
+                "endDay": _day(c["i"] % 365 + 6), "startTime": "11:00", "endTime": "12:00"}, 1),
+    ("tasks_list", "GET", lambda c: "/api/tasks", None, 1),
+    ("tasks_list_date", "GET", lambda c: f"/api/tasks?date={_day(c['i'] % 365)}", None, 1),
+    ("tasks_undated", "GET", lambda c: "/api/tasks?undated=1", None, 1),
+    ("tasks_overdue", "GET", lambda c: "/api/tasks?overdue=1", None, 1),
+    ("tasks_create", "POST", lambda c: "/api/tasks",
+     lambda c: {"title": "bench task", "date": _day(c["i"] % 365)}, 1),
+    ("tasks_toggle", "POST", lambda c: f"/api/tasks/{c['task_id']}/toggle", None, 1),
+    ("calendar", "GET", lambda c: "/api/calendar", None, 1),
+    ("calendar_month", "GET", lambda c: f"/api/calendar?from={_day(31)}&to={_day(59)}", None, 1),
+    ("search", "GET", lambda c: f"/api/search?q=event {c['i'] % 50}", None, 1),
+    ("calendar_summary", "GET", lambda c: f"/api/calendar/summary?from={_day(31)}&to={_day(59)}", None, 1),
+    ("slots", "GET", lambda c: f"/api/slots?duration=45&from={_day(c['i'] % 365)}T00:00:00"
+                               f"&to={_day(c['i'] % 365 + 7)}T00:00:00&hours=08:00-20:00&limit=5", None, 1),
+    # NDJSON en streaming: se consume entero (ver LocalRunner.call)
+    ("export", "GET", lambda c: "/api/export", None, 0.2),
+    # Carga inicial de Agenda.jsx en una sola petición
+    ("batch_load", "POST", lambda c: "/api/batch",
+     lambda c: {"parallel": True, "requests": [{"method": "GET", "path": "/api/calendar"},
+                                               {"method": "GET", "path": "/api/tasks?undated=1"}]}, 1),
+]
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (values ya ordenados)."""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+def summarize(latencies, elapsed, queries=None, peak_bytes=None):
+    lat = sorted(latencies)
+    out = {
+        "requests": len(lat),
+        "p50_ms": round(percentile(lat, 50) * 1000, 3),
+        "p95_ms": round(percentile(lat, 95) * 1000, 3),
+        "p99_ms": round(percentile(lat, 99) * 1000, 3),
+        "rps": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+    }
+    if queries is not None:
+        out["queries"] = queries
+    if peak_bytes is not None:
+        out["peak_kb"] = round(peak_bytes / 1024, 1)
+    return out
+
+
+# -------------------- In-process (Flask test client) --------------------
+
+def _seed_rows(size: int):
+    """Genera `size` eventos y `size` tareas repartidos en el año."""
+    events, tasks = [], []
+    for i in range(size):
+        d = FIRST_DAY + timedelta(days=i % 365)
+        start = datetime(d.year, d.month, d.day, 8 + i % 10, 0)
+        events.append({"title": f"event {i}", "start": start, "end": start + timedelta(hours=1),
+                       "all_day": False, "color": "#3f51b5", "notes": f"notes {i}"})
+        tasks.append({"title": f"task {i}", "done": i % 3 == 0,
+                      "date": None if i % 5 == 0 else d})
+    return events, tasks
+
+
+class LocalRunner:
+    def __init__(self):
+        # La base de datos debe definirse antes de importar la app
+        self.tmpdir = tempfile.mkdtemp(prefix="bench-")
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(self.tmpdir, "bench.db")
+        os.environ.setdefault("ADMISSION_CONTROL", "0")  # medimos el endpoint, no el rate limit
+        from app import app
+        from api.models import db
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.app = app
+        self.db = db
+        self.client = app.test_client()
+        self.statements = 0
+        event.listen(Engine, "before_cursor_execute", self._count_statement)
+        with app.app_context():
+            from api import sharding
+            db.create_all()
+            sharding.init_shards()  # solo con SHARD_DATABASE_URLS
+
+    def _count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def seed(self, size: int) -> dict:
+        from sqlalchemy import insert, select
+        from api.models import Event, Task
+        from api import search, sharding, occupancy
+        from api.shard_router import use_shard
+
+        email = f"bench_{size}@bench.local"
+        with self.app.app_context():
+            uid = sharding.create_user(email, PASSWORD)
+            events, tasks = _seed_rows(size)
+            with use_shard(sharding.shard_for_user(uid)):
+                self.db.session.execute(insert(Event), [dict(r, user_id=uid) for r in events])
+                self.db.session.execute(insert(Task), [dict(r, user_id=uid) for r in tasks])
+                search.reindex(user_id=uid)
+                occupancy.rebuild_user(uid)
+                self.db.session.commit()
+                task_id = self.db.session.scalars(select(Task.id).where(Task.user_id == uid).limit(1)).first()
+
+        res = self.client.post("/api/token", json={"email": email, "password": PASSWORD})
+        token = res.get_json()["access_token"]
+        return {"email": email, "token": token, "task_id": task_id, "i": 0}
+
+    def call(self, ctx, method, path, body):
+        headers = {"Authorization": f"Bearer {ctx['token']}"}
+        res = self.client.open(path, method=method, json=body, headers=headers)
+        if res.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {res.status_code}: {res.get_data(as_text=True)[:200]}")
+        # Las respuestas en streaming (/api/export) se consumen sin guardarlas
+        for _ in res.iter_encoded():
+            pass
+        res.close()
+
+    def run(self, ctx, scenario, iterations: int) -> dict:
+        name, method, path_fn, body_fn, _ = scenario
+
+        def one():
+            self.call(ctx, method, path_fn(ctx), body_fn(ctx) if body_fn else None)
+            ctx["i"] += 1
+
+        one()  # calentamiento
+
+        # Sentencias SQL de una petición representativa
+        self.statements = 0
+        one()
+        queries = self.statements
+
+        latencies = []
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            s = time.perf_counter()
+            one()
+            latencies.append(time.perf_counter() - s)
+        elapsed = time.perf_counter() - t0
+
+        # Pico de memoria (aparte: tracemalloc distorsiona la latencia)
+        tracemalloc.start()
+        one()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return summarize(latencies, elapsed, queries, peak)
+
+
+# -------------------- Remote (gunicorn / flask run) --------------------
+
+class RemoteRunner:
+    def __init__(self, base_url: str, concurrency: int):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+
+    def _http(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urlrequest.Request(self.base_url + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urlrequest.urlopen(req, timeout=60) as res:
+                data = res.read()
+                if res.headers.get_content_type() != "application/json":
+                    return res.status, data  # p. ej. NDJSON de /api/export
+                return res.status, json.loads(data or b"null")
+        except HTTPError as e:
+            raise RuntimeError(f"{method} {path} -> {e.code}: {e.read()[:200]!r}")
+
+    def seed(self, size: int) -> dict:
+        # Sin acceso a la BD: se siembra a través de la propia API
+        email = f"bench_{size}_{int(time.time())}@bench.local"
+        self._http("POST", "/api/signup", {"email": email, "password": PASSWORD})
+        _, data = self._http("POST", "/api/token", {"email": email, "password": PASSWORD})
+        token = data["access_token"]
+        days = 0
+        while days < size:
+            span = min(365, size - days)
+            self._http("POST", "/api/events/batch", {
+                "title": "seed", "startDay": _day(0), "endDay": _day(span - 1),
+                "startTime": f"{8 + days // 365 % 10:02d}:00", "endTime": f"{9 + days // 365 % 10:02d}:00"}, token)
+            days += span
+        task_id = None
+        for i in range(size):
+            _, t = self._http("POST", "/api/tasks", {"title": f"task {i}", "date": None if i % 5 == 0 else _day(i % 365)}, token)
+            task_id = task_id or t["id"]
+        return {"email": email, "token": token, "task_id": task_id, "i": 0}
+
+    def run(self, ctx, scenario, iterations: int) -> dict:
+        name, method, path_fn, body_fn, _ = scenario
+
+        def one(i):
+            c = dict(ctx, i=i)
+            s = time.perf_counter()
+            self._http(method, path_fn(c), body_fn(c) if body_fn else None, ctx["token"])
+            return time.perf_counter() - s
+
+        one(0)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            latencies = list(pool.map(one, range(1, iterations + 1)))
+        elapsed = time.perf_counter() - t0
+        return summarize(latencies, elapsed)
+
+
+# -------------------- Sync vs threaded vs async --------------------
+
+READ_SCENARIOS = ("events_list", "tasks_list", "calendar", "calendar_month")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, proc, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {proc.returncode}")
+        try:
+            with urlrequest.urlopen(url + "/api/hello", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def compare_servers(modes, size: int, requests: int, concurrency: int, workers: int) -> dict:
+    """Arranca gunicorn en cada modo (gunicorn_conf.py) sobre la misma BD sembrada."""
+    local = LocalRunner()
+    ctx = local.seed(size)
+    scenarios = [s for s in SCENARIOS if s[0] in READ_SCENARIOS]
+    results = {}
+    for mode in modes:
+        port = _free_port()
+        env = dict(os.environ, GUNICORN_MODE=mode, WEB_CONCURRENCY=str(workers), GUNICORN_PRELOAD="0")
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--chdir", SRC_DIR, "-c", os.path.join(SRC_DIR, "gunicorn_conf.py"),
+             "--bind", f"127.0.0.1:{port}"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            _wait_ready(url, proc)
+            remote = RemoteRunner(url, concurrency)
+            results[mode] = {s[0]: remote.run(ctx, s, requests) for s in scenarios}
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"\n== {size} events + {size} tasks, {workers} workers, {concurrency} concurrent clients ==")
+    print(f"{'endpoint':<20}{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for s in scenarios:
+        for mode in modes:
+            r = results[mode][s[0]]
+            print(f"{s[0]:<20}{mode:<10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}")
+    return results
+
+
+# -------------------- Baseline --------------------
+
+def load_baseline(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, latency_tolerance=LATENCY_TOLERANCE):
+    """Devuelve la lista de regresiones respecto al baseline."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, cur in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            limit = max(base["p95_ms"] * (1 + latency_tolerance), base["p95_ms"] + LATENCY_SLACK_MS)
+            if cur["p95_ms"] > limit:
+                regressions.append(f"[{size}] {name}: p95 {cur['p95_ms']}ms > {limit:.3f}ms (baseline {base['p95_ms']}ms)")
+            if "queries" in cur and "queries" in base and cur["queries"] > base["queries"]:
+                regressions.append(f"[{size}] {name}: {cur['queries']} queries/request > baseline {base['queries']}")
+            if "peak_kb" in cur and "peak_kb" in base:
+                mem_limit = max(base["peak_kb"] * (1 + MEMORY_TOLERANCE), base["peak_kb"] + MEMORY_SLACK_KB)
+                if cur["peak_kb"] > mem_limit:
+                    regressions.append(f"[{size}] {name}: peak {cur['peak_kb']}KB > {mem_limit:.1f}KB (baseline {base['peak_kb']}KB)")
+    return regressions
+
+
+def print_table(size, results):
+    print(f"\n== dataset: {size} events + {size} tasks ==")
+    print(f"{'endpoint':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}{'peak KB':>10}")
+    for name, r in results.items():
+        print(f"{name:<20}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}"
+              f"{r.get('queries', '-'):>9}{r.get('peak_kb', '-'):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API endpoint benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="dataset sizes (events and tasks per user), comma separated")
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("--only", default="", help="comma separated scenario names")
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of the test client")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="parallel clients (with --url or --compare-servers)")
+    parser.add_argument("--compare-servers", default=None,
+                        help="compare gunicorn modes under load, e.g. sync,gthread,async")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers for --compare-servers")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=LATENCY_TOLERANCE,
+                        help="allowed p95 latency increase (0.5 = +50%%)")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    if args.compare_servers:
+        modes = [m for m in args.compare_servers.split(",") if m]
+        results = compare_servers(modes, sizes[0], args.requests, args.concurrency, args.workers)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    only = {s for s in args.only.split(",") if s}
+    scenarios = [s for s in SCENARIOS if not only or s[0] in only]
+    runner = RemoteRunner(args.url, args.concurrency) if args.url else LocalRunner()
+
+    results = {}
+    for size in sizes:
+        ctx = runner.seed(size)
+        results[str(size)] = {}
+        for scenario in scenarios:
+            iterations = max(5, int(args.requests * scenario[4]))
+            results[str(size)][scenario[0]] = runner.run(ctx, scenario, iterations)
+        print_table(size, results[str(size)])
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    # Los números de un servidor remoto no son comparables con el baseline local
+    if args.url:
+        return 0
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline)
+        for size, data in results.items():
+            baseline.setdefault(size, {}).update(data)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for r in regressions:
+            print("  - " + r)
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
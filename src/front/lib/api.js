@@ -1,19 +1,72 @@
 export const apiBase = (import.meta.env.VITE_BACKEND_URL || "").replace(/\/+$/,"");
 
-export async function apiFetch(path, options = {}) {
+// Un solo refresh en vuelo aunque caduquen varias peticiones a la vez
+// (cada refresh token solo vale una vez: reusarlo cierra la sesión)
+let refreshing = null;
+
+async function refreshSession() {
+  const refreshToken = sessionStorage.getItem("refresh_token");
+  if (!refreshToken) return false;
+  const res = await fetch(`${apiBase}/api/token/refresh`, {
+    method: "POST",
+    headers: { Authorization: `Bearer ${refreshToken}` }
+  });
+  if (!res.ok) return false;
+  const data = await res.json();
+  sessionStorage.setItem("token", data.access_token);
+  sessionStorage.setItem("refresh_token", data.refresh_token);
+  return true;
+}
+
+// Read-your-writes con réplica: el backend marca cada escritura con X-Last-Write
+// y se le devuelve en las siguientes peticiones (lee de la primaria un rato)
+async function send(path, options) {
   const token = sessionStorage.getItem("token");
+  const lastWrite = sessionStorage.getItem("last_write");
   const res = await fetch(`${apiBase}${path}`, {
     ...options,
     headers: {
       "Content-Type": "application/json",
       ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      ...(lastWrite ? { "X-Last-Write": lastWrite } : {}),
       ...(options.headers || {})
     }
   });
+  const written = res.headers.get("X-Last-Write");
+  if (written) sessionStorage.setItem("last_write", written);
+  return res;
+}
+
+export async function apiFetch(path, options = {}) {
+  let res = await send(path, options);
+  if (res.status === 401) {
+    refreshing = refreshing || refreshSession().finally(() => { refreshing = null; });
+    if (await refreshing) res = await send(path, options);
+  }
   if (res.status === 401) {
     sessionStorage.removeItem("token");
+    sessionStorage.removeItem("refresh_token");
     window.location.assign("/login");
     return;
   }
   return res;
 }
+
+// Varias peticiones en una (POST /api/batch): [{ method, path, body }] → [{ status, body }]
+// parallel: el backend puede resolver en paralelo los lotes que solo leen
+export async function apiBatch(requests, { parallel = true } = {}) {
+  const res = await apiFetch("/api/batch", {
+    method: "POST",
+    body: JSON.stringify({ parallel, requests })
+  });
+  if (!res?.ok) return requests.map(() => ({ status: res?.status ?? 0, body: null }));
+  const data = await res.json();
+  return data.responses;
+}
+
+export async function logout() {
+  // Revoca la sesión en el servidor (access + refresh); si falla, se sale igual
+  try {
+    await send("/api/logout", { method: "POST" });
+  } catch (_) { /* sin red: el token caduca solo */ }
+}
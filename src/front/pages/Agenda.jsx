@@ -1,12 +1,12 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Calendar, dateFnsLocalizer } from "react-big-calendar";
 import {
   format, parse, startOfWeek, getDay,
-  addDays, isBefore
+  addDays, isBefore, startOfMonth, endOfMonth
 } from "date-fns";
 import es from "date-fns/locale/es";
 import "react-big-calendar/lib/css/react-big-calendar.css";
-import { apiFetch } from "../lib/api";
+import { apiFetch, apiBatch } from "../lib/api";
 
 const locales = { es };
 const localizer = dateFnsLocalizer({
@@ -47,6 +47,40 @@ const ymd = (d) => {
   const x = new Date(d);
   return `${x.getFullYear()}-${two(x.getMonth() + 1)}-${two(x.getDate())}`;
 };
+// Días [desde, hasta] que muestra cada vista (la rejilla mensual incluye días de los meses vecinos)
+const visibleRange = (view, date) => {
+  if (view === "month") {
+    const first = startOfWeek(startOfMonth(date), { weekStartsOn: 1 });
+    const last = addDays(startOfWeek(endOfMonth(date), { weekStartsOn: 1 }), 6);
+    return [first, last];
+  }
+  if (view === "week") {
+    const first = startOfWeek(date, { weekStartsOn: 1 });
+    return [first, addDays(first, 6)];
+  }
+  if (view === "agenda") return [date, addDays(date, 29)]; // length por defecto de la vista agenda
+  return [date, date];
+};
+const calendarPath = ([from, to]) => `/api/calendar?from=${ymd(from)}&to=${ymd(to)}`;
+// Conteos de /api/calendar/summary → una entrada all-day por día y tipo
+const summaryItems = (days) => Object.entries(days || {}).flatMap(([day, c]) => {
+  const start = parse(day, "yyyy-MM-dd", new Date());
+  const end = addDays(start, 1);
+  const items = [];
+  if (c.events) {
+    items.push({
+      id: `sum-ev-${day}`, title: `${c.events} ${c.events === 1 ? "evento" : "eventos"}`,
+      start, end, allDay: true, isSummary: true, color: "#3f51b5"
+    });
+  }
+  if (c.open + c.done) {
+    items.push({
+      id: `sum-tk-${day}`, title: `${c.done}/${c.open + c.done} tareas`,
+      start, end, allDay: true, isSummary: true, color: c.open ? "#9aa0a6" : "#6c9c7b"
+    });
+  }
+  return items;
+});
 // Helpers para panel derecho
 const isSameDay = (a, b) => new Date(a).toDateString() === new Date(b).toDateString();
 const inThisWeek = (d) => {
@@ -77,10 +111,18 @@ export default function Agenda() {
   }, []);
 
   // ---- DATA ----
+  // events/tasks: detalle de la semana actual (panel derecho)
   const [events, setEvents] = useState([]);
   const [tasks, setTasks] = useState([]); // con fecha (mapeadas a all-day)
   const [loading, setLoading] = useState(true);
 
+  // ---- CALENDARIO: vista mensual = conteos por día; semana/día/agenda = detalle ----
+  const [view, setView] = useState("month");
+  const [date, setDate] = useState(new Date());
+  const [summary, setSummary] = useState({}); // {"YYYY-MM-DD": {events, open, done}}
+  const [visible, setVisible] = useState([]); // detalle del rango visible (no mensual)
+  const loadSeq = useRef(0);
+
   // ---- TAREAS SIN FECHA ----
   const [undated, setUndated] = useState([]); // {id,title,done,user_id}
   const [undatedInput, setUndatedInput] = useState("");
@@ -138,35 +180,52 @@ export default function Agenda() {
   const [taskEditError, setTaskEditError] = useState("");
 
   // ------- LOAD DATA -------
-  const loadCalendarFeed = async () => {
-    const res = await apiFetch("/api/calendar");
-    const raw = await res?.json().catch(() => []) || [];
-    const normalized = (Array.isArray(raw) ? raw : []).map(it => ({
-      ...it,
-      start: new Date(it.start),
-      end: new Date(it.end),
-    }));
+  const normalizeFeed = (raw) => (Array.isArray(raw) ? raw : []).map(it => ({
+    ...it,
+    start: new Date(it.start),
+    end: new Date(it.end),
+  }));
+
+  const applyCalendarFeed = (raw) => {
+    const normalized = normalizeFeed(raw);
     setEvents(normalized.filter(x => !x.isTask));
     setTasks(normalized.filter(x => x.isTask));
   };
 
-  const loadUndated = async () => {
-    const res = await apiFetch("/api/tasks");
-    const data = await res?.json().catch(() => []) || [];
-    // Filtrar sin fecha (date == null)
-    const und = data.filter(t => !t.date).map(t => ({
+  const applyUndated = (data) => {
+    const und = (Array.isArray(data) ? data : []).map(t => ({
       id: t.id, title: t.title, done: !!t.done, user_id: t.user_id
     }));
     setUndated(und);
   };
 
   const loadAll = async () => {
+    const seq = ++loadSeq.current;
     setLoading(true);
-    await Promise.all([loadCalendarFeed(), loadUndated()]);
+    // Una sola petición (un preflight, un JWT): detalle de la semana actual (panel),
+    // tareas sin fecha (date IS NULL, con índice) y lo que muestra el calendario.
+    // La vista mensual solo pide conteos por día; el detalle llega al abrir un día o una semana
+    const weekStart = startOfWeek(new Date(), { weekStartsOn: 1 });
+    const range = visibleRange(view, date);
+    const [week, undated, shown] = await apiBatch([
+      { method: "GET", path: calendarPath([weekStart, addDays(weekStart, 6)]) },
+      { method: "GET", path: "/api/tasks?undated=1" },
+      view === "month"
+        ? { method: "GET", path: `/api/calendar/summary?from=${ymd(range[0])}&to=${ymd(range[1])}` }
+        : { method: "GET", path: calendarPath(range) },
+    ]);
+    if (seq !== loadSeq.current) return; // ya se navegó a otro rango
+    applyCalendarFeed(week.status === 200 ? week.body : []);
+    applyUndated(undated.status === 200 ? undated.body : []);
+    if (view === "month") {
+      setSummary(shown.status === 200 ? shown.body.days : {});
+    } else {
+      setVisible(shown.status === 200 ? normalizeFeed(shown.body) : []);
+    }
     setLoading(false);
   };
 
-  useEffect(() => { loadAll(); }, []);
+  useEffect(() => { loadAll(); }, [view, ymd(date)]);
 
   // -------- Apariencia de eventos --------
   const eventPropGetter = (event) => {
@@ -265,8 +324,14 @@ export default function Agenda() {
     }
   };
 
-  // ---------- Click en evento (evento o tarea) ----------
+  // ---------- Click en evento (evento, tarea o conteo del mes) ----------
   const onSelectEvent = (event) => {
+    if (event.isSummary) {
+      // Conteo de la vista mensual: abre el día con su detalle
+      setDate(event.start);
+      setView("day");
+      return;
+    }
     if (event.isTask) {
       setTaskDetail(event);
       setShowTaskInfo(true);
@@ -485,7 +550,11 @@ export default function Agenda() {
             <div className="card-body p-2">
               <Calendar
                 localizer={localizer}
-                events={[...events, ...tasks]}
+                events={view === "month" ? summaryItems(summary) : visible}
+                view={view}
+                date={date}
+                onView={setView}
+                onNavigate={setDate}
                 startAccessor="start"
                 endAccessor="end"
                 style={{ height: 620 }}
@@ -35,7 +35,7 @@ export const Login = () => {
       if (!res.ok) throw new Error(data?.message || "Login failed");
 
       // Guarda token y redirige a la agenda
-      dispatch({ type: "login_success", payload: { token: data.access_token } });
+      dispatch({ type: "login_success", payload: { token: data.access_token, refreshToken: data.refresh_token } });
       navigate("/agenda", { replace: true });
     } catch (err) {
       setError(err.message || "Error inesperado");
@@ -1,40 +1,34 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
+import useGlobalReducer from "../hooks/useGlobalReducer";
+import { apiFetch } from "../lib/api";
 
 export const Private = () => {
   const navigate = useNavigate();
-  const raw = import.meta.env.VITE_BACKEND_URL;
-  const backendUrl = raw?.replace(/\/+$/, "") || "";  // ⬅️ quita trailing slashes
+  const { dispatch } = useGlobalReducer();
   const [greeting, setGreeting] = useState("");
 
   useEffect(() => {
-    const token = sessionStorage.getItem("token");
-    if (!token) {
+    // Sin access token pero con refresh token, apiFetch renueva la sesión
+    if (!sessionStorage.getItem("token") && !sessionStorage.getItem("refresh_token")) {
       navigate("/login");
       return;
     }
 
     (async () => {
       try {
-        const res = await fetch(`${backendUrl}/api/private`, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-
-
-        if (res.status === 401) {
-          sessionStorage.removeItem("token");
-          navigate("/login");
-          return;
-        }
+        // 401 → un refresh y reintento; si vuelve a fallar, apiFetch borra ambos tokens y va a /login
+        const res = await apiFetch("/api/private");
+        if (!res) return;
         const data = await res.json();
         if (!res.ok) throw new Error(data?.message || "Unauthorized");
         setGreeting(data.msg);
       } catch {
-        sessionStorage.removeItem("token");
+        dispatch({ type: "logout" });  // borra token y refresh_token
         navigate("/login");
       }
     })();
-  }, [backendUrl, navigate]);
+  }, [dispatch, navigate]);
 
   return (
     <div className="container mt-4">
@@ -24,13 +24,15 @@ export default function storeReducer(store, action = {}) {
 
     // ⬇️ NUEVO: login/logout
     case 'login_success': {
-      const { token } = action.payload;
+      const { token, refreshToken } = action.payload;
       sessionStorage.setItem("token", token);
+      if (refreshToken) sessionStorage.setItem("refresh_token", refreshToken);
       return { ...store, token };
     }
 
     case 'logout': {
       sessionStorage.removeItem("token");
+      sessionStorage.removeItem("refresh_token");
       return { ...store, token: null };
     }
 
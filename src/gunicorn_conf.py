@@ -0,0 +1,50 @@
+"""
+Configuración de gunicorn, elegida con GUNICORN_MODE:
+
+- sync    (por defecto) workers síncronos clásicos: wsgi:application
+- gthread workers con hilos: un worker atiende GUNICORN_THREADS peticiones a la vez
+- async   workers ASGI (uvicorn) con lecturas asíncronas: asgi:application
+
+Desde la raíz del repositorio (como el Procfile; -c se resuelve antes que --chdir):
+
+    $ gunicorn --chdir ./src/ -c src/gunicorn_conf.py
+    $ GUNICORN_MODE=gthread GUNICORN_THREADS=8 gunicorn --chdir ./src/ -c src/gunicorn_conf.py
+
+El puerto sale de $PORT (gunicorn lo usa por defecto) y el número de workers
+de WEB_CONCURRENCY.
+"""
+import os
+import multiprocessing
+
+mode = os.getenv("GUNICORN_MODE", "sync")
+if mode not in ("sync", "gthread", "async"):
+    raise RuntimeError(f"Unknown GUNICORN_MODE '{mode}' (use sync, gthread or async)")
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if mode == "gthread" else 1
+
+if mode == "async":
+    wsgi_app = "asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "wsgi:application"
+    worker_class = mode
+
+# Carga la app una vez en el master y comparte memoria entre workers (copy-on-write)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    # Con preload_app el pool del master no debe compartirse con los hijos
+    if not preload_app:
+        return
+    from app import app
+    from api.models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
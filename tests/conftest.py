@@ -0,0 +1,47 @@
+"""
+Fixtures comunes: la app con una BD SQLite temporal, sin shards ni réplica.
+
+app.py lee la configuración del entorno al importarse, así que las variables se
+fijan aquí antes de importarlo. Cada test empieza con las tablas vacías.
+"""
+import os
+import tempfile
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="api-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["ADMISSION_CONTROL"] = "0"
+os.environ["QUERY_BUDGET"] = "raise"
+os.environ["FLASK_APP_KEY"] = "tests-only-jwt-key-long-enough-for-hs256"
+for name in ("SHARD_DATABASE_URLS", "REPLICA_DATABASE_URL", "METRICS_ENABLED"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from app import app as flask_app
+    from api import tokens
+    from api.models import db
+
+    flask_app.config["TESTING"] = True
+    # Cada test con su propio set de revocaciones (es global al proceso)
+    monkeypatch.setattr(tokens, "revoked", tokens.RevocationSet())
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id(app):
+    from api import sharding
+
+    with app.app_context():
+        return sharding.create_user("ana@example.com", "secret")
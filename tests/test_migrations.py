@@ -0,0 +1,57 @@
+"""
+Migraciones de task sobre SQLite: las reescrituras de tabla (batch) conservan
+el AUTOINCREMENT que añadió d41f6a2c8e53.
+
+Cada paso es un `flask db` aparte contra su propia BD, como en despliegue.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def migrate_db(tmp_path):
+    path = tmp_path / "migrations.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", FLASK_APP="src/app.py")
+
+    def flask_db(*args):
+        result = subprocess.run([sys.executable, "-m", "flask", "db", *args], cwd=ROOT, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+    def task_schema():
+        with sqlite3.connect(path) as conn:
+            sql, = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'task'").fetchone()
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(task)")}
+        return sql, columns
+
+    return flask_db, task_schema
+
+
+def test_task_keeps_autoincrement_through_expand_and_contract(migrate_db):
+    flask_db, task_schema = migrate_db
+
+    flask_db("upgrade", "8b3f0d6e1a27")  # task con due_date/completed
+    sql, columns = task_schema()
+    assert "AUTOINCREMENT" in sql and "due_date" in columns
+
+    flask_db("upgrade", "b2d7e9f14c60")  # expand
+    sql, columns = task_schema()
+    assert "AUTOINCREMENT" in sql and {"date", "done", "due_date"} <= columns
+
+    flask_db("upgrade")  # contract (la tabla vacía no necesita backfill)
+    sql, columns = task_schema()
+    assert "AUTOINCREMENT" in sql and "due_date" not in columns
+
+    flask_db("downgrade", "b2d7e9f14c60")
+    sql, columns = task_schema()
+    assert "AUTOINCREMENT" in sql and {"date", "done", "due_date"} <= columns
+
+    flask_db("downgrade", "8b3f0d6e1a27")
+    sql, columns = task_schema()
+    assert "AUTOINCREMENT" in sql and "done" not in columns
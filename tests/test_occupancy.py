@@ -0,0 +1,121 @@
+import random
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+import pytest
+from api import occupancy
+from api.occupancy import SLOT, SLOTS_PER_DAY, HALF
+
+Ev = namedtuple("Ev", "start end all_day")
+MONDAY = datetime(2025, 1, 6)
+
+
+def at(day, hh, mm=0):
+    return MONDAY + timedelta(days=day, hours=hh, minutes=mm)
+
+
+def ev(day, start, end, all_day=False):
+    return Ev(at(day, *start), at(day, *end), all_day)
+
+
+@pytest.fixture
+def busy(app, user_id):
+    """Marca eventos en el mapa y devuelve free_slots del usuario."""
+    ctx = app.app_context()
+    ctx.push()
+
+    def add(*events):
+        occupancy.add(user_id, events)
+
+    def find(start, end, duration, **kwargs):
+        return occupancy.free_slots(user_id, start, end, duration, **kwargs)
+
+    yield add, find
+    ctx.pop()
+
+
+def brute_force(events, start, end, duration, limit, hours=None):
+    """Lo mismo hueco a hueco, para comparar."""
+    taken = set()
+    for e in events:
+        if e.all_day:
+            continue
+        t = e.start - timedelta(minutes=e.start.minute % 15, seconds=e.start.second)
+        while t < e.end:
+            taken.add(t)
+            t += SLOT
+    need = -(-duration // 15)
+    out, t = [], start + (datetime.min - start) % SLOT
+    while t + need * SLOT <= end and len(out) < limit:
+        window = [t + i * SLOT for i in range(need)]
+        ok = all(s not in taken for s in window)
+        if hours is not None:
+            ok = ok and all(hours[0] <= (s.hour * 60 + s.minute) // 15 < hours[1] for s in window)
+        if ok:
+            out.append(t)
+            t += need * SLOT
+        else:
+            t += SLOT
+    return out
+
+
+def test_split_and_join_at_noon():
+    bits = occupancy.spans(at(0, 11, 30), at(0, 12, 30))[MONDAY.date()]
+    am, pm = occupancy.split(bits)
+    assert am == 0b11 << (HALF - 2)   # 11:30-12:00
+    assert pm == 0b11                 # 12:00-12:30
+    assert occupancy.join(am, pm) == bits
+
+
+def test_spans_rounds_to_touched_slots_and_splits_days():
+    out = occupancy.spans(at(0, 23, 50), at(1, 0, 5))
+    assert out == {date(2025, 1, 6): 1 << (SLOTS_PER_DAY - 1), date(2025, 1, 7): 1}
+
+
+def test_free_run_crosses_the_am_pm_boundary(busy):
+    add, find = busy
+    add(ev(0, (0, 0), (11, 45)), ev(0, (13, 0), (23, 59)))
+    assert find(at(0, 0), at(1, 0), 60) == [at(0, 11, 45)]
+    assert find(at(0, 0), at(1, 0), 75) == [at(0, 11, 45)]
+    assert find(at(0, 0), at(1, 0), 90) == []
+
+
+def test_free_run_crosses_midnight(busy):
+    add, find = busy
+    add(ev(0, (0, 0), (23, 0)), ev(1, (1, 0), (23, 59)))
+    assert find(at(0, 0), at(2, 0), 120) == [at(0, 23)]
+
+
+def test_all_day_events_do_not_block(busy):
+    add, find = busy
+    add(Ev(at(0, 0), at(1, 0), True))
+    assert find(at(0, 9), at(0, 10), 60) == [at(0, 9)]
+
+
+def test_hours_window_and_limit(busy):
+    add, find = busy
+    add(ev(0, (9, 0), (10, 0)), ev(1, (9, 0), (17, 0)))
+    found = find(at(0, 0), at(3, 0), 60, limit=4, hours=(9 * 4, 12 * 4))
+    assert found == [at(0, 10), at(0, 11), at(2, 9), at(2, 10)]
+
+
+def test_range_edges_are_respected(busy):
+    add, find = busy
+    # from 09:10 redondea al hueco siguiente; to 10:10 deja sitio para 45 min desde 09:15
+    assert find(at(0, 9, 10), at(0, 10, 10), 45, limit=5) == [at(0, 9, 15)]
+    assert find(at(0, 9, 10), at(0, 9, 50), 45) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_brute_force(busy, seed):
+    add, find = busy
+    rnd = random.Random(seed)
+    events = []
+    for _ in range(40):
+        start = at(rnd.randrange(7), rnd.randrange(24), rnd.choice((0, 10, 15, 30, 45)))
+        events.append(Ev(start, start + timedelta(minutes=rnd.randrange(5, 240)), rnd.random() < 0.1))
+    add(*events)
+    start, end = at(0, 7, 20), at(6, 20)
+    for duration in (15, 50, 120, 300):
+        for hours in (None, (8 * 4, 18 * 4)):
+            assert find(start, end, duration, limit=20, hours=hours) == \
+                brute_force(events, start, end, duration, 20, hours)
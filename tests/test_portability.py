@@ -0,0 +1,130 @@
+import json
+import pytest
+from sqlalchemy import select
+from api import portability
+from api.models import db, Event, Task, ImportProgress
+
+N_EVENTS, N_TASKS = 7, 4
+
+
+def ndjson(objs) -> bytes:
+    return b"".join(json.dumps(o).encode() + b"\n" for o in objs)
+
+
+def dataset():
+    lines = [{"type": "user", "format": 1, "email": "ana@example.com"}]
+    lines += [{"type": "event", "title": f"evento {i}", "start": f"2025-03-{i + 1:02d}T10:00:00",
+               "end": f"2025-03-{i + 1:02d}T11:00:00"} for i in range(N_EVENTS)]
+    lines += [{"type": "task", "title": f"tarea {i}", "done": i % 2 == 0,
+               "date": f"2025-03-{i + 1:02d}"} for i in range(N_TASKS)]
+    return lines
+
+
+@pytest.fixture
+def auth(client, user_id, monkeypatch):
+    # Lotes de 3 líneas: varios commits con un fichero pequeño
+    monkeypatch.setattr(portability, "IMPORT_CHUNK", 3)
+    r = client.post("/api/token", json={"email": "ana@example.com", "password": "secret"})
+    return {"Authorization": f"Bearer {r.get_json()['access_token']}"}
+
+
+def post(client, auth, body: bytes, job="backup", **args):
+    query = "&".join(f"{k}={v}" for k, v in {"job": job, **args}.items())
+    return client.post(f"/api/import?{query}", data=body, headers=auth,
+                       content_type=portability.MIMETYPE)
+
+
+def titles(app, model):
+    with app.app_context():
+        return sorted(db.session.scalars(select(model.title)))
+
+
+def expected(model):
+    return sorted(o["title"] for o in dataset() if o["type"] == model.__tablename__)
+
+
+def test_full_import(app, client, auth):
+    r = post(client, auth, ndjson(dataset()))
+    assert r.status_code == 200
+    assert r.get_json() == {"job": "backup", "line": 1 + N_EVENTS + N_TASKS,
+                            "events": N_EVENTS, "tasks": N_TASKS, "finished": True}
+    assert titles(app, Event) == expected(Event)
+    assert titles(app, Task) == expected(Task)
+
+
+def test_failure_reports_the_last_committed_line(app, client, auth):
+    lines = dataset()
+    lines[7] = {"type": "event", "title": "roto"}  # línea 8: sin start/end
+    r = post(client, auth, ndjson(lines))
+    assert r.status_code == 400
+    assert r.get_json()["message"].startswith("Line 8:")
+    # Lotes confirmados: líneas 1-3 y 4-6 (cabecera + 5 eventos)
+    assert r.get_json()["line"] == 6
+    assert titles(app, Event) == [f"evento {i}" for i in range(5)]
+    state = client.get("/api/import?job=backup", headers=auth).get_json()
+    assert state == {"job": "backup", "line": 6, "events": 5, "tasks": 0, "finished": False}
+
+
+def test_resend_whole_file_skips_committed_lines(app, client, auth):
+    broken = dataset()
+    broken[7] = {"type": "event", "title": "roto"}
+    assert post(client, auth, ndjson(broken)).status_code == 400
+
+    r = post(client, auth, ndjson(dataset()))
+    assert r.status_code == 200
+    assert r.get_json()["events"] == N_EVENTS and r.get_json()["tasks"] == N_TASKS
+    assert titles(app, Event) == expected(Event)  # sin duplicados
+    assert titles(app, Task) == expected(Task)
+
+
+def test_resume_from_line_sends_only_the_rest(app, client, auth):
+    lines = dataset()
+    broken = lines[:7] + [{"type": "event", "title": "roto"}]
+    assert post(client, auth, ndjson(broken)).get_json()["line"] == 6
+
+    r = post(client, auth, ndjson(lines[6:]), from_line=6)
+    assert r.status_code == 200
+    assert r.get_json()["line"] == len(lines)
+    assert titles(app, Event) == expected(Event)
+    assert titles(app, Task) == expected(Task)
+
+
+def test_resume_past_the_committed_line_is_refused(client, auth):
+    lines = dataset()
+    assert post(client, auth, ndjson(lines[:7] + [{"type": "bad"}])).status_code == 400
+    r = post(client, auth, ndjson(lines[9:]), from_line=9)
+    assert r.status_code == 409
+    assert r.get_json()["line"] == 6
+
+
+def test_resume_inside_a_committed_chunk(app, client, auth):
+    lines = dataset()
+    assert post(client, auth, ndjson(lines[:7] + [{"type": "bad"}])).status_code == 400
+    # El cliente reanuda antes de lo confirmado: las líneas 5-6 se saltan
+    r = post(client, auth, ndjson(lines[4:]), from_line=4)
+    assert r.status_code == 200
+    assert titles(app, Event) == expected(Event)
+
+
+def test_finished_job_is_not_imported_twice(app, client, auth):
+    body = ndjson(dataset())
+    assert post(client, auth, body).status_code == 200
+    r = post(client, auth, body)
+    assert r.status_code == 200 and r.get_json()["finished"]
+    assert len(titles(app, Event)) == N_EVENTS
+    assert post(client, auth, body, job="again").get_json()["events"] == N_EVENTS
+    assert len(titles(app, Event)) == 2 * N_EVENTS
+
+
+def test_export_import_round_trip(app, client, auth):
+    post(client, auth, ndjson(dataset()))
+    exported = client.get("/api/export", headers=auth).data
+    kinds = [json.loads(line)["type"] for line in exported.splitlines()]
+    assert kinds == ["user"] + ["event"] * N_EVENTS + ["task"] * N_TASKS
+
+    r = post(client, auth, exported, job="restore", replace=1)
+    assert r.status_code == 200
+    assert titles(app, Event) == expected(Event)
+    assert titles(app, Task) == expected(Task)
+    with app.app_context():
+        assert db.session.query(ImportProgress).count() == 2
@@ -0,0 +1,26 @@
+"""Cada endpoint de la API lleva presupuesto de consultas o una exención declarada."""
+from api.query_budget import EXEMPT
+
+
+def test_every_api_route_has_a_budget_or_an_exemption(app):
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if not rule.endpoint.startswith("api."):
+            continue
+        view = app.view_functions[rule.endpoint]
+        if not hasattr(view, "query_budget") and not hasattr(view, "query_budget_exempt"):
+            missing.append(rule.rule)
+    assert missing == []
+
+
+def test_exemptions_are_listed(app):
+    assert set(EXEMPT) == {"api.routes.import_user", "api.routes.batch_requests"}
+    assert all(EXEMPT.values())
+
+
+def test_cli_lists_budgets_and_exemptions(app):
+    result = app.test_cli_runner().invoke(args=["query-budgets"])
+    assert result.exit_code == 0, result.output
+    assert "/api/batch: exempt (each sub-request" in result.output
+    assert "/api/import: exempt (" in result.output
+    assert "/api/export: 1\n" in result.output
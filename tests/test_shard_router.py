@@ -0,0 +1,40 @@
+from collections import Counter
+from api.shard_router import HashRing
+
+USERS = range(1, 20001)
+
+
+def test_same_key_same_shard():
+    a, b = HashRing(4), HashRing(4)
+    assert [a.shard_for(uid) for uid in USERS] == [b.shard_for(uid) for uid in USERS]
+    assert a.shard_for(42) == a.shard_for("42")
+
+
+def test_single_shard_gets_everyone():
+    ring = HashRing(1)
+    assert {ring.shard_for(uid) for uid in USERS} == {0}
+
+
+def test_users_spread_over_every_shard():
+    ring = HashRing(4)
+    counts = Counter(ring.shard_for(uid) for uid in USERS)
+    assert set(counts) == {0, 1, 2, 3}
+    # 64 nodos virtuales por shard: cada uno cerca del 25 %
+    for n in counts.values():
+        assert 0.15 < n / len(USERS) < 0.35
+
+
+def test_adding_a_shard_only_moves_users_to_it():
+    before, after = HashRing(3), HashRing(4)
+    moved = [(before.shard_for(uid), after.shard_for(uid)) for uid in USERS
+             if before.shard_for(uid) != after.shard_for(uid)]
+    assert {target for _, target in moved} == {3}
+    # ~1/4 de los usuarios, no una redistribución completa
+    assert 0.15 < len(moved) / len(USERS) < 0.35
+
+
+def test_removing_the_last_shard_only_moves_its_users():
+    before, after = HashRing(4), HashRing(3)
+    for uid in USERS:
+        if before.shard_for(uid) != 3:
+            assert after.shard_for(uid) == before.shard_for(uid)
@@ -0,0 +1,132 @@
+import uuid
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+from flask_jwt_extended.exceptions import RevokedTokenError
+from api import tokens
+from api.models import db, RevokedToken, Task
+from api.utils import utc_now
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def login(client):
+    r = client.post("/api/token", json={"email": "ana@example.com", "password": "secret"})
+    assert r.status_code == 200
+    return r.get_json()
+
+
+def refresh(client, pair):
+    return client.post("/api/token/refresh", headers=bearer(pair["refresh_token"]))
+
+
+def can_read(client, pair):
+    return client.get("/api/private", headers=bearer(pair["access_token"])).status_code == 200
+
+
+def test_refresh_rotates_the_pair(client, user_id):
+    first = login(client)
+    r = refresh(client, first)
+    assert r.status_code == 200
+    second = r.get_json()
+    assert second["refresh_token"] != first["refresh_token"]
+    assert can_read(client, second)
+    assert refresh(client, second).status_code == 200
+
+
+def test_reusing_a_rotated_refresh_token_revokes_the_session(client, user_id):
+    first = login(client)
+    second = refresh(client, first).get_json()
+
+    r = refresh(client, first)
+    assert r.status_code == 401
+    # Toda la sesión: también el par que se emitió al rotar
+    assert refresh(client, second).status_code == 401
+    assert not can_read(client, second)
+
+
+def test_reuse_leaves_other_sessions_alone(client, user_id):
+    stolen, other = login(client), login(client)
+    refresh(client, stolen)
+    assert refresh(client, stolen).status_code == 401
+    assert can_read(client, other)
+    assert refresh(client, other).status_code == 200
+
+
+def test_reuse_revocation_is_stored(app, client, user_id, monkeypatch):
+    first = login(client)
+    second = refresh(client, first).get_json()
+    refresh(client, first)
+    # Otro proceso (set vacío) lo lee de revoked_token
+    monkeypatch.setattr(tokens, "revoked", tokens.RevocationSet())
+    assert not can_read(client, second)
+    with app.app_context():
+        keys = set(db.session.scalars(db.select(RevokedToken.key)))
+    assert len(keys) == 2  # el jti rotado y el sid
+
+
+def test_reuse_does_not_commit_the_request_session(app, client, user_id):
+    first = login(client)
+    refresh(client, first)
+    with app.test_request_context("/api/token/refresh", method="POST",
+                                  headers=bearer(first["refresh_token"])):
+        db.session.add(Task(user_id=user_id, title="pendiente"))
+        with pytest.raises(RevokedTokenError):
+            verify_jwt_in_request(refresh=True)
+        db.session.rollback()
+    with app.app_context():
+        assert db.session.query(Task).count() == 0
+
+
+def test_logout_revokes_access_and_refresh(client, user_id):
+    pair = login(client)
+    assert client.post("/api/logout", headers=bearer(pair["access_token"])).status_code == 200
+    assert not can_read(client, pair)
+    assert refresh(client, pair).status_code == 401
+
+
+def test_token_types_are_not_interchangeable(client, user_id):
+    pair = login(client)
+    assert client.get("/api/private", headers=bearer(pair["refresh_token"])).status_code != 200
+    assert client.post("/api/token/refresh", headers=bearer(pair["access_token"])).status_code != 200
+
+
+def test_poll_sees_revocations_committed_late(app):
+    def store(row_id, key, revoked_at):
+        db.session.add(RevokedToken(id=row_id, key=key, revoked_at=revoked_at,
+                                    expires_at=utc_now() + timedelta(days=1)))
+        db.session.commit()
+
+    early, late = uuid.uuid4().hex, uuid.uuid4().hex
+    with app.app_context():
+        worker = tokens.RevocationSet()
+        assert early not in worker  # carga inicial
+        store(2, early, utc_now())
+        worker._next_poll = 0
+        assert early in worker
+        # id menor, insertado antes del sondeo anterior pero confirmado después
+        store(1, late, utc_now() - timedelta(seconds=10))
+        worker._next_poll = 0
+        assert late in worker
+
+
+def test_concurrent_rotation_on_two_workers_revokes_the_session(app, client, user_id, monkeypatch):
+    first = login(client)
+    with app.app_context():
+        worker_a, worker_b = tokens.RevocationSet(), tokens.RevocationSet()
+        worker_b._sync()  # B ya cargó: no verá la rotación de A hasta su próximo sondeo
+
+    monkeypatch.setattr(tokens, "revoked", worker_a)
+    r = refresh(client, first)
+    assert r.status_code == 200
+    second = r.get_json()
+
+    monkeypatch.setattr(tokens, "revoked", worker_b)
+    assert refresh(client, first).status_code == 401
+
+    monkeypatch.setattr(tokens, "revoked", worker_a)
+    worker_a._next_poll = 0
+    assert refresh(client, second).status_code == 401
+    assert not can_read(client, second)